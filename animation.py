@@ -0,0 +1,135 @@
+"""One frame clock for the window's animations.
+
+Effects register with ``Animator.animate(key, apply, start, end, duration)``
+instead of running their own ``after`` loops. A single timer runs only while
+something is animating, and each frame's value comes from the monotonic
+clock, so a late tick (the main loop was busy) draws where the animation
+should be by now instead of working through the frames it missed.
+
+Starting an animation under a key that is already running replaces it,
+starting from the value the running one had reached, so rapid clicks merge
+into one effect instead of stacking up. While the window is hidden, while
+the app reports itself busy, or in reduced-motion mode, animations jump
+straight to their end value.
+"""
+import time
+import tkinter as tk
+
+FRAME_MS = 40  # 25 frames per second
+
+
+class Animation:
+    __slots__ = ("apply", "start", "end", "duration", "done", "started", "value")
+
+    def __init__(self, apply, start, end, duration, done):
+        self.apply = apply
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.done = done
+        self.started = time.monotonic()
+        self.value = start
+
+
+class Animator:
+    def __init__(self, widget, frame_ms=FRAME_MS, reduced_motion=False, busy=None):
+        self.widget = widget
+        self.frame_ms = frame_ms
+        self.reduced_motion = reduced_motion
+        self.busy = busy  # Optional callable; animations are skipped while it returns True
+        self._animations = {}  # key -> Animation, in start order
+        self._after_id = None
+
+    def animate(self, key, apply, start, end, duration, done=None):
+        """Move a value from start to end over duration seconds, calling apply(value) each frame.
+
+        A running animation with the same key is replaced (its done callback
+        is dropped) and the new one continues from the value it reached, over
+        the matching share of duration. done() runs after the end value has
+        been applied.
+        """
+        running = self._animations.pop(key, None)
+        if running is not None and start != end:
+            duration *= abs(end - running.value) / abs(end - start)
+            start = running.value
+        if duration <= 0 or self._skipping():
+            self._cancel_clock_if_idle()
+            self._finish(apply, end, done)
+            return
+        animation = Animation(apply, start, end, duration, done)
+        self._animations[key] = animation
+        if self._apply(animation, start):
+            self._start_clock()
+        else:
+            self._animations.pop(key, None)
+
+    def cancel(self, key):
+        """Stop an animation where it is, without calling its done callback."""
+        self._animations.pop(key, None)
+        self._cancel_clock_if_idle()
+
+    def finish_all(self):
+        """Jump every running animation to its end."""
+        while self._animations:
+            key = next(iter(self._animations))
+            animation = self._animations.pop(key)
+            self._finish(animation.apply, animation.end, animation.done)
+        self._cancel_clock_if_idle()
+
+    def set_reduced_motion(self, reduced):
+        self.reduced_motion = reduced
+        if reduced:
+            self.finish_all()
+
+    def _skipping(self):
+        if self.reduced_motion or (self.busy is not None and self.busy()):
+            return True
+        try:
+            return not self.widget.winfo_viewable()  # Minimized, withdrawn or not yet shown
+        except tk.TclError:
+            return True
+
+    @staticmethod
+    def _finish(apply, end, done):
+        try:
+            apply(end)
+        except tk.TclError:
+            return  # The widget went away
+        if done is not None:
+            done()
+
+    @staticmethod
+    def _apply(animation, value):
+        try:
+            animation.apply(value)
+        except tk.TclError:
+            return False
+        animation.value = value
+        return True
+
+    def _start_clock(self):
+        if self._after_id is None:
+            self._after_id = self.widget.after(self.frame_ms, self._tick)
+
+    def _cancel_clock_if_idle(self):
+        if self._after_id is not None and not self._animations:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _tick(self):
+        self._after_id = None
+        if self._skipping():
+            self.finish_all()
+            return
+        now = time.monotonic()
+        for key, animation in list(self._animations.items()):
+            if self._animations.get(key) is not animation:
+                continue  # Replaced by a done callback earlier in this frame
+            progress = min(1.0, (now - animation.started) / animation.duration)
+            value = animation.start + (animation.end - animation.start) * progress
+            if not self._apply(animation, value) or progress >= 1.0:
+                del self._animations[key]
+                if progress >= 1.0 and animation.done is not None:
+                    animation.done()
+        if self._animations:
+            self._start_clock()
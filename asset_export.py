@@ -0,0 +1,237 @@
+"""Incremental and streamed export of the assets folder.
+
+Exporting to a folder keeps a manifest of (size, mtime, SHA-256) for every
+file it has placed there, so a repeat export only touches files that are new
+or changed since last time. New files are reflinked (copy-on-write clone)
+where the filesystem supports it, hardlinked when source and destination
+share a filesystem, and copied otherwise. Generated assets are never
+modified in place, so sharing their data with the export is safe.
+
+Exporting to an archive writes a .zip, .tar or .tar.gz in a single pass,
+streaming each file through in chunks, so memory use stays flat however many
+assets there are.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; reflinks are skipped
+    fcntl = None
+
+MANIFEST_NAME = ".export_manifest.json"
+FICLONE = 0x40049409  # Linux ioctl for a copy-on-write clone (btrfs, XFS, ...)
+CHUNK_SIZE = 1 << 16
+
+ARCHIVE_TYPES = [
+    ("ZIP archive", "*.zip"),
+    ("Tar archive", "*.tar"),
+    ("Gzipped tar archive", "*.tar.gz")
+]
+
+# Already-compressed formats are stored as-is in zip archives
+STORED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".pdf", ".zip", ".gz"}
+
+
+def _digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _walk(src):
+    """Yield (path, relative path) for every file under src, in a stable order.
+
+    Temporary files from writes still in progress (``*.tmp``) are skipped.
+    """
+    for root, dirs, files in os.walk(src):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            yield path, os.path.relpath(path, src)
+
+
+def _load_manifest(dest):
+    try:
+        with open(os.path.join(dest, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def _save_manifest(dest, files):
+    path = os.path.join(dest, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "files": files}, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+
+
+def _place(src, dst, link):
+    """Put a copy of src at dst, sharing its data when possible. Returns how."""
+    tmp_path = dst + ".part"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    method = "copied"
+    if link:
+        try:
+            _reflink(src, tmp_path)
+            method = "cloned"
+        except OSError:
+            try:
+                os.link(src, tmp_path)
+                method = "linked"
+            except OSError:
+                pass
+    if method == "copied":
+        shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+    return method
+
+
+def sync_tree(src, dest, link=True):
+    """Bring dest up to date with src, touching only new or changed files.
+
+    Files that have disappeared from src are dropped from the manifest but
+    left in dest. Returns a dict of counts: copied, linked, cloned,
+    unchanged, plus the number of bytes written.
+    """
+    stats = {"copied": 0, "linked": 0, "cloned": 0, "unchanged": 0, "bytes": 0}
+    if not os.path.isdir(src):
+        return stats
+    os.makedirs(dest, exist_ok=True)
+    previous = _load_manifest(dest)
+    files = {}
+    complete = False
+    try:
+        for path, rel in _walk(src):
+            try:
+                key = rel.replace(os.sep, "/")
+                stat = os.stat(path)
+                target = os.path.join(dest, rel)
+                entry = previous.get(key)
+                target_size = os.path.getsize(target) if os.path.isfile(target) else None
+
+                # Same size and mtime as last export: trust it without hashing
+                if entry and entry[:2] == [stat.st_size, stat.st_mtime_ns] and target_size == stat.st_size:
+                    files[key] = entry
+                    stats["unchanged"] += 1
+                    continue
+
+                digest = _digest(path)
+                if target_size == stat.st_size:
+                    # Touched but identical, or left by an export without a manifest
+                    known = entry[2] if entry else _digest(target)
+                    if known == digest:
+                        files[key] = [stat.st_size, stat.st_mtime_ns, digest]
+                        stats["unchanged"] += 1
+                        continue
+
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                method = _place(path, target, link)
+                files[key] = [stat.st_size, stat.st_mtime_ns, digest]
+                stats[method] += 1
+                if method == "copied":
+                    stats["bytes"] += stat.st_size
+            except FileNotFoundError:
+                continue  # Deleted (e.g. by a history delete) while exporting
+        complete = True
+    finally:
+        # Record progress even if interrupted, so the next run picks up from here
+        _save_manifest(dest, files if complete else dict(previous, **files))
+    return stats
+
+
+def archive_format(path):
+    """Return "zip", "tar" or "tar.gz" for an archive path, or raise ValueError."""
+    name = path.lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith((".tar.gz", ".tgz")):
+        return "tar.gz"
+    if name.endswith(".tar"):
+        return "tar"
+    raise ValueError("Archive must be a .zip, .tar or .tar.gz file!")
+
+
+def write_archive(path, generated=(), trees=()):
+    """Stream files into a single archive at path.
+
+    generated is a list of (arcname, producer) pairs; producer(f) writes the
+    member's bytes to the binary file object f. trees is a list of
+    (directory, arc_prefix) pairs whose files are added under arc_prefix.
+    Returns the number of members written.
+    """
+    fmt = archive_format(path)
+    count = 0
+    tmp_path = path + ".part"
+    try:
+        if fmt == "zip":
+            with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+                for arcname, producer in generated:
+                    with zf.open(arcname, "w", force_zip64=True) as f:
+                        producer(f)
+                    count += 1
+                for file_path, arcname in _tree_files(trees):
+                    stored = os.path.splitext(file_path)[1].lower() in STORED_EXTENSIONS
+                    try:
+                        zf.write(file_path, arcname,
+                                 compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+                    except FileNotFoundError:
+                        continue  # Deleted while exporting; nothing was written for it yet
+                    count += 1
+        else:
+            mode = "w:gz" if fmt == "tar.gz" else "w"
+            with tarfile.open(tmp_path, mode) as tf:
+                for arcname, producer in generated:
+                    # Tar headers need the size up front, so spool to a temporary file first
+                    with tempfile.TemporaryFile() as spool:
+                        producer(spool)
+                        info = tarfile.TarInfo(arcname)
+                        info.size = spool.tell()
+                        info.mtime = int(time.time())
+                        spool.seek(0)
+                        tf.addfile(info, spool)
+                    count += 1
+                for file_path, arcname in _tree_files(trees):
+                    try:
+                        tf.add(file_path, arcname, recursive=False)
+                    except FileNotFoundError:
+                        continue  # Deleted while exporting; nothing was written for it yet
+                    count += 1
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def _tree_files(trees):
+    for directory, prefix in trees:
+        if not os.path.isdir(directory):
+            continue
+        for file_path, rel in _walk(directory):
+            yield file_path, prefix + rel.replace(os.sep, "/")
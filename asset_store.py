@@ -0,0 +1,194 @@
+"""Content-addressed storage for generated QR images and uploaded logos.
+
+Every asset is stored once under the SHA-256 of its bytes, sharded two
+levels deep so no directory grows past a few thousand files even with
+millions of assets::
+
+    assets/3f/a2/3fa2...e9.png
+
+Identical images or logos therefore share one file. History entries refer to
+assets through their ``output_path`` and ``logo_path`` fields; the store keeps
+a reference count per path so deleting an entry can reclaim files nothing
+else uses. ``gc`` sweeps the whole directory for orphans, including the
+timestamp-named files (``qr_<ts>.png``, ``logo_<ts>.png``) written by older
+versions, which are otherwise left where they are.
+
+Usage:
+    python asset_store.py --dry-run
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from persistence import NEW_FILE_MODE
+
+ASSET_DIR = "assets"
+ASSET_FIELDS = ("output_path", "logo_path")
+
+_MANAGED_NAME = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$")
+_LEGACY_NAME = re.compile(r"^(qr|logo)_\d+\.png$")
+_SHARD_DIR = re.compile(r"^[0-9a-f]{2}(/[0-9a-f]{2})?$")
+
+
+class AssetStore:
+    def __init__(self, root=ASSET_DIR):
+        self.root = root
+        self.refs = Counter()
+        # put_bytes runs on worker threads, release on the Tk thread. Paths
+        # handed out by put_bytes but not yet acquired are pinned so a release
+        # in between can't delete a file a new entry is about to reference.
+        self._lock = threading.Lock()
+        self._pinned = set()
+
+    def path_for(self, digest, ext=".png"):
+        return f"{self.root}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    def put_bytes(self, data, ext=".png"):
+        """Store data (if not already present) and return its path.
+
+        The file is kept until an entry referring to it is acquired.
+        """
+        path = self.path_for(hashlib.sha256(data).hexdigest(), ext)
+        with self._lock:
+            self._pinned.add(self._key(path))
+            self._write(path, data)
+        return path
+
+    @staticmethod
+    def _write(path, data):
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.chmod(tmp_path, NEW_FILE_MODE)  # mkstemp makes it owner-only
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def _relative(self, path):
+        rel = os.path.relpath(os.path.normpath(path), os.path.normpath(self.root))
+        return rel.replace(os.sep, "/")
+
+    def is_managed(self, path):
+        """True for content-addressed files inside this store."""
+        return bool(path) and bool(_MANAGED_NAME.match(self._relative(path)))
+
+    def _key(self, path):
+        # History paths are relative to the working directory while gc walks
+        # paths under root, which may be spelled differently (e.g. absolute)
+        return os.path.normcase(os.path.realpath(path))
+
+    def track(self, entries):
+        """Rebuild the reference counts from a full set of history entries."""
+        with self._lock:
+            self.refs = Counter()
+        for entry in entries:
+            self.acquire(entry)
+
+    def acquire(self, entry):
+        with self._lock:
+            for field in ASSET_FIELDS:
+                path = entry.get(field)
+                if path:
+                    key = self._key(path)
+                    self.refs[key] += 1
+                    self._pinned.discard(key)
+
+    def release(self, entry, keep=()):
+        """Drop an entry's references and delete store files nothing else uses.
+
+        Paths in keep (e.g. the logo currently selected in the form) are never
+        deleted. Returns the deleted paths.
+        """
+        keep = {self._key(path) for path in keep if path}
+        removed = []
+        with self._lock:
+            for field in ASSET_FIELDS:
+                path = entry.get(field)
+                if not path:
+                    continue
+                key = self._key(path)
+                self.refs[key] -= 1
+                if self.refs[key] > 0:
+                    continue
+                del self.refs[key]
+                if key not in keep and key not in self._pinned and self.is_managed(path):
+                    try:
+                        os.remove(path)
+                        removed.append(path)
+                    except FileNotFoundError:
+                        pass
+        return removed
+
+    def gc(self, roots=(), grace=3600, dry_run=False):
+        """Delete unreferenced store files and legacy timestamped assets.
+
+        Files modified within the last grace seconds are kept, so a render
+        that has been written but not yet recorded in history is safe.
+        Returns a dict with the number of files and bytes reclaimed.
+        """
+        with self._lock:
+            live = set(self.refs) | self._pinned | {self._key(path) for path in roots if path}
+        cutoff = time.time() - grace
+        stats = {"removed": 0, "bytes": 0, "kept": 0}
+        if not os.path.isdir(self.root):
+            return stats
+        for directory, dirs, files in os.walk(self.root, topdown=False):
+            for name in files:
+                path = os.path.join(directory, name)
+                rel = self._relative(path)
+                leftover = name.endswith(".tmp") and rel.count("/") == 2
+                if not (leftover or _MANAGED_NAME.match(rel) or _LEGACY_NAME.match(rel)):
+                    continue
+                try:
+                    stat = os.stat(path)
+                    if self._key(path) in live or stat.st_mtime > cutoff:
+                        stats["kept"] += 1
+                        continue
+                    if not dry_run:
+                        os.remove(path)
+                except FileNotFoundError:
+                    continue  # Renamed into place or released while sweeping
+                stats["removed"] += 1
+                stats["bytes"] += stat.st_size
+            # Drop shard directories emptied by the sweep
+            if not dry_run and _SHARD_DIR.match(self._relative(directory)) and not os.listdir(directory):
+                os.rmdir(directory)
+        return stats
+
+
+def main(argv=None):
+    from history_store import HistoryStore
+
+    parser = argparse.ArgumentParser(description="Reclaim asset files no longer referenced by the QR history.")
+    parser.add_argument("--assets", default=ASSET_DIR, help="Asset directory to sweep")
+    parser.add_argument("--history", default="logs/qr_history.jsonl", help="History log holding the references")
+    parser.add_argument("--grace", type=float, default=3600, help="Keep files modified within this many seconds")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.history)
+    assets = AssetStore(args.assets)
+    try:
+        assets.track(store.load())
+    finally:
+        store.close()
+    stats = assets.gc(grace=args.grace, dry_run=args.dry_run)
+    verb = "Would remove" if args.dry_run else "Removed"
+    print(f"{verb} {stats['removed']} files ({stats['bytes'] / 1e6:.1f} MB); {stats['kept']} still referenced or recent")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
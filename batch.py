@@ -0,0 +1,254 @@
+"""Bulk QR generation from CSV or JSONL files.
+
+Each input row names a QR type (column ``qr_type``) and carries that type's
+input fields (see ``qr_engine.QR_FIELDS``). Optional style columns
+``qr_color``, ``box_size``, ``border``, ``watermark`` and ``logo_path``
+override the command-line defaults, and ``filename`` sets the output name.
+
+Rows are streamed from disk and rendered across a process pool with a bounded
+number of jobs in flight, so memory stays flat however long the input is.
+Workers write their images directly and only a small result record travels
+back. Failed rows are recorded in the manifest instead of stopping the run.
+
+Every code is checked for scannability after rendering (see qr_verify). By
+default a code that fails is re-rendered with error correction H and, if
+needed, a smaller logo; with ``--verify check`` it is rejected instead.
+
+Usage:
+    python batch.py tickets.csv --out build/tickets --workers 8
+"""
+import argparse
+import concurrent.futures
+import csv
+import json
+import os
+import sys
+import time
+
+import qr_engine
+import qr_verify
+
+STYLE_FIELDS = ("qr_color", "box_size", "border", "watermark", "logo_path")
+
+VERIFY_MODES = ("fix", "check", "off")
+
+DEFAULT_STYLE = {
+    "qr_color": "#000000",
+    "box_size": 10,
+    "border": 4,
+    "watermark": True,
+    "logo_path": None
+}
+
+
+def parse_bool(value):
+    """Interpret CSV-style truthy strings ("1", "true", "yes", "on")."""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def iter_rows(path):
+    """Yield (row_number, row_dict) pairs from a CSV or JSONL file lazily."""
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as f:
+            for row_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    row = {"_error": f"Invalid JSON: {e}"}
+                if not isinstance(row, dict):
+                    row = {"_error": "Row must be a JSON object"}
+                yield row_number, row
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row_number, row in enumerate(csv.DictReader(f), start=1):
+                yield row_number, row
+
+
+def row_inputs(row, defaults):
+    """Split an input row into (fields, style), filling style from defaults."""
+    # JSONL rows may nest fields under "fields"; CSV rows are always flat
+    fields = dict(row["fields"]) if isinstance(row.get("fields"), dict) else {}
+    for key, value in row.items():
+        if key not in STYLE_FIELDS and key not in ("qr_type", "fields", "filename"):
+            fields.setdefault(key, value)
+
+    style = dict(defaults)
+    for key in STYLE_FIELDS:
+        value = row.get(key)
+        if value not in (None, ""):
+            style[key] = value
+    style["watermark"] = parse_bool(style["watermark"])
+    return fields, style
+
+
+def _inside(path, directory):
+    # Rejects "../x.png", absolute paths and symlinked escapes in the filename column
+    directory = os.path.realpath(directory)
+    return os.path.commonpath([directory, os.path.realpath(path)]) == directory
+
+
+def _filename_error(filename, output_path, output_dir, manifest_path):
+    if not isinstance(filename, str):
+        return f"Filename must be a string: {json.dumps(filename)}"
+    if not _inside(output_path, output_dir):
+        return f"Filename must stay inside the output directory: {filename}"
+    if manifest_path and os.path.realpath(output_path) == os.path.realpath(manifest_path):
+        return f"Filename would overwrite the manifest: {filename}"
+    return None
+
+
+def make_job(row_number, row, output_dir, defaults, fmt, verify="fix", full_decode=False, manifest_path=None):
+    """Turn one input row into a picklable job description.
+
+    A bad filename (not a string, outside output_dir, or the manifest's own
+    path) becomes a row error instead of failing the batch.
+    """
+    fields, style = row_inputs(row, defaults)
+    extension = fmt.lower()
+    filename = row.get("filename")
+    if filename is None or filename == "":
+        filename = f"qr_{row_number:06d}.{extension}"
+    output_path = os.path.join(output_dir, filename) if isinstance(filename, str) else None
+    error = row.get("_error") or _filename_error(filename, output_path, output_dir, manifest_path)
+    return {
+        "row": row_number,
+        "qr_type": row.get("qr_type", ""),
+        "fields": fields,
+        "style": style,
+        "fmt": fmt,
+        "verify": verify,
+        "decode": full_decode,
+        "error": error,
+        "output_path": output_path
+    }
+
+
+def render_job(job):
+    """Render and write a single job; runs inside a worker process."""
+    result = {"row": job["row"], "qr_type": job["qr_type"]}
+    if job["error"]:
+        result["error"] = job["error"]
+        return result
+    try:
+        payload = qr_engine.build_payload(job["qr_type"], job["fields"])
+        if job["verify"] == "off":
+            data = qr_engine.render_qr(payload, fmt=job["fmt"], **job["style"])
+        else:
+            img, report, settings = qr_verify.render_verified(payload, fix=job["verify"] == "fix",
+                                                              full_decode=job["decode"], **job["style"])
+            result["verify"] = report
+            if not report["ok"]:
+                result["error"] = "Not scannable: " + "; ".join(report["problems"])
+                return result
+            if job["fmt"].upper() in ("SVG", "PDF"):
+                # Verified on the raster render; the vector one has the same geometry
+                data = qr_engine.render_qr(payload, fmt=job["fmt"], **job["style"], **settings)
+            else:
+                data = qr_engine.encode_image(img, job["fmt"])
+        with open(job["output_path"], "wb") as f:
+            f.write(data)
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+    result["output_path"] = job["output_path"]
+    result["bytes"] = len(data)
+    return result
+
+
+def run_batch(input_path, output_dir, workers=None, fmt="PNG", defaults=None,
+              manifest_path=None, max_pending=None, progress=None, verify="fix", full_decode=False):
+    """Render every row of input_path into output_dir using a process pool.
+
+    verify is one of VERIFY_MODES; full_decode also decodes every code
+    (requires zxing-cpp). Returns a summary dict with counts, elapsed time
+    and codes per second. Per-row outcomes are streamed to a JSONL manifest
+    as they complete.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    style = dict(DEFAULT_STYLE)
+    style.update(defaults or {})
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    manifest_path = manifest_path or os.path.join(output_dir, "manifest.jsonl")
+
+    summary = {"total": 0, "ok": 0, "failed": 0, "fixed": 0, "bytes": 0}
+    start = time.perf_counter()
+
+    def record(result, manifest):
+        summary["total"] += 1
+        if "error" in result:
+            summary["failed"] += 1
+        else:
+            summary["ok"] += 1
+            summary["bytes"] += result["bytes"]
+            if result.get("verify", {}).get("fixed"):
+                summary["fixed"] += 1
+        manifest.write(json.dumps(result) + "\n")
+        if progress and summary["total"] % 1000 == 0:
+            progress(summary, time.perf_counter() - start)
+
+    with open(manifest_path, "w", encoding="utf-8") as manifest, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for row_number, row in iter_rows(input_path):
+            job = make_job(row_number, row, output_dir, style, fmt, verify, full_decode, manifest_path)
+            pending.add(pool.submit(render_job, job))
+            if len(pending) >= max_pending:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    record(future.result(), manifest)
+        for future in concurrent.futures.as_completed(pending):
+            record(future.result(), manifest)
+
+    elapsed = time.perf_counter() - start
+    summary["elapsed"] = elapsed
+    summary["codes_per_second"] = summary["total"] / elapsed if elapsed > 0 else 0.0
+    summary["manifest"] = manifest_path
+    return summary
+
+
+def _print_progress(summary, elapsed):
+    rate = summary["total"] / elapsed if elapsed > 0 else 0.0
+    print(f"{summary['total']} rows ({summary['failed']} failed) - {rate:.1f} codes/s", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate QR codes in bulk from a CSV or JSONL file.")
+    parser.add_argument("input", help="CSV or JSONL file with a qr_type column and per-type fields")
+    parser.add_argument("--out", default="batch_output", help="Directory to write images and manifest.jsonl to")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--format", default="PNG", help="Output format: PNG, JPEG, SVG or PDF")
+    parser.add_argument("--color", default=DEFAULT_STYLE["qr_color"], help="Default QR color")
+    parser.add_argument("--box-size", type=int, default=DEFAULT_STYLE["box_size"], help="Default box size")
+    parser.add_argument("--border", type=int, default=DEFAULT_STYLE["border"], help="Default border width")
+    parser.add_argument("--no-watermark", action="store_true", help="Disable the ZyroTech watermark by default")
+    parser.add_argument("--logo", default=None, help="Default logo to place in the center")
+    parser.add_argument("--verify", choices=VERIFY_MODES, default="fix",
+                        help="Re-render codes that may not scan (fix), reject them (check) or skip the check (off)")
+    parser.add_argument("--decode", action="store_true", help="Also decode every code (requires zxing-cpp)")
+    args = parser.parse_args(argv)
+
+    defaults = {
+        "qr_color": args.color,
+        "box_size": args.box_size,
+        "border": args.border,
+        "watermark": not args.no_watermark,
+        "logo_path": args.logo
+    }
+    summary = run_batch(args.input, args.out, workers=args.workers, fmt=args.format.upper(),
+                        defaults=defaults, progress=_print_progress, verify=args.verify, full_decode=args.decode)
+    print(f"Generated {summary['ok']} of {summary['total']} QR codes "
+          f"({summary['failed']} failed, {summary['fixed']} adjusted to scan) in {summary['elapsed']:.2f}s - "
+          f"{summary['codes_per_second']:.1f} codes/s")
+    print(f"Manifest: {summary['manifest']}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Compare qrcode's make_image drawing with qr_engine.rasterize.
+
+Checks that both paths produce identical pixels and reports the time per
+raster (and per PNG encode) for a range of box sizes.
+
+Usage:
+    python benchmarks/bench_raster.py [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import ImageChops
+
+import qr_engine
+
+PAYLOAD = "upi://pay?pa=zyrotech@bank&am=499.00&tn=Benchmark ticket 000123"
+
+
+def best_time(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--color", default="#1e40af")
+    args = parser.parse_args(argv)
+
+    print(f"{'box':>5} {'pixels':>12} {'make_image':>12} {'rasterize':>12} {'speedup':>8} {'png old':>10} {'png new':>10}")
+    for box_size in (1, 10, 50, 200):
+        qr = qr_engine.make_qr(PAYLOAD, box_size, 4)
+        old = qr.make_image(fill_color=args.color, back_color="white").convert("RGB")
+        new = qr_engine.rasterize(qr, args.color)
+        if ImageChops.difference(old, new.convert("RGB")).getbbox() is not None:
+            print(f"box_size={box_size}: rasterize output differs from make_image", file=sys.stderr)
+            return 1
+
+        old_time = best_time(lambda: qr.make_image(fill_color=args.color, back_color="white").convert("RGB"), args.repeat)
+        new_time = best_time(lambda: qr_engine.rasterize(qr, args.color), args.repeat)
+        old_png = best_time(lambda: qr_engine.encode_image(old), args.repeat)
+        new_png = best_time(lambda: qr_engine.encode_image(new), args.repeat)
+        print(f"{box_size:>5} {old.size[0] * old.size[1]:>12} {old_time * 1000:>10.2f}ms {new_time * 1000:>10.2f}ms "
+              f"{old_time / new_time:>7.1f}x {old_png * 1000:>8.1f}ms {new_png * 1000:>8.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
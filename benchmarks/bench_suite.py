@@ -0,0 +1,261 @@
+"""Benchmark suite for the QR generation hot path.
+
+Runs headless against synthetic fixtures (nothing under assets/ or logs/ is
+touched) and covers every stage a generation goes through: payload
+building for each QR type, encoding, rasterizing, watermark, logo, PNG
+encoding, scannability verification, history persistence and history
+search at several sizes.
+
+Results are written as JSON. A second mode compares two result files and
+exits non-zero when any benchmark got slower than the threshold, so it can
+gate dependency upgrades:
+
+    python benchmarks/bench_suite.py run --out before.json
+    python benchmarks/bench_suite.py run --out after.json
+    python benchmarks/bench_suite.py compare before.json after.json --threshold 0.10
+
+History benchmarks default to 1k and 100k entries; pass
+``--sizes 1000,100000,1000000`` for the full run (several GB of RAM).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qrcode
+import PIL
+from PIL import Image
+
+import qr_engine
+import qr_verify
+from history_index import HistoryIndex
+from history_store import HistoryStore
+
+# One synthetic input per QR type
+SAMPLE_FIELDS = {
+    "URL/Plain Text": {"text": "https://zyrotech.example/products/qr-generator?ref=benchmark"},
+    "Payment Request": {"vpa": "zyrotech@bank", "amount": "499.00", "note": "Benchmark ticket 000123"},
+    "WiFi Connection": {"ssid": "ZyroTech-Guest", "wifi_pass": "correct horse battery", "encryption": "WPA"},
+    "vCard Contact": {"name": "Asha Verma", "phone": "+91 98765 43210", "email": "asha@zyrotech.example",
+                      "address": "12 MG Road, Bengaluru"},
+    "TOTP Authentication": {"account": "asha@zyrotech.example", "issuer": "ZyroTech", "secret": "JBSWY3DPEHPK3PXP"},
+    "Event Ticket/Coupon": {"event": "ZyroTech Launch", "datetime": "2025-04-15 18:00", "venue": "Hall B",
+                            "details": "Row 4 Seat 12"},
+    "Secure/Encrypted Text": {"plain": "The vault code is 4471", "key": "benchmark"}
+}
+
+PAYLOAD = "upi://pay?pa=zyrotech@bank&am=499.00&tn=Benchmark ticket 000123"
+COLORS = ["#000000", "#1e40af", "#b91c1c", "#15803d"]
+DEFAULT_SIZES = (1000, 100000)
+
+
+def iter_synthetic_history(count, seed=0, first_id=0):
+    """Deterministic history entries spread over a year, all QR types."""
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1)
+    for i in range(count):
+        qr_type = qr_engine.QR_TYPES[i % len(qr_engine.QR_TYPES)]
+        moment = start + datetime.timedelta(seconds=i * 31536000 // max(count, 1))
+        yield {
+            "id": f"{first_id + i:032x}",
+            "timestamp": moment.strftime("%Y-%m-%d %H:%M:%S"),
+            "qr_type": qr_type,
+            "payload": f"{qr_type.split('/')[0].lower()} item {rng.randrange(10 ** 6):06d} note {rng.randrange(997)}",
+            "qr_color": COLORS[i % len(COLORS)],
+            "box_size": 10,
+            "border": 4,
+            "watermark": True,
+            "logo_path": None,
+            "output_path": f"assets/{i:02x}.png"
+        }
+
+
+def synthetic_history(count, seed=0):
+    return list(iter_synthetic_history(count, seed))
+
+
+def measure(func, repeat, min_time=0.05):
+    """Time func like timeit: calibrate a loop count, then take repeat samples per call."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return {"best": min(samples), "median": statistics.median(samples), "number": number, "repeat": len(samples)}
+
+
+def stage_benchmarks(workdir):
+    """Yield (name, func) for the per-generation stages."""
+    for qr_type, fields in SAMPLE_FIELDS.items():
+        yield f"payload/{qr_type}", lambda qr_type=qr_type, fields=fields: qr_engine.build_payload(qr_type, fields)
+
+    yield "encode/optimal", lambda: qr_engine.make_qr(PAYLOAD)
+
+    def legacy_encode():
+        qr = qrcode.QRCode(version=1)
+        qr.add_data(PAYLOAD)
+        qr.make(fit=True)
+    yield "encode/qrcode", legacy_encode
+
+    qr = qr_engine.make_qr(PAYLOAD)
+    yield "raster/make_image", lambda: qr.make_image(fill_color="#1e40af", back_color="white")
+    yield "raster/rasterize", lambda: qr_engine.rasterize(qr, "#1e40af")
+
+    img = qr_engine.rasterize(qr, "#1e40af").convert("RGB")
+    yield "watermark", lambda: qr_engine.apply_watermark(img)
+
+    logo_path = os.path.join(workdir, "logo.png")
+    Image.new("RGBA", (256, 256), (220, 38, 38, 255)).save(logo_path)
+    yield "logo", lambda: qr_engine.apply_logo(img, logo_path)
+
+    yield "verify", lambda: qr_verify.verify(qr, img, "#1e40af")
+    yield "png_save", lambda: qr_engine.encode_image(img)
+    yield "render/full", lambda: qr_engine.render_qr(PAYLOAD, "#1e40af", logo_path=logo_path)
+
+
+def history_benchmarks(workdir, sizes):
+    """Yield (name, func) for history persistence and search at each size."""
+    for size in sizes:
+        entries = synthetic_history(size)
+        path = os.path.join(workdir, f"history_{size}.jsonl")
+        HistoryStore(path, legacy_path=None)._write_snapshot(entries)
+
+        # Appends go to a copy, so history_load always replays exactly `size` entries
+        append_path = os.path.join(workdir, f"history_{size}_append.jsonl")
+        shutil.copyfile(path, append_path)
+        store = HistoryStore(append_path, legacy_path=None)
+        store.load()
+
+        # Fresh entries (with ids past the fixture's) for the append and index benchmarks
+        extra = iter_synthetic_history(1 << 40, seed=size, first_id=1 << 64)
+        yield f"history_append/{size}", lambda store=store, extra=extra: store.append(next(extra))
+        store_for_load = HistoryStore(path, legacy_path=None)
+        yield f"history_load/{size}", store_for_load.load
+
+        index = HistoryIndex(entries)
+        yield f"filter_text/{size}", lambda index=index: index.query("item 0421")
+        yield f"filter_facets/{size}", lambda index=index: index.query("type:payment from:2025-03-01 to:2025-03-31")
+        yield f"filter_scan/{size}", lambda entries=entries: [
+            e for e in entries if "item 0421" in e["payload"].lower()
+        ]
+        yield f"index_add/{size}", lambda index=index, extra=extra: index.add(next(extra))
+        store.close()
+
+
+def run(args):
+    sizes = [int(size) for size in args.sizes.split(",")] if args.sizes else DEFAULT_SIZES
+    only = args.only.split(",") if args.only else None
+    workdir = tempfile.mkdtemp(prefix="qr-bench-")
+    results = {}
+    try:
+        for benchmarks in (stage_benchmarks(workdir), history_benchmarks(workdir, sizes)):
+            for name, func in benchmarks:
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                results[name] = measure(func, args.repeat)
+                print(f"{name:<45} {_format_time(results[name]['best']):>12}", flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qrcode": _dist_version("qrcode"),
+            "pillow": PIL.__version__,
+            "sizes": list(sizes)
+        },
+        "results": results
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+    return 0
+
+
+def compare(args):
+    with open(args.base, "r", encoding="utf-8") as f:
+        base = json.load(f)["results"]
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)["results"]
+
+    regressions = 0
+    print(f"{'benchmark':<45} {'base':>12} {'new':>12} {'change':>9}")
+    for name in sorted(set(base) | set(new)):
+        if name not in base or name not in new:
+            where = "base" if name in base else "new"
+            print(f"{name:<45} only in {where} run")
+            continue
+        before = base[name]["best"]
+        after = new[name]["best"]
+        change = after / before - 1 if before else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "  faster"
+        print(f"{name:<45} {_format_time(before):>12} {_format_time(after):>12} {change:>+8.1%}{flag}")
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def _format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def _dist_version(name):
+    try:
+        from importlib.metadata import version
+        return version(name)
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the suite and optionally write JSON results")
+    run_parser.add_argument("--out", default=None, help="JSON file to write results to")
+    run_parser.add_argument("--repeat", type=int, default=5, help="Samples per benchmark")
+    run_parser.add_argument("--sizes", default=None, help="Comma-separated history sizes (default 1000,100000)")
+    run_parser.add_argument("--only", default=None, help="Comma-separated benchmark name prefixes to run")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files and flag regressions")
+    compare_parser.add_argument("base", help="Results from the reference run")
+    compare_parser.add_argument("new", help="Results from the candidate run")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown, e.g. 0.10 for 10%%")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""Dynamic QR codes: short redirect URLs whose target can change after printing.
+
+A dynamic code encodes ``<redirect server>/<redirect id>`` instead of its
+target. The history entry keeps the redirect id and the current target, and
+redirect_server.py answers each scan with a redirect to that target, so
+editing the entry's target updates every printed copy.
+"""
+import secrets
+import string
+import urllib.parse
+
+STATIC = "Static"
+DYNAMIC = "Dynamic"
+CODE_KINDS = (STATIC, DYNAMIC)
+DEFAULT_PORT = 8090
+DEFAULT_BASE_URL = f"http://localhost:{DEFAULT_PORT}"
+ID_ALPHABET = string.ascii_letters + string.digits
+ID_LENGTH = 8
+TARGET_SCHEMES = ("http", "https")
+
+
+def new_redirect_id(taken=()):
+    """Return a random short id that is not in taken."""
+    while True:
+        redirect_id = "".join(secrets.choice(ID_ALPHABET) for _ in range(ID_LENGTH))
+        if redirect_id not in taken:
+            return redirect_id
+
+
+def redirect_url(base_url, redirect_id):
+    """The URL a dynamic code encodes."""
+    return f"{base_url.rstrip('/')}/{redirect_id}"
+
+
+def _check_web_address(url, what):
+    url = url.strip()
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme.lower() not in TARGET_SCHEMES or not parts.netloc:
+        raise ValueError(f"{what} must be a web address starting with http:// or https://!")
+    return url
+
+
+def check_target(target):
+    """Validate a dynamic code's target and return it stripped; raises ValueError."""
+    return _check_web_address(target, "The target of a dynamic code")
+
+
+def check_base_url(base_url):
+    """Validate the redirect server address that dynamic codes point at; raises ValueError."""
+    return _check_web_address(base_url, "The redirect server address")
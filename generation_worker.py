@@ -0,0 +1,130 @@
+"""Background worker for QR generation.
+
+Jobs run on a single worker thread so encoding, rendering and file writes
+never block the Tk main loop. Results are passed back through a queue that
+the main loop polls with ``master.after``, and only the most recently
+submitted job is ever delivered: submitting again cancels a job that has
+not started yet and discards the result of one that is already running.
+
+Exports use ExportQueue instead: its jobs run one after another in the
+order they were submitted, and every job's result or error is delivered.
+"""
+import concurrent.futures
+import queue
+
+
+class GenerationWorker:
+    def __init__(self, master, on_busy=None, poll_ms=30):
+        self.master = master
+        self.on_busy = on_busy
+        self.poll_ms = poll_ms
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="qr-generate")
+        self._results = queue.Queue()
+        self._generation = 0
+        self._future = None
+        self._busy = False
+
+    @property
+    def busy(self):
+        return self._busy
+
+    def submit(self, job, on_done, on_error):
+        """Run job() in the background; call on_done(result) or on_error(exc) on the Tk thread."""
+        self._generation += 1
+        generation = self._generation
+        if self._future is not None:
+            self._future.cancel()
+
+        def run():
+            if generation != self._generation:
+                return  # Superseded before it started
+            try:
+                self._results.put((generation, on_done, job()))
+            except Exception as e:
+                self._results.put((generation, on_error, e))
+
+        self._future = self._executor.submit(run)
+        if not self._busy:
+            self._set_busy(True)
+            self.master.after(self.poll_ms, self._poll)
+
+    def cancel(self):
+        """Drop whatever is pending; nothing will be delivered."""
+        self._generation += 1
+        if self._future is not None:
+            self._future.cancel()
+        self._set_busy(False)
+
+    def _set_busy(self, busy):
+        self._busy = busy
+        if self.on_busy:
+            self.on_busy(busy)
+
+    def _poll(self):
+        if not self._busy:
+            return
+        while True:
+            try:
+                generation, callback, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self._generation:
+                self._set_busy(False)
+                callback(value)
+        if self._busy:
+            self.master.after(self.poll_ms, self._poll)
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False)
+
+
+class ExportQueue:
+    """First-in, first-out background jobs whose results are all delivered."""
+
+    def __init__(self, master, on_busy=None, poll_ms=30):
+        self.master = master
+        self.on_busy = on_busy
+        self.poll_ms = poll_ms
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="qr-export")
+        self._results = queue.Queue()
+        self._pending = 0  # Submitted jobs whose callback has not run yet
+        self._polling = False
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def submit(self, job, on_done, on_error):
+        """Queue job() behind earlier jobs; call on_done(result) or on_error(exc) on the Tk thread."""
+        def run():
+            try:
+                self._results.put((on_done, job()))
+            except Exception as e:
+                self._results.put((on_error, e))
+
+        self._executor.submit(run)
+        self._pending += 1
+        if self._pending == 1 and self.on_busy:
+            self.on_busy(True)
+        if not self._polling:
+            self._polling = True
+            self.master.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                callback, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if self._pending == 0 and self.on_busy:
+                self.on_busy(False)
+            callback(value)
+        if self._pending:
+            self.master.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
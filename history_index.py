@@ -0,0 +1,225 @@
+"""Incremental search index over QR history entries.
+
+Text search uses a trigram inverted index over the lowercased QR type,
+payload and (for dynamic codes) target, so a query only touches the postings of its rarest trigram and then
+verifies the (few) candidates. Type and color are kept as facet sets and
+timestamps in a sorted list, so those filters never scan the whole history.
+
+The search box accepts plain text plus optional filters, e.g.::
+
+    upi type:payment color:#000000 from:2025-04-01 to:2025-04-15
+
+A leading ``^`` on the text turns it into a prefix query (the type, the
+payload or the target must start with it).
+"""
+import bisect
+
+SEP = "\x00"  # Field boundary; never typed by users, so it anchors prefixes
+
+# Search box keywords and the search() arguments they map to
+QUERY_FILTERS = {
+    "type": "qr_type",
+    "color": "color",
+    "from": "start",
+    "to": "end"
+}
+
+
+def _entry_text(entry):
+    text = f"{SEP}{entry.get('qr_type', '').lower()}{SEP}{str(entry.get('payload', '')).lower()}{SEP}"
+    if entry.get("target"):
+        text += f"{str(entry['target']).lower()}{SEP}"
+    return text
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def parse_query(query):
+    """Split a search box string into text and filter keyword arguments."""
+    filters = {}
+    words = []
+    for token in query.split():
+        key, sep, value = token.partition(":")
+        key = key.lower()
+        if sep and value and key in QUERY_FILTERS:
+            filters[QUERY_FILTERS[key]] = value
+        else:
+            words.append(token)
+    text = " ".join(words)
+    if text.startswith("^"):
+        filters["prefix"] = True
+        text = text[1:]
+    return text, filters
+
+
+class HistoryIndex:
+    def __init__(self, entries=()):
+        self._entries = {}
+        self._seq = {}
+        self._next_seq = 0
+        self._texts = {}
+        self._keys = {}  # id -> (qr_type, color, timestamp) as indexed
+        self._postings = {}
+        self._by_type = {}
+        self._by_color = {}
+        self._by_time = []  # Sorted (timestamp, seq, id)
+        self._redirects = {}  # id -> redirect id, for dynamic codes
+        self.redirect_ids = set()  # Redirect ids in use, so new dynamic codes never reuse one
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry):
+        """Index a new entry; entries are returned in the order they were added."""
+        if entry["id"] in self._entries:
+            self.remove(entry)
+        self._index(entry, self._next_seq)
+        self._next_seq += 1
+
+    def update(self, entry):
+        """Re-index an entry whose fields changed, keeping its position."""
+        seq = self._seq.get(entry["id"])
+        if seq is None:
+            self.add(entry)
+            return
+        self._unindex(entry["id"])
+        self._index(entry, seq)
+
+    def _index(self, entry, seq):
+        entry_id = entry["id"]
+        text = _entry_text(entry)
+        keys = (entry.get("qr_type", ""), str(entry.get("qr_color", "")).lower(), entry.get("timestamp", ""))
+        self._entries[entry_id] = entry
+        self._seq[entry_id] = seq
+        self._texts[entry_id] = text
+        self._keys[entry_id] = keys
+        for gram in _trigrams(text):
+            self._postings.setdefault(gram, set()).add(entry_id)
+        self._by_type.setdefault(keys[0], set()).add(entry_id)
+        self._by_color.setdefault(keys[1], set()).add(entry_id)
+        bisect.insort(self._by_time, (keys[2], seq, entry_id))
+        if entry.get("redirect_id"):
+            self._redirects[entry_id] = entry["redirect_id"]
+            self.redirect_ids.add(entry["redirect_id"])
+
+    def remove(self, entry):
+        """Drop an entry from every index structure."""
+        entry_id = entry["id"]
+        if entry_id not in self._entries:
+            return
+        self._unindex(entry_id)
+        del self._entries[entry_id]
+        del self._seq[entry_id]
+
+    def position(self, entries, entry):
+        """Index of entry in entries, a list of indexed entries in the order they were added."""
+        seq = self._seq[entry["id"]]
+        lo, hi = 0, len(entries)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._seq[entries[mid]["id"]] < seq:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _unindex(self, entry_id):
+        seq = self._seq[entry_id]
+        qr_type, color, timestamp = self._keys.pop(entry_id)
+        self.redirect_ids.discard(self._redirects.pop(entry_id, None))
+        for gram in _trigrams(self._texts.pop(entry_id)):
+            postings = self._postings[gram]
+            postings.discard(entry_id)
+            if not postings:
+                del self._postings[gram]
+        self._discard_facet(self._by_type, qr_type, entry_id)
+        self._discard_facet(self._by_color, color, entry_id)
+        key = (timestamp, seq, entry_id)
+        pos = bisect.bisect_left(self._by_time, key)
+        if pos < len(self._by_time) and self._by_time[pos] == key:
+            del self._by_time[pos]
+
+    @staticmethod
+    def _discard_facet(facet, key, entry_id):
+        ids = facet.get(key)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del facet[key]
+
+    def _text_candidates(self, needle):
+        """Ids whose indexed text may contain needle (a superset)."""
+        if len(needle) >= 3:
+            grams = sorted(_trigrams(needle), key=lambda g: len(self._postings.get(g, ())))
+            result = None
+            for gram in grams:
+                postings = self._postings.get(gram)
+                if not postings:
+                    return set()
+                result = set(postings) if result is None else result & postings
+                if not result:
+                    break
+            return result
+        # Short needles: union the postings of every trigram containing them
+        result = set()
+        for gram, postings in self._postings.items():
+            if needle in gram:
+                result |= postings
+        return result
+
+    def _type_ids(self, qr_type):
+        """Ids of entries whose type starts with qr_type (case-insensitive)."""
+        wanted = qr_type.lower()
+        result = set()
+        for name, ids in self._by_type.items():
+            if name.lower().startswith(wanted):
+                result |= ids
+        return result
+
+    def _time_ids(self, start, end):
+        lo = bisect.bisect_left(self._by_time, (start,)) if start else 0
+        # An end date includes everything that starts with it, e.g. a whole day
+        hi = bisect.bisect_left(self._by_time, (end + "\uffff",)) if end else len(self._by_time)
+        return {entry_id for _, _, entry_id in self._by_time[lo:hi]}
+
+    def search(self, text="", qr_type=None, color=None, start=None, end=None, prefix=False):
+        """Return matching entries in history order.
+
+        text is matched as a case-insensitive substring of the QR type,
+        payload or target (or as a prefix of one when prefix is true). qr_type
+        matches type names by prefix, color exactly, and start/end compare
+        against the "YYYY-MM-DD HH:MM:SS" timestamps.
+        """
+        candidates = None
+        for ids in self._filter_sets(qr_type, color, start, end):
+            candidates = set(ids) if candidates is None else candidates & ids
+
+        needle = text.lower().strip()
+        if needle:
+            if prefix:
+                needle = SEP + needle
+            matches = self._text_candidates(needle)
+            if candidates is not None:
+                matches = matches & candidates
+            candidates = {entry_id for entry_id in matches if needle in self._texts[entry_id]}
+
+        if candidates is None:
+            return list(self._entries.values())
+        return [self._entries[entry_id] for entry_id in sorted(candidates, key=self._seq.__getitem__)]
+
+    def _filter_sets(self, qr_type, color, start, end):
+        if qr_type:
+            yield self._type_ids(qr_type)
+        if color:
+            yield self._by_color.get(color.lower(), set())
+        if start or end:
+            yield self._time_ids(start, end)
+
+    def query(self, query):
+        """Search using the search box syntax understood by parse_query."""
+        text, filters = parse_query(query)
+        return self.search(text, **filters)
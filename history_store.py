@@ -0,0 +1,315 @@
+"""Append-only QR history log.
+
+History is kept in ``logs/qr_history.jsonl`` as a sequence of operations,
+one JSON object per line:
+
+    {"op": "add", "entry": {...}}              new entry (carries its "id")
+    {"op": "update", "id": "...", "changes": {...}}
+    {"op": "del", "id": "..."}                 tombstone
+
+Every change is a single O(1) append, so a crash can at worst leave a
+truncated last line, which is skipped on load. Once tombstones and updates
+outweigh the live entries the log is compacted by atomically rewriting it
+with only the live entries. The old ``logs/qr_history.json`` is migrated on
+first load.
+
+Another process (the redirect server) can follow the log read-only with
+``refresh()``, which applies only the records appended since it last looked.
+
+Given a ``persistence.Flusher``, appends are buffered in memory and written
+by its background thread once changes settle, instead of on the caller's
+thread. Compactions triggered by ``update``/``delete`` run on that thread
+too.
+"""
+import json
+import os
+import threading
+import uuid
+
+from persistence import atomic_writer
+
+HISTORY_PATH = "logs/qr_history.jsonl"
+LEGACY_HISTORY_PATH = "logs/qr_history.json"
+
+
+def new_entry_id():
+    return uuid.uuid4().hex
+
+
+def _dumps(record):
+    return json.dumps(record, separators=(",", ":"))
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_PATH, legacy_path=LEGACY_HISTORY_PATH,
+                 compact_ratio=1.0, min_compact=1000, fsync=False, flusher=None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_ratio = compact_ratio
+        self.min_compact = min_compact
+        self.fsync = fsync
+        self.flusher = flusher
+        self._entries = {}
+        self._dead = 0  # Log lines that no longer describe a live entry
+        self._file = None
+        self._torn_tail = False
+        self._pending = []  # Log lines waiting for the background flush
+        self._snapshot = None  # Entries for a compaction waiting for the background flush
+        self._pending_lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._offset = 0  # Bytes of the log replayed so far, for refresh()
+        self._file_id = None  # (device, inode) of the replayed log, to notice compactions
+
+    def load(self, on_batch=None, batch_size=5000):
+        """Replay the log (migrating the legacy JSON file if needed) and return the entries.
+
+        If on_batch is given it is called with each batch of newly added
+        entries as the replay goes, so a long history can be shown before it
+        has fully loaded. Later records in the log may still update or delete
+        them; the returned list is the authoritative result.
+        """
+        self.flush()
+        self._entries = {}
+        self._dead = 0
+        self._torn_tail = False
+        if not os.path.exists(self.path) and self.legacy_path and os.path.exists(self.legacy_path):
+            self._migrate_legacy()
+        self._offset = 0
+        self._file_id = None
+        line = b""
+        batch = []
+        try:
+            with open(self.path, "rb") as f:
+                self._file_id = self._identify(os.fstat(f.fileno()))
+                for line in f:
+                    added = self._replay(line)
+                    if line.endswith(b"\n"):
+                        self._offset += len(line)
+                    if added is not None and on_batch is not None:
+                        batch.append(added)
+                        if len(batch) >= batch_size:
+                            on_batch(batch)
+                            batch = []
+                # A crash mid-append leaves a last line without its newline
+                self._torn_tail = bool(line) and not line.endswith(b"\n")
+        except FileNotFoundError:
+            pass
+        if batch:
+            on_batch(batch)
+        return self.entries()
+
+    @staticmethod
+    def _identify(stat):
+        return stat.st_dev, stat.st_ino
+
+    def refresh(self):
+        """Apply the records appended to the log since load() or the last refresh().
+
+        Meant for readers following a log another process writes. Returns the
+        ids of the entries that were added, updated or deleted, in log order,
+        or None when the log was replaced by a compaction (or removed), in
+        which case nothing was applied and the caller should load() again.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if self._identify(stat) != self._file_id or stat.st_size < self._offset:
+                    return None
+                if stat.st_size == self._offset:
+                    return []
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # Leave a line that is still being written for the next refresh
+        data = data[:data.rfind(b"\n") + 1]
+        self._offset += len(data)
+        changed = []
+        for line in data.splitlines():
+            record = self._parse(line)
+            if record is not None:
+                self._apply(record)
+                changed.append(record["entry"]["id"] if record.get("op") == "add" else record.get("id"))
+        return changed
+
+    def _replay(self, line):
+        """Apply one log line; returns the entry if it added a new one."""
+        record = self._parse(line)
+        if record is not None:
+            return self._apply(record)
+
+    def _parse(self, line):
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            # Torn write from a crash; the rest of the log is still valid
+            self._dead += 1
+            return None
+
+    def _apply(self, record):
+        op = record.get("op")
+        if op == "add":
+            entry = record["entry"]
+            replaced = entry["id"] in self._entries
+            if replaced:
+                self._dead += 1
+            self._entries[entry["id"]] = entry
+            return None if replaced else entry
+        elif op == "update":
+            entry = self._entries.get(record["id"])
+            if entry is not None:
+                entry.update(record["changes"])
+            self._dead += 1
+        elif op == "del":
+            if self._entries.pop(record["id"], None) is not None:
+                self._dead += 1
+            self._dead += 1
+
+    def _migrate_legacy(self):
+        """One-time conversion of the old full-rewrite JSON history."""
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        entries = []
+        for entry in legacy:
+            entry = dict(entry)
+            entry.setdefault("id", new_entry_id())
+            entries.append(entry)
+        self._write_snapshot(entries)
+        os.replace(self.legacy_path, self.legacy_path + ".migrated")
+
+    def _write_snapshot(self, entries):
+        """Atomically replace the log with one add record per entry."""
+        with atomic_writer(self.path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(_dumps({"op": "add", "entry": entry}) + "\n")
+
+    def _append(self, record):
+        line = _dumps(record) + "\n"
+        if self.flusher is None:
+            with self._io_lock:
+                self._write_lines([line])
+            return
+        with self._pending_lock:
+            self._pending.append(line)
+        self.flusher.mark_dirty(self.flush)
+
+    def _write_lines(self, lines):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            if self._torn_tail:
+                self._file.write("\n")
+                self._torn_tail = False
+        self._file.write("".join(lines))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def flush(self):
+        """Write any buffered log lines (after a scheduled compaction, if any)."""
+        with self._io_lock:
+            with self._pending_lock:
+                snapshot, self._snapshot = self._snapshot, None
+                lines, self._pending = self._pending, []
+            if snapshot is not None:
+                try:
+                    self._rewrite(snapshot)
+                except BaseException:
+                    # Keep both for the flusher's retry
+                    with self._pending_lock:
+                        if self._snapshot is None:
+                            self._snapshot = snapshot
+                        self._pending[:0] = lines
+                    raise
+            if lines:
+                self._write_lines(lines)
+
+    def entries(self):
+        """Return the live entries in insertion order."""
+        return list(self._entries.values())
+
+    def get(self, entry_id):
+        return self._entries.get(entry_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def append(self, entry):
+        """Add an entry (assigning an id if it has none) and return it."""
+        entry.setdefault("id", new_entry_id())
+        self._append({"op": "add", "entry": entry})
+        self._entries[entry["id"]] = entry
+        return entry
+
+    def update(self, entry_id, changes):
+        """Merge changes into an existing entry."""
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            raise KeyError(entry_id)
+        self._append({"op": "update", "id": entry_id, "changes": changes})
+        entry.update(changes)
+        self._dead += 1
+        self._maybe_compact()
+        return entry
+
+    def delete(self, entry_id):
+        """Write a tombstone for an entry and drop it from memory."""
+        if entry_id not in self._entries:
+            return None
+        self._append({"op": "del", "id": entry_id})
+        entry = self._entries.pop(entry_id)
+        self._dead += 2
+        self._maybe_compact()
+        return entry
+
+    def _maybe_compact(self):
+        if self._dead < max(self.min_compact, len(self._entries) * self.compact_ratio):
+            return
+        if self.flusher is None:
+            self.compact()
+            return
+        # Rewriting the log can take a while; leave it to the flusher thread.
+        # Entries are copied so later edits can't change them mid-write.
+        snapshot = [dict(entry) for entry in self._entries.values()]
+        with self._pending_lock:
+            # The snapshot already reflects anything still buffered
+            self._snapshot = snapshot
+            self._pending = []
+        self._dead = 0
+        self.flusher.mark_dirty(self.flush)
+
+    def compact(self):
+        """Rewrite the log with only the live entries."""
+        with self._io_lock:
+            # The snapshot already reflects anything still buffered
+            with self._pending_lock:
+                self._snapshot = None
+                self._pending = []
+            self._rewrite(self.entries())
+            self._dead = 0
+
+    def _rewrite(self, entries):
+        self._close_file()
+        self._write_snapshot(entries)
+        self._torn_tail = False
+
+    def close(self):
+        self.flush()
+        with self._io_lock:
+            self._close_file()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
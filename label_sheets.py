@@ -0,0 +1,532 @@
+"""Print imposition: lay QR codes out on sheets of labels.
+
+Codes come from a batch input file (the same CSV/JSONL rows as batch.py) or
+from history entries, and are placed on the label grid of a sheet template.
+Each label can carry a caption of one or more lines formatted from the
+row's fields::
+
+    python label_sheets.py tickets.csv --out tickets.pdf --template avery-l7160 \\
+        --caption "{event}" --caption "{venue} - Rs {amount}"
+
+PDF output is vector and written to a single file one page at a time; each
+logo image is stored once and shared by every page that uses it. PNG output
+writes one image per sheet (tickets_0001.png, tickets_0002.png, ...) at
+--dpi. Either way only the page being laid out is held in memory, however
+many labels the job has.
+
+Templates are given in millimetres; --template also accepts a JSON file
+with the same keys as the entries in TEMPLATES.
+"""
+import argparse
+import concurrent.futures
+import itertools
+import json
+import os
+import sys
+import zlib
+
+from PIL import Image, ImageDraw
+
+import batch
+import qr_engine
+import qr_vector
+from persistence import atomic_writer
+
+MM_PER_INCH = 25.4
+PT_PER_MM = 72 / MM_PER_INCH
+LINE_SPACING = 1.25
+MIN_SYMBOL_MM = 8
+
+# page and label sizes; origin is the top-left corner of the first label and
+# pitch the distance from one label to the next, across and down
+TEMPLATES = {
+    "avery-l7160": {"page": (210, 297), "grid": (3, 7), "label": (63.5, 38.1),
+                    "origin": (7.21, 15.15), "pitch": (66.04, 38.1)},
+    "avery-l7163": {"page": (210, 297), "grid": (2, 7), "label": (99.1, 38.1),
+                    "origin": (4.65, 15.15), "pitch": (101.6, 38.1)},
+    "avery-5160": {"page": (215.9, 279.4), "grid": (3, 10), "label": (66.675, 25.4),
+                   "origin": (4.7625, 12.7), "pitch": (69.85, 25.4)},
+    "a4-tickets": {"page": (210, 297), "grid": (2, 5), "label": (90, 50),
+                   "origin": (12.5, 13.5), "pitch": (95, 55)},
+    "a4-squares": {"page": (210, 297), "grid": (4, 6), "label": (45, 45),
+                   "origin": (7.5, 8.5), "pitch": (50, 47)}
+}
+
+TEMPLATE_DEFAULTS = {
+    "padding": 2,       # mm kept clear inside each label edge
+    "caption_size": 8   # pt
+}
+
+DEFAULT_TEMPLATE = "avery-l7160"
+
+SHEET_FORMATS = {
+    ".pdf": "PDF",
+    ".png": "PNG"
+}
+
+FILE_TYPES = [
+    ("PDF files", "*.pdf"),
+    ("PNG sheets", "*.png")
+]
+
+MAX_REPORTED_ERRORS = 100
+
+# Helvetica with the Windows-1252 encoding, so captions can use its accents and dashes
+PDF_FONT = "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+
+
+def load_template(name):
+    """Return a template by name, or read one from a JSON file."""
+    if name in TEMPLATES:
+        template = dict(TEMPLATES[name])
+    elif os.path.isfile(name):
+        try:
+            with open(name, "r", encoding="utf-8") as f:
+                template = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Failed to read label template: {e}")
+    else:
+        raise ValueError(f"Unknown label template: {name}")
+    for key in ("page", "grid", "label", "origin", "pitch"):
+        if key not in template:
+            raise ValueError(f"Label template is missing '{key}'")
+    for key, value in TEMPLATE_DEFAULTS.items():
+        template.setdefault(key, value)
+    return template
+
+
+def label_slots(template):
+    """Top-left corner of every label on a sheet, row by row, in mm."""
+    columns, rows = template["grid"]
+    left, top = template["origin"]
+    across, down = template["pitch"]
+    return [(left + column * across, top + row * down) for row in range(rows) for column in range(columns)]
+
+
+def label_layout(template, caption_lines=0):
+    """Place the symbol and caption inside a label.
+
+    Returns ((x, y, size), caption) in mm from the label's top-left corner,
+    where caption is (x, y, width, align) or None. Wide labels put the
+    caption beside the symbol, others below it.
+    """
+    width, height = template["label"]
+    padding = template["padding"]
+    inner_width = width - 2 * padding
+    inner_height = height - 2 * padding
+    text_height = caption_lines * line_height(template)
+
+    if not caption_lines:
+        size = min(inner_width, inner_height)
+        symbol = (padding + (inner_width - size) / 2, padding + (inner_height - size) / 2, size)
+        caption = None
+    elif inner_width >= inner_height * 1.5:
+        size = min(inner_height, inner_width / 2)
+        symbol = (padding, padding + (inner_height - size) / 2, size)
+        caption = (2 * padding + size, padding + (inner_height - text_height) / 2,
+                   inner_width - size - padding, "left")
+    else:
+        size = min(inner_width, inner_height - text_height - padding)
+        top = padding + (inner_height - size - padding - text_height) / 2
+        symbol = (padding + (inner_width - size) / 2, top, size)
+        caption = (padding, top + size + padding, inner_width, "center")
+
+    if size < MIN_SYMBOL_MM:
+        raise ValueError("Not enough room for the QR code on this label; "
+                         "use fewer caption lines or a larger template!")
+    return symbol, caption
+
+
+def line_height(template):
+    return template["caption_size"] / PT_PER_MM * LINE_SPACING
+
+
+class _Fields(dict):
+    def __missing__(self, key):
+        return ""
+
+
+def check_captions(captions):
+    """Raise ValueError for caption templates that cannot be formatted."""
+    for caption in captions:
+        try:
+            caption.format_map(_Fields())
+        except (ValueError, AttributeError, IndexError) as e:
+            raise ValueError(f"Invalid caption {caption!r}: {e}")
+
+
+def format_captions(captions, fields):
+    """Fill each caption template from fields; missing fields are left blank."""
+    values = _Fields(fields)
+    return [" ".join(caption.format_map(values).split()) for caption in captions]
+
+
+def labels_from_rows(rows, defaults=None, captions=()):
+    """Yield a label for each (row_number, row) of batch input.
+
+    A label is a dict with the row number, payload, style and caption lines,
+    or the row number and an error message when the row cannot be encoded.
+    """
+    style_defaults = dict(batch.DEFAULT_STYLE)
+    style_defaults.update(defaults or {})
+    for row_number, row in rows:
+        if row.get("_error"):
+            yield {"row": row_number, "error": row["_error"]}
+            continue
+        fields, style = batch.row_inputs(row, style_defaults)
+        try:
+            payload = qr_engine.build_payload(row.get("qr_type", ""), fields)
+        except ValueError as e:
+            yield {"row": row_number, "error": str(e)}
+            continue
+        fields.update(row=row_number, qr_type=row.get("qr_type", ""))
+        yield {"row": row_number, "payload": payload, "style": style, "caption": format_captions(captions, fields)}
+
+
+def labels_from_history(entries, captions=()):
+    """Yield a label for each history entry, styled as it was generated.
+
+    The logo is the one the entry records as drawn (None when the code was
+    made without one), never just the logo that happened to be uploaded.
+    """
+    for number, entry in enumerate(entries, start=1):
+        style = {field: entry.get(field, default) for field, default in batch.DEFAULT_STYLE.items()
+                 if field != "logo_path"}
+        style["logo_path"] = entry.get("logo_path") or None
+        yield {"row": number, "payload": entry["payload"], "style": style,
+               "caption": format_captions(captions, entry)}
+
+
+def _fit_text(text, width, measure):
+    """Shorten text with "..." until measure() says it fits in width."""
+    if measure(text) <= width:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if measure(text[:middle].rstrip() + "...") <= width:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + "..." if low else ""
+
+
+def _encode(label):
+    style = label["style"]
+    box_size, border = qr_engine.validate_options(style["box_size"], style["border"])
+    return qr_engine.make_qr(label["payload"], box_size, border, logo=bool(style["logo_path"]))
+
+
+def _pdf_symbol(label):
+    """Worker: (module count, PDF operators) for a label, or an error message."""
+    try:
+        style = label["style"]
+        qr = _encode(label)
+        return qr_vector.pdf_symbol_ops(qr, style["qr_color"], style["watermark"], label.get("logo_name"))
+    except Exception as e:
+        return str(e)
+
+
+def _png_symbol(label):
+    """Worker: the label's symbol as an RGB image of label["pixels"] square, or an error message."""
+    try:
+        style = label["style"]
+        qr = _encode(label)
+        pixels = label["pixels"]
+        # Rasterize close to the final size so scaling only covers the remainder
+        qr.box_size = max(1, pixels // len(qr.get_matrix()))
+        img = qr_engine.style_image(qr, style["qr_color"], style["watermark"], style["logo_path"])
+        if img.size != (pixels, pixels):
+            img = img.resize((pixels, pixels), Image.Resampling.NEAREST)
+        return img.convert("RGB")
+    except Exception as e:
+        return str(e)
+
+
+def _pdf_string(text):
+    # Characters outside Windows-1252 print as "?"
+    text = text.encode("cp1252", "replace").decode("latin-1")
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+class PdfSheetWriter:
+    """Streams sheets into one PDF file, writing each page as it is added."""
+
+    fmt = "PDF"
+    render = staticmethod(_pdf_symbol)
+
+    def __init__(self, f, template, caption_lines=0):
+        self.f = f
+        self.template = template
+        self.symbol, self.caption = label_layout(template, caption_lines)
+        self.page_width, self.page_height = (value * PT_PER_MM for value in template["page"])
+        self.offsets = {}
+        self.pages = []
+        self.logos = {}  # logo path -> (resource name, object number)
+        self._next_number = 5  # 1 catalog, 2 page tree, 3 font, 4 watermark state
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._write_object(3, PDF_FONT)
+        self._write_object(4, qr_vector.PDF_WATERMARK_STATE)
+
+    def _new_number(self):
+        number = self._next_number
+        self._next_number += 1
+        return number
+
+    def _write_object(self, number, dictionary, stream=None):
+        self.offsets[number] = self.f.tell()
+        self.f.write(f"{number} 0 obj\n{dictionary}\n".encode("latin-1"))
+        if stream is not None:
+            self.f.write(b"stream\n" + stream + b"\nendstream\n")
+        self.f.write(b"endobj\n")
+
+    def prepare(self, label):
+        """Store the label's logo in the file on first use and name it for the workers."""
+        logo_path = label["style"]["logo_path"]
+        if logo_path:
+            if logo_path not in self.logos:
+                # Load before taking object numbers, so a bad logo leaves no gap in the table
+                image, mask = qr_vector.pdf_logo_objects(logo_path, self._next_number + 1)
+                image_number = self._new_number()
+                mask_number = self._new_number()
+                self._write_object(image_number, *image)
+                self._write_object(mask_number, *mask)
+                self.logos[logo_path] = (f"Im{len(self.logos) + 1}", image_number)
+            label["logo_name"] = self.logos[logo_path][0]
+
+    def _measure(self, text):
+        return qr_engine.load_font(100).getlength(text) / 100 * self.template["caption_size"]
+
+    def add_page(self, placed):
+        """Write one sheet; placed holds (slot, label, symbol) for each filled label."""
+        sx, sy, size = self.symbol
+        ops = []
+        logos = set()
+        for (x, y), label, (count, symbol) in placed:
+            scale = size * PT_PER_MM / count
+            left = (x + sx) * PT_PER_MM
+            bottom = self.page_height - (y + sy + size) * PT_PER_MM
+            ops.append(f"q {scale:.4f} 0 0 {scale:.4f} {left:.3f} {bottom:.3f} cm")
+            ops.extend(symbol)
+            ops.append("Q")
+            if label.get("logo_name"):
+                logos.add(self.logos[label["style"]["logo_path"]])
+            if self.caption:
+                ops.extend(self._caption_ops(x, y, label["caption"]))
+
+        content = zlib.compress("\n".join(ops).encode("latin-1", "replace"))
+        content_number = self._new_number()
+        self._write_object(content_number, f"<< /Filter /FlateDecode /Length {len(content)} >>", content)
+        resources = "/Font << /F1 3 0 R >> /ExtGState << /GS1 4 0 R >>"
+        if logos:
+            resources += " /XObject << " + " ".join(f"/{name} {number} 0 R" for name, number in sorted(logos)) + " >>"
+        page_number = self._new_number()
+        self._write_object(page_number, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.page_width:.2f} "
+                                        f"{self.page_height:.2f}] /Resources << {resources} >> "
+                                        f"/Contents {content_number} 0 R >>")
+        self.pages.append(page_number)
+
+    def _caption_ops(self, x, y, lines):
+        cx, cy, width, align = self.caption
+        font_size = self.template["caption_size"]
+        height = line_height(self.template)
+        ops = ["0 0 0 rg"]
+        for index, line in enumerate(lines):
+            line = _fit_text(line, width * PT_PER_MM, self._measure)
+            if not line:
+                continue
+            offset = (width * PT_PER_MM - self._measure(line)) / 2 if align == "center" else 0
+            left = (x + cx) * PT_PER_MM + offset
+            # Baseline sits about 80% of the font size below the top of the line
+            top = (y + cy + index * height) * PT_PER_MM + (height * PT_PER_MM - font_size) / 2
+            ops.append(f"BT /F1 {font_size} Tf {left:.3f} {self.page_height - top - font_size * 0.8:.3f} Td "
+                       f"{_pdf_string(line)} Tj ET")
+        return ops
+
+    def close(self):
+        """Write the page tree, catalog and cross-reference table."""
+        kids = " ".join(f"{number} 0 R" for number in self.pages)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>")
+        self._write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self.f.tell()
+        size = self._next_number
+        self.f.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode("ascii"))
+        for number in range(1, size):
+            self.f.write(f"{self.offsets[number]:010d} 00000 n \n".encode("ascii"))
+        self.f.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii"))
+
+
+class PngSheetWriter:
+    """Writes each sheet as its own PNG: <stem>_0001.png, <stem>_0002.png, ..."""
+
+    fmt = "PNG"
+    render = staticmethod(_png_symbol)
+
+    def __init__(self, path, template, caption_lines=0, dpi=300):
+        self.stem = os.path.splitext(path)[0]
+        self.template = template
+        self.dpi = dpi
+        self.symbol, self.caption = label_layout(template, caption_lines)
+        self.page_size = tuple(self._px(value) for value in template["page"])
+        self.symbol_pixels = self._px(self.symbol[2])
+        self.font = qr_engine.load_font(max(1, round(template["caption_size"] / 72 * dpi)))
+        self.paths = []
+
+    def _px(self, mm):
+        return round(mm * self.dpi / MM_PER_INCH)
+
+    def prepare(self, label):
+        label["pixels"] = self.symbol_pixels
+
+    def add_page(self, placed):
+        page = Image.new("RGB", self.page_size, "white")
+        draw = ImageDraw.Draw(page)
+        sx, sy, _ = self.symbol
+        for (x, y), label, symbol in placed:
+            page.paste(symbol, (self._px(x + sx), self._px(y + sy)))
+            if self.caption:
+                self._draw_caption(draw, x, y, label["caption"])
+        path = f"{self.stem}_{len(self.paths) + 1:04d}.png"
+        page.save(path, dpi=(self.dpi, self.dpi))
+        self.paths.append(path)
+
+    def _draw_caption(self, draw, x, y, lines):
+        cx, cy, width, align = self.caption
+        width = self._px(width)
+        height = line_height(self.template)
+        font_pixels = self.template["caption_size"] / 72 * self.dpi
+        for index, line in enumerate(lines):
+            line = _fit_text(line, width, self.font.getlength)
+            if not line:
+                continue
+            offset = (width - self.font.getlength(line)) / 2 if align == "center" else 0
+            top = self._px(y + cy + index * height) + (self._px(height) - font_pixels) / 2
+            draw.text((self._px(x + cx) + offset, top), line, font=self.font, fill="black")
+
+    def close(self):
+        pass
+
+
+def sheet_format(path):
+    """PDF or PNG, from the output file's extension."""
+    fmt = SHEET_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError("Label sheets can be written as .pdf or .png!")
+    return fmt
+
+
+def write_sheets(labels, path, template=DEFAULT_TEMPLATE, caption_lines=0, dpi=300, workers=1,
+                 skip=0, progress=None):
+    """Lay labels out on sheets and write them to path (.pdf or .png).
+
+    skip leaves that many labels free at the start of the first sheet, for
+    reusing a partly used sheet. Symbols are encoded across worker processes
+    one page at a time. Labels that fail are left out and listed (up to
+    MAX_REPORTED_ERRORS) in the returned summary.
+    """
+    template = load_template(template) if isinstance(template, str) else template
+    fmt = sheet_format(path)
+    slots = label_slots(template)
+    if not 0 <= skip < len(slots):
+        raise ValueError(f"Skip must be between 0 and {len(slots) - 1} for this template!")
+    summary = {"labels": 0, "pages": 0, "failed": 0, "errors": []}
+
+    def fail(label, message):
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"row": label["row"], "error": message})
+
+    def usable(labels):
+        for label in labels:
+            if "error" in label:
+                fail(label, label["error"])
+            else:
+                yield label
+
+    def run(writer, mapper):
+        pending = usable(labels)
+        free = slots[skip:]
+        while True:
+            page = []
+            for label in itertools.islice(pending, len(free)):
+                try:
+                    writer.prepare(label)
+                except ValueError as e:
+                    fail(label, str(e))
+                    continue
+                page.append(label)
+            if not page:
+                break
+            placed = []
+            for slot, label, symbol in zip(free, page, mapper(writer.render, page)):
+                if isinstance(symbol, str):
+                    fail(label, symbol)
+                else:
+                    placed.append((slot, label, symbol))
+            writer.add_page(placed)
+            summary["labels"] += len(placed)
+            summary["pages"] += 1
+            if progress:
+                progress(summary)
+            free = slots
+        writer.close()
+
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers) if workers and workers > 1 else None
+    mapper = pool.map if pool else map
+    try:
+        if fmt == "PDF":
+            with atomic_writer(path, "wb") as f:
+                run(PdfSheetWriter(f, template, caption_lines), mapper)
+            summary["outputs"] = [path]
+        else:
+            writer = PngSheetWriter(path, template, caption_lines, dpi)
+            run(writer, mapper)
+            summary["outputs"] = writer.paths
+    finally:
+        if pool:
+            pool.shutdown()
+    return summary
+
+
+def _print_progress(summary):
+    if summary["pages"] % 10 == 0:
+        print(f"{summary['pages']} sheets, {summary['labels']} labels ({summary['failed']} failed)", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lay QR codes from a CSV or JSONL file out on label sheets.")
+    parser.add_argument("input", help="CSV or JSONL file with a qr_type column and per-type fields (as for batch.py)")
+    parser.add_argument("--out", required=True, help="Output .pdf, or .png for one image per sheet")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE,
+                        help=f"Label template name or JSON file (built in: {', '.join(TEMPLATES)})")
+    parser.add_argument("--caption", action="append", default=[],
+                        help="Caption line formatted from the row's fields, e.g. \"{event} - {venue}\"; repeatable")
+    parser.add_argument("--skip", type=int, default=0, help="Labels already used on the first sheet")
+    parser.add_argument("--dpi", type=int, default=300, help="Resolution of PNG sheets")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--color", default=batch.DEFAULT_STYLE["qr_color"], help="Default QR color")
+    parser.add_argument("--border", type=int, default=batch.DEFAULT_STYLE["border"], help="Default border width")
+    parser.add_argument("--no-watermark", action="store_true", help="Disable the ZyroTech watermark by default")
+    parser.add_argument("--logo", default=None, help="Default logo to place in the center")
+    args = parser.parse_args(argv)
+
+    check_captions(args.caption)
+    defaults = {
+        "qr_color": args.color,
+        "border": args.border,
+        "watermark": not args.no_watermark,
+        "logo_path": args.logo
+    }
+    labels = labels_from_rows(batch.iter_rows(args.input), defaults, args.caption)
+    summary = write_sheets(labels, args.out, args.template, caption_lines=len(args.caption), dpi=args.dpi,
+                           workers=args.workers or os.cpu_count() or 1, skip=args.skip, progress=_print_progress)
+    for error in summary["errors"]:
+        print(f"Row {error['row']}: {error['error']}", file=sys.stderr)
+    print(f"Placed {summary['labels']} labels on {summary['pages']} sheets ({summary['failed']} failed)")
+    if summary["outputs"]:
+        print(f"Output: {summary['outputs'][0]}" + (f" ... {summary['outputs'][-1]}" if len(summary["outputs"]) > 1 else ""))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
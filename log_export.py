@@ -0,0 +1,226 @@
+"""Streaming export of QR history in several formats.
+
+Entries are filtered lazily and each format is a generator of text chunks,
+so an export never holds more than one buffer of output in memory however
+long the history is. Supported formats:
+
+    txt      the human-readable block format used by earlier versions
+    csv      one row per entry with a header
+    jsonl    one JSON object per line
+    parquet  columnar, written in row groups (requires pyarrow)
+
+Usage:
+    python log_export.py history.csv --from 2025-04-01 --to 2025-04-30 --type wifi
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+
+FIELDS = ["timestamp", "qr_type", "payload", "qr_color", "box_size", "border", "watermark", "logo_path", "output_path"]
+
+TEXT_LABELS = {
+    "timestamp": "Timestamp",
+    "qr_type": "QR Type",
+    "payload": "Payload",
+    "qr_color": "QR Color",
+    "box_size": "Box Size",
+    "border": "Border",
+    "watermark": "Watermark",
+    "logo_path": "Logo Path",
+    "output_path": "Output Path"
+}
+
+EXTENSIONS = {
+    ".txt": "txt",
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet"
+}
+
+FILE_TYPES = [
+    ("Text files", "*.txt"),
+    ("CSV files", "*.csv"),
+    ("JSON Lines files", "*.jsonl"),
+    ("Parquet files", "*.parquet")
+]
+
+BUFFER_SIZE = 1 << 20
+ROW_GROUP_SIZE = 65536
+
+
+def filter_entries(entries, qr_type=None, start=None, end=None):
+    """Yield entries matching the filters, in order.
+
+    qr_type matches type names by case-insensitive prefix and start/end
+    compare against the "YYYY-MM-DD HH:MM:SS" timestamps; an end date
+    includes everything that starts with it, e.g. a whole day.
+    """
+    wanted = qr_type.lower() if qr_type else None
+    for entry in entries:
+        if wanted and not entry.get("qr_type", "").lower().startswith(wanted):
+            continue
+        timestamp = entry.get("timestamp", "")
+        if start and timestamp < start:
+            continue
+        if end and timestamp[:len(end)] > end:
+            continue
+        yield entry
+
+
+def text_chunks(entries):
+    for entry in entries:
+        lines = [f"{TEXT_LABELS[field]}: {entry.get(field)}\n" for field in FIELDS]
+        lines.append("-" * 50 + "\n")
+        yield "".join(lines)
+
+
+def csv_chunks(entries):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for entry in entries:
+        writer.writerow(["" if entry.get(field) is None else entry.get(field) for field in FIELDS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(entries):
+    for entry in entries:
+        yield json.dumps({field: entry.get(field) for field in FIELDS}, ensure_ascii=False) + "\n"
+
+
+FORMATTERS = {
+    "txt": text_chunks,
+    "csv": csv_chunks,
+    "jsonl": jsonl_chunks
+}
+
+
+def format_for(path):
+    """Pick the export format from a file name, defaulting to text."""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), "txt")
+
+
+class _Counter:
+    """Pass entries through while counting them."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.count = 0
+
+    def __iter__(self):
+        for entry in self.entries:
+            self.count += 1
+            yield entry
+
+
+def write_text(f, entries, fmt="txt", buffer_size=BUFFER_SIZE):
+    """Write entries to an open text file, batching chunks into buffer_size writes.
+
+    Returns the number of entries written.
+    """
+    counter = _Counter(entries)
+    pending = []
+    pending_size = 0
+    for chunk in FORMATTERS[fmt](counter):
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= buffer_size:
+            f.write("".join(pending))
+            pending = []
+            pending_size = 0
+    if pending:
+        f.write("".join(pending))
+    return counter.count
+
+
+def _parquet_value(field, value):
+    if field in ("box_size", "border"):
+        return None if value is None else int(value)
+    if field == "watermark":
+        return None if value is None else bool(value)
+    return None if value is None else str(value)
+
+
+def write_parquet(path, entries, row_group_size=ROW_GROUP_SIZE):
+    """Write entries to a Parquet file one row group at a time."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:  # Parquet export is optional and pyarrow is slow to import
+        raise ValueError("Parquet export requires the pyarrow package!")
+    schema = pyarrow.schema([
+        (field, pyarrow.int64() if field in ("box_size", "border")
+         else pyarrow.bool_() if field == "watermark" else pyarrow.string())
+        for field in FIELDS
+    ])
+    count = 0
+    columns = {field: [] for field in FIELDS}
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for entry in entries:
+            for field in FIELDS:
+                columns[field].append(_parquet_value(field, entry.get(field)))
+            count += 1
+            if count % row_group_size == 0:
+                writer.write_table(pyarrow.table(columns, schema=schema))
+                columns = {field: [] for field in FIELDS}
+        if columns["timestamp"] or count == 0:
+            writer.write_table(pyarrow.table(columns, schema=schema))
+    return count
+
+
+def export(entries, path, fmt=None, qr_type=None, start=None, end=None, buffer_size=BUFFER_SIZE):
+    """Export (filtered) entries to path and return how many were written.
+
+    fmt defaults to the one implied by the file extension. The file is
+    written under a temporary name and renamed into place when complete.
+    """
+    fmt = fmt or format_for(path)
+    if fmt not in FORMATTERS and fmt != "parquet":
+        raise ValueError(f"Unknown export format: {fmt}")
+    entries = filter_entries(entries, qr_type, start, end)
+    tmp_path = path + ".tmp"
+    try:
+        if fmt == "parquet":
+            count = write_parquet(tmp_path, entries)
+        else:
+            with open(tmp_path, "w", encoding="utf-8", newline="" if fmt == "csv" else None) as f:
+                count = write_text(f, entries, fmt, buffer_size)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def main(argv=None):
+    from history_store import HistoryStore
+
+    parser = argparse.ArgumentParser(description="Export QR history as text, CSV, JSONL or Parquet.")
+    parser.add_argument("output", help="File to write; the format follows the extension unless --format is given")
+    parser.add_argument("--format", choices=sorted(list(FORMATTERS) + ["parquet"]), default=None, help="Output format")
+    parser.add_argument("--history", default="logs/qr_history.jsonl", help="History log to read")
+    parser.add_argument("--type", default=None, help="Only entries whose QR type starts with this")
+    parser.add_argument("--from", dest="start", default=None, help="Earliest timestamp, e.g. 2025-04-01")
+    parser.add_argument("--to", dest="end", default=None, help="Latest timestamp or date, inclusive")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.history, legacy_path=None)
+    store.load()
+    try:
+        count = export(store, args.output, fmt=args.format, qr_type=args.type, start=args.start, end=args.end)
+    finally:
+        store.close()
+    print(f"Exported {count} entries to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,33 @@
+import time
+
+STARTED = time.perf_counter()  # Reference point for --startup-profile
+
 import tkinter as tk
-from tkinter import ttk, messagebox, colorchooser, filedialog
-import qrcode
-from PIL import Image, ImageTk, ImageDraw, ImageFont
-import base64
+from tkinter import ttk, messagebox, colorchooser, filedialog, simpledialog
+from PIL import Image, ImageTk
 import os
-import time
+import sys
 import json
 import datetime
-import shutil  # For sharing QR code
+import contextlib
+import io
+import queue
+import threading
+from collections import OrderedDict
+
+import qr_engine
+import dynamic_codes
+from history_store import HistoryStore, new_entry_id
+from history_index import HistoryIndex, parse_query
+from virtual_listbox import VirtualListbox
+from render_cache import RenderCache
+from generation_worker import ExportQueue, GenerationWorker
+import perf_trace
+from asset_store import AssetStore
+from persistence import Flusher, JsonDocument
+from usage_stats import UsageStats
+from animation import Animator
+from qr_engine import simple_encrypt  # Re-exported for existing imports of main.simple_encrypt
 
 # Ensure assets, logs, and user_data folders exist
 if not os.path.exists("assets"):
@@ -17,89 +37,191 @@ if not os.path.exists("logs"):
 if not os.path.exists("user_data"):
     os.makedirs("user_data")
 
-def simple_encrypt(plaintext, key):
-    key_bytes = key.encode('utf-8')
-    plaintext_bytes = plaintext.encode('utf-8')
-    encrypted_bytes = bytearray()
-    for i, byte in enumerate(plaintext_bytes):
-        encrypted_bytes.append(byte ^ key_bytes[i % len(key_bytes)])
-    return base64.urlsafe_b64encode(encrypted_bytes).decode('utf-8')
-
 class AdvancedQRGenerator(ttk.Frame):
-    def __init__(self, master=None, plugin_mode=False, *args, **kwargs):
+    def __init__(self, master=None, plugin_mode=False, fast_start=False, startup_profile=None, reduced_motion=False,
+                 *args, **kwargs):
         super().__init__(master, *args, **kwargs)
         self.master = master
         self.plugin_mode = plugin_mode
+        self.startup_profile = startup_profile
 
         # Default global settings
         self.qr_color = "#000000"
         self.include_watermark = tk.BooleanVar(value=True)
         self.include_logo = tk.BooleanVar(value=False)
+        self.record_timings = tk.BooleanVar(value=False)  # Append per-stage timings to logs/metrics.jsonl
+        self.profile_next = tk.BooleanVar(value=False)  # Profile the next generation only
+        self.verify_scans = tk.BooleanVar(value=True)  # Check each code still scans; adjust it if not
+        self.reduce_motion = tk.BooleanVar(value=reduced_motion)  # Turn fade and zoom effects off
         self.box_size = tk.IntVar(value=10)
         self.border = tk.IntVar(value=4)
         self.logo_path = None
         self.current_theme = "dark"
 
         # QR type selection options
-        self.qr_types = [
-            "URL/Plain Text",
-            "Payment Request",
-            "WiFi Connection",
-            "vCard Contact",
-            "TOTP Authentication",
-            "Event Ticket/Coupon",
-            "Secure/Encrypted Text"
-        ]
+        self.qr_types = list(qr_engine.QR_TYPES)
         self.selected_qr_type = tk.StringVar(value=self.qr_types[0])
         
         # Dictionary to hold dynamic input widget references
         self.inputs = {}
-        self.saved_data = {qr_type: {} for qr_type in self.qr_types}  # To save user inputs
+        # Saved inputs and history are written in the background by one shared flusher
+        self.flusher = Flusher()
+        self.saved_inputs = JsonDocument("user_data/saved_inputs.json",
+                                         default={qr_type: {} for qr_type in self.qr_types}, flusher=self.flusher)
         self.load_saved_data()
+        self.usage = UsageStats(flusher=self.flusher).load()
 
-        # Animation variables
-        self.fade_alpha = 0
-        self.scale_factor = 0.8
+        # Fades and zooms share one frame clock; skipped while a render or export is running
+        self.animator = Animator(self.master, reduced_motion=reduced_motion,
+                                 busy=lambda: self.generation_worker.busy or self.export_worker.busy)
 
         # QR code history
+        self.history_store = HistoryStore(flusher=self.flusher)
+        self.asset_store = AssetStore()
+        self.render_cache = RenderCache()
+        self.current_image = None  # Full-size image behind the preview
+        self.current_image_path = None
+        self.current_render = None  # Payload and style behind the preview, for vector export
+        self.preview_cache = OrderedDict()  # (path, preview size) -> thumbnail
         self.qr_history = []
-        self.filtered_history = []  # For search functionality
-        self.load_history()
+        self.filtered_history = self.qr_history  # For search functionality; shares the list when unfiltered
+        self.history_index = HistoryIndex()
+        self.history_loaded = False
+        self._pending_history = []  # Generated while the history was still loading
+        if not fast_start:
+            self.load_history()
 
         # Build UI
         self._build_ui()
+        self._mark_startup("ui built")
+
+        if fast_start:
+            # Show the window first, then replay the history in the background
+            self.master.after_idle(self.load_history_async)
+        self.master.after_idle(self._on_first_frame)
         
         # Make the UI responsive
         self.master.bind("<Configure>", self._resize_ui)
 
     def load_saved_data(self):
         """Load previously saved user data from a JSON file."""
-        try:
-            with open("user_data/saved_inputs.json", "r") as f:
-                self.saved_data = json.load(f)
-        except FileNotFoundError:
-            pass
+        self.saved_data = self.saved_inputs.load()  # To save user inputs
+        for qr_type in self.qr_types:
+            self.saved_data.setdefault(qr_type, {})
 
     def save_user_data(self):
-        """Save user inputs to a JSON file."""
-        with open("user_data/saved_inputs.json", "w") as f:
-            json.dump(self.saved_data, f, indent=4)
+        """Schedule a background save of the user inputs (only written if they changed)."""
+        self.saved_inputs.mark_dirty()
 
     def load_history(self):
-        """Load QR code generation history from a JSON file."""
-        try:
-            with open("logs/qr_history.json", "r") as f:
-                self.qr_history = json.load(f)
-                self.filtered_history = self.qr_history.copy()
-        except FileNotFoundError:
-            self.qr_history = []
-            self.filtered_history = []
-
-    def save_history(self):
-        """Save QR code generation history to a JSON file."""
-        with open("logs/qr_history.json", "w") as f:
-            json.dump(self.qr_history, f, indent=4)
-        self.filtered_history = self.qr_history.copy()
+        """Load QR code generation history from the append-only history log."""
+        self.qr_history = self.history_store.load()
+        self.history_index = HistoryIndex(self.qr_history)
+        self.asset_store.track(self.qr_history)
+        if self.usage.needs_backfill:
+            self.usage.backfill(self.qr_history)
+        # Without a search the list view shares the history list itself
+        self.filtered_history = self.qr_history
+        self.history_loaded = True
+
+    def load_history_async(self):
+        """Replay the history log on a background thread, filling the list as batches arrive."""
+        results = queue.Queue()
+
+        def run():
+            try:
+                entries = self.history_store.load(on_batch=lambda batch: results.put(("batch", batch)))
+                self.asset_store.track(entries)
+                if self.usage.needs_backfill:
+                    self.usage.backfill(entries)
+                results.put(("done", (entries, HistoryIndex(entries))))
+            except Exception as e:
+                results.put(("error", e))
+
+        threading.Thread(target=run, name="qr-history-load", daemon=True).start()
+        self.master.after(30, self._poll_history_load, results)
+
+    def _poll_history_load(self, results):
+        while True:
+            try:
+                kind, value = results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "batch":
+                # Provisional view; replaced by the full history once loading finishes
+                self.qr_history.extend(value)
+                self.history_listbox.set_items(self.qr_history)
+                self.stats_label.config(text=f"Total QR Codes: {len(self.qr_history)} (loading...)")
+                continue
+            if kind == "done":
+                self.qr_history, self.history_index = value
+            else:
+                messagebox.showerror("Error", f"Failed to load history: {value}")
+                self.qr_history, self.history_index = [], HistoryIndex()
+            self.filtered_history = self.qr_history
+            self.history_loaded = True
+            pending, self._pending_history = self._pending_history, []
+            for entry in pending:
+                self.add_history_entry(entry)
+            self.filter_history()
+            self.stats_label.config(text=f"Total QR Codes: {len(self.qr_history)}")
+            self._mark_startup(f"history loaded ({len(self.qr_history)} entries)")
+            self._report_startup()
+            return
+        self.master.after(30, self._poll_history_load, results)
+
+    def _history_loading(self):
+        """Tell the user and return True while the history is still loading."""
+        if self.history_loaded:
+            return False
+        messagebox.showinfo("Please Wait", "History is still loading. Please try again in a moment.")
+        return True
+
+    def _mark_startup(self, name):
+        if self.startup_profile is not None:
+            self.startup_profile.mark(name)
+
+    def _report_startup(self):
+        if self.startup_profile is not None:
+            print(self.startup_profile.report(), file=sys.stderr)
+
+    def _on_first_frame(self):
+        self._mark_startup("first frame")
+        if self.history_loaded:
+            self._report_startup()
+
+    def add_history_entry(self, entry):
+        """Append a new entry to the history log and the list view."""
+        entry.setdefault("id", new_entry_id())
+        if not self.history_loaded:
+            # Recorded once the background load finishes; shown right away
+            self._pending_history.append(entry)
+            self.qr_history.append(entry)
+            self.history_listbox.item_inserted(len(self.qr_history) - 1)
+            return
+        self.history_store.append(entry)
+        self.history_index.add(entry)
+        self.asset_store.acquire(entry)
+        self.qr_history.append(entry)
+        if self.filtered_history is self.qr_history:
+            self.history_listbox.item_inserted(len(self.qr_history) - 1)
+        else:
+            self.filter_history()
+
+    def remove_history_entry(self, entry, index):
+        """Write a tombstone for an entry and drop it (at index in the list view) from memory."""
+        if self.filtered_history is self.qr_history:
+            position = index
+        else:
+            position = self.history_index.position(self.qr_history, entry)
+        self.history_store.delete(entry["id"])
+        self.history_index.remove(entry)
+        # Reclaim the entry's image (and logo) unless another entry or the form still uses it
+        self.asset_store.release(entry, keep=(self.logo_path, self.current_image_path))
+        del self.qr_history[position]
+        if self.filtered_history is not self.qr_history:
+            del self.filtered_history[index]
+        self.history_listbox.item_removed(index)
 
     def _build_ui(self):
         self.master.title("ZyroTech | Advanced QR Code Generator")
@@ -170,8 +292,13 @@ class AdvancedQRGenerator(ttk.Frame):
         ttk.Entry(search_frame, textvariable=self.search_var, style="TEntry").pack(side="right", fill="x", expand=True)
 
         ttk.Label(sidebar_frame, text="History", font=("Arial", 16, "bold"), style="TLabel").pack(pady=10)
-        self.history_listbox = tk.Listbox(sidebar_frame, font=("Arial", 12))
-        self.history_listbox.pack(fill="both", expand=True, padx=10, pady=5)
+        history_list_frame = ttk.Frame(sidebar_frame, style="TFrame")
+        history_list_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        history_scrollbar = ttk.Scrollbar(history_list_frame, orient="vertical")
+        history_scrollbar.pack(side="right", fill="y")
+        self.history_listbox = VirtualListbox(history_list_frame, formatter=self._format_history_row, font=("Arial", 12), yscrollcommand=history_scrollbar.set)
+        self.history_listbox.pack(side="left", fill="both", expand=True)
+        history_scrollbar.configure(command=self.history_listbox.yview)
         self.history_listbox.bind("<<ListboxSelect>>", self.show_history_details)
         
         # History action buttons
@@ -184,9 +311,12 @@ class AdvancedQRGenerator(ttk.Frame):
         # Export options
         export_frame = ttk.Frame(sidebar_frame, style="TFrame")
         export_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Button(export_frame, text="View Statistics", command=self.show_statistics, style="TButton").pack(fill="x", pady=2)
         ttk.Button(export_frame, text="Export Logs", command=self.export_logs, style="TButton").pack(fill="x", pady=2)
         ttk.Button(export_frame, text="Export User Data", command=self.export_user_data, style="TButton").pack(fill="x", pady=2)
         ttk.Button(export_frame, text="Export All", command=self.export_all, style="TButton").pack(fill="x", pady=2)
+        ttk.Button(export_frame, text="Export All as Archive", command=self.export_archive, style="TButton").pack(fill="x", pady=2)
+        ttk.Button(export_frame, text="Print Label Sheets", command=self.print_label_sheets, style="TButton").pack(fill="x", pady=2)
 
         # Left Frame: Controls and dynamic inputs
         left_frame = ttk.Frame(self.main_paned, style="TFrame")
@@ -220,6 +350,11 @@ class AdvancedQRGenerator(ttk.Frame):
         
         ttk.Button(options_frame, text="Upload Logo", command=self.upload_logo, style="TButton").pack(fill="x", pady=5)
         ttk.Checkbutton(options_frame, text="Include Logo in Center", variable=self.include_logo, style="TCheckbutton").pack(anchor="w", pady=5)
+        ttk.Checkbutton(options_frame, text="Verify Scannability", variable=self.verify_scans, style="TCheckbutton").pack(anchor="w", pady=5)
+        ttk.Checkbutton(options_frame, text="Reduce Motion", variable=self.reduce_motion, style="TCheckbutton",
+                        command=lambda: self.animator.set_reduced_motion(self.reduce_motion.get())).pack(anchor="w", pady=5)
+        ttk.Checkbutton(options_frame, text="Record Generation Timings", variable=self.record_timings, style="TCheckbutton").pack(anchor="w", pady=5)
+        ttk.Checkbutton(options_frame, text="Profile Next Generation", variable=self.profile_next, style="TCheckbutton").pack(anchor="w", pady=5)
         
         # Dynamic Input Frame
         dynamic_border_frame = tk.Frame(left_frame, bd=2)
@@ -234,6 +369,11 @@ class AdvancedQRGenerator(ttk.Frame):
         ttk.Button(btn_frame, text="Save Image", command=self.save_image, style="TButton").pack(side="left", fill="x", expand=True, padx=5)
         ttk.Button(btn_frame, text="Clear", command=self.clear, style="TButton").pack(side="left", fill="x", expand=True, padx=5)
         
+        # Progress indicator shown while a QR code renders in the background
+        self.progress = ttk.Progressbar(left_frame, mode="indeterminate")
+        self.generation_worker = GenerationWorker(self.master, on_busy=self._set_generating)
+        self.export_worker = ExportQueue(self.master, on_busy=self._set_generating)  # Every export runs and reports
+        
         # Right Frame: Image preview, details, and share option
         right_frame = ttk.Frame(self.main_paned, style="TFrame")
         self.main_paned.add(right_frame, weight=2)
@@ -331,44 +471,34 @@ class AdvancedQRGenerator(ttk.Frame):
     def update_dynamic_frame(self, event=None):
         # Save current inputs before switching
         qrtype = self.selected_qr_type.get()
-        for key, widget in self.inputs.items():
-            if isinstance(widget, ttk.Entry):
-                self.saved_data[qrtype][key] = widget.get()
-            elif isinstance(widget, ttk.Combobox):
-                self.saved_data[qrtype][key] = widget.get()
-        self.save_user_data()
+        with self.saved_inputs.editing() as saved_data:
+            for key, widget in self.inputs.items():
+                if isinstance(widget, ttk.Entry):
+                    saved_data[qrtype][key] = widget.get()
+                elif isinstance(widget, ttk.Combobox):
+                    saved_data[qrtype][key] = widget.get()
         
         self.fade_out_dynamic_frame()
 
     def fade_out_dynamic_frame(self):
-        self.fade_alpha = 1.0
-        self._fade_out_step()
-
-    def _fade_out_step(self):
-        if self.fade_alpha > 0:
-            self.fade_alpha -= 0.1
-            hex_value = f"{max(0, int(self.fade_alpha * 255)):02x}"
-            for widget in self.dynamic_frame.winfo_children():
-                widget.configure(foreground=f"#{hex_value}{hex_value}{hex_value}")
-            self.master.after(50, self._fade_out_step)
-        else:
-            for widget in self.dynamic_frame.winfo_children():
-                widget.destroy()
-            self.inputs.clear()
-            self._build_dynamic_inputs()
-            self.fade_in_dynamic_frame()
+        # Shares a key with the fade in, so switching types mid-fade turns it around instead of stacking
+        self.animator.animate("dynamic_frame", self._set_dynamic_frame_alpha, 1.0, 0.0, 0.5,
+                              done=self._rebuild_dynamic_frame)
+
+    def _rebuild_dynamic_frame(self):
+        for widget in self.dynamic_frame.winfo_children():
+            widget.destroy()
+        self.inputs.clear()
+        self._build_dynamic_inputs()
+        self.fade_in_dynamic_frame()
 
     def fade_in_dynamic_frame(self):
-        self.fade_alpha = 0.0
-        self._fade_in_step()
+        self.animator.animate("dynamic_frame", self._set_dynamic_frame_alpha, 0.0, 1.0, 0.5)
 
-    def _fade_in_step(self):
-        if self.fade_alpha < 1:
-            self.fade_alpha += 0.1
-            hex_value = f"{max(0, int(self.fade_alpha * 255)):02x}"
-            for widget in self.dynamic_frame.winfo_children():
-                widget.configure(foreground=f"#{hex_value}{hex_value}{hex_value}")
-            self.master.after(50, self._fade_in_step)
+    def _set_dynamic_frame_alpha(self, alpha):
+        hex_value = f"{max(0, int(alpha * 255)):02x}"
+        for widget in self.dynamic_frame.winfo_children():
+            widget.configure(foreground=f"#{hex_value}{hex_value}{hex_value}")
 
     def _build_dynamic_inputs(self):
         qrtype = self.selected_qr_type.get()
@@ -378,6 +508,15 @@ class AdvancedQRGenerator(ttk.Frame):
             self.inputs["text"] = ttk.Entry(self.dynamic_frame, style="TEntry")
             self.inputs["text"].pack(fill="x", pady=3)
             self.inputs["text"].insert(0, self.saved_data[qrtype].get("text", ""))
+            # Dynamic codes encode a redirect whose target can be changed after printing
+            ttk.Label(self.dynamic_frame, text="Code Kind:", style="TLabel").pack(anchor="w", pady=3)
+            self.inputs["code_kind"] = ttk.Combobox(self.dynamic_frame, values=dynamic_codes.CODE_KINDS, state="readonly", style="TCombobox")
+            self.inputs["code_kind"].pack(fill="x", pady=3)
+            self.inputs["code_kind"].set(self.saved_data[qrtype].get("code_kind", dynamic_codes.STATIC))
+            ttk.Label(self.dynamic_frame, text="Redirect Server (dynamic codes):", style="TLabel").pack(anchor="w", pady=3)
+            self.inputs["redirect_base"] = ttk.Entry(self.dynamic_frame, style="TEntry")
+            self.inputs["redirect_base"].pack(fill="x", pady=3)
+            self.inputs["redirect_base"].insert(0, self.saved_data[qrtype].get("redirect_base", dynamic_codes.DEFAULT_BASE_URL))
 
         elif qrtype == "Payment Request":
             ttk.Label(self.dynamic_frame, text="Payee VPA (e.g., abc@bank):", style="TLabel").pack(anchor="w", pady=3)
@@ -492,179 +631,176 @@ class AdvancedQRGenerator(ttk.Frame):
             filetypes=[("Image files", "*.png *.jpg *.jpeg *.gif *.bmp")]
         )
         if file_path:
-            self.logo_path = file_path
-            logo_filename = f"assets/logo_{int(time.time())}.png"
-            Image.open(file_path).save(logo_filename)
-            self.logo_path = logo_filename
+            # Stored by content, so uploading the same logo again reuses its file
+            buffer = io.BytesIO()
+            Image.open(file_path).save(buffer, format="PNG")
+            self.logo_path = self.asset_store.put_bytes(buffer.getvalue(), ".png")
             messagebox.showinfo("Success", "Logo uploaded successfully!")
 
-    def apply_watermark(self, img, watermark_text="ZyroTech"):
-        watermark = Image.new("RGBA", img.size)
-        draw = ImageDraw.Draw(watermark)
-        try:
-            font = ImageFont.truetype("arial.ttf", int(img.size[1] * 0.05))
-        except IOError:
-            try:
-                font = ImageFont.truetype("DejaVuSans.ttf", int(img.size[1] * 0.05))
-            except IOError:
-                font = ImageFont.load_default()
-        bbox = draw.textbbox((0, 0), watermark_text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        position = (img.size[0] - text_width - 10, img.size[1] - text_height - 10)
-        draw.text(position, watermark_text, font=font, fill=(255, 255, 255, 128))
-        watermarked = Image.alpha_composite(img.convert("RGBA"), watermark)
-        return watermarked.convert("RGB")
-
-    def apply_logo(self, img):
-        if not self.logo_path:
-            messagebox.showwarning("Warning", "No logo uploaded! Please upload a logo first.")
-            return img
-        
-        try:
-            logo = Image.open(self.logo_path).convert("RGBA")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load logo: {e}")
-            return img
-        
-        qr_width, qr_height = img.size
-        logo_size = int(min(qr_width, qr_height) * 0.2)
-        logo = logo.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
-        
-        logo_position = ((qr_width - logo_size) // 2, (qr_height - logo_size) // 2)
-        qr_rgba = img.convert("RGBA")
-        qr_rgba.paste(logo, logo_position, logo)
-        return qr_rgba.convert("RGB")
+    def _collect_inputs(self):
+        """Read the current dynamic input widgets into a plain dict."""
+        return {key: widget.get() for key, widget in self.inputs.items()}
 
     def generate_qr(self):
         qrtype = self.selected_qr_type.get()
-        payload = ""
+        trace = perf_trace.GenerationTrace()
         
         try:
-            box_size = self.box_size.get()
-            border = self.border.get()
-            if box_size < 1 or border < 0:
-                raise ValueError
+            box_size, border = qr_engine.validate_options(self.box_size.get(), self.border.get())
         except (tk.TclError, ValueError):
             messagebox.showerror("Error", "Box Size must be a positive integer and Border must be a non-negative integer!")
             return
         
-        if qrtype == "URL/Plain Text":
-            text = self.inputs.get("text").get().strip()
-            if not text:
-                messagebox.showerror("Error", "Please enter text or URL!")
-                return
-            payload = text
-
-        elif qrtype == "Payment Request":
-            vpa = self.inputs.get("vpa").get().strip()
-            amount = self.inputs.get("amount").get().strip()
-            note = self.inputs.get("note").get().strip()
-            if not vpa or not amount:
-                messagebox.showerror("Error", "Please enter at least the VPA and amount!")
-                return
-            payload = f"upi://pay?pa={vpa}&am={amount}&tn={note}"
-
-        elif qrtype == "WiFi Connection":
-            ssid = self.inputs.get("ssid").get().strip()
-            wifi_pass = self.inputs.get("wifi_pass").get().strip()
-            encryption = self.inputs.get("encryption").get().strip()
-            if not ssid:
-                messagebox.showerror("Error", "Please enter the SSID!")
-                return
-            payload = f"WIFI:T:{encryption};S:{ssid};P:{wifi_pass};;"
-
-        elif qrtype == "vCard Contact":
-            name = self.inputs.get("name").get().strip()
-            phone = self.inputs.get("phone").get().strip()
-            email = self.inputs.get("email").get().strip()
-            address = self.inputs.get("address").get().strip()
-            if not name:
-                messagebox.showerror("Error", "Please enter the name!")
-                return
-            payload = f"BEGIN:VCARD\nVERSION:3.0\nN:{name}\nTEL:{phone}\nEMAIL:{email}\nADR:{address}\nEND:VCARD"
-
-        elif qrtype == "TOTP Authentication":
-            account = self.inputs.get("account").get().strip()
-            issuer = self.inputs.get("issuer").get().strip()
-            secret = self.inputs.get("secret").get().strip()
-            if not account or not issuer or not secret:
-                messagebox.showerror("Error", "Please fill in all TOTP fields!")
-                return
-            payload = f"otpauth://totp/{issuer}:{account}?secret={secret}&issuer={issuer}"
+        inputs = self._collect_inputs()
+        redirect = None
+        try:
+            with trace.stage("payload"):
+                if qrtype == "URL/Plain Text" and inputs.get("code_kind") == dynamic_codes.DYNAMIC:
+                    if self._history_loading():
+                        return  # Ids in the unloaded part of the history aren't known yet
+                    payload, redirect = self._new_redirect(inputs)
+                else:
+                    payload = qr_engine.build_payload(qrtype, inputs)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
 
-        elif qrtype == "Event Ticket/Coupon":
-            event = self.inputs.get("event").get().strip()
-            datetime_val = self.inputs.get("datetime").get().strip()
-            venue = self.inputs.get("venue").get().strip()
-            details = self.inputs.get("details").get().strip()
-            if not event or not datetime_val:
-                messagebox.showerror("Error", "Please enter at least the event name and date/time!")
-                return
-            payload = f"Event: {event}\nDate/Time: {datetime_val}\nVenue: {venue}\nDetails: {details}"
+        logo_path = None
+        if self.include_logo.get():
+            if not self.logo_path:
+                messagebox.showwarning("Warning", "No logo uploaded! Please upload a logo first.")
+            else:
+                logo_path = self.logo_path
 
-        elif qrtype == "Secure/Encrypted Text":
-            plain = self.inputs.get("plain").get().strip()
-            key = self.inputs.get("key").get().strip()
-            if not plain or not key:
-                messagebox.showerror("Error", "Please provide both text and an encryption key!")
-                return
-            payload = simple_encrypt(plain, key)
-
-        # Generate QR code
-        qr = qrcode.QRCode(
-            version=1,
-            box_size=box_size,
-            border=border
+        options = {
+            "qr_color": self.qr_color,
+            "box_size": box_size,
+            "border": border,
+            "watermark": self.include_watermark.get()
+        }
+        preview_size = self._preview_size()
+        profile = self.profile_next.get()
+        self.profile_next.set(False)
+        verify = self.verify_scans.get()
+
+        # Render in the background; clicking again supersedes this request
+        self.generation_worker.submit(
+            lambda: self._render_job(payload, options, logo_path, preview_size, trace, profile, verify),
+            on_done=lambda result: self._on_generated(qrtype, payload, options, logo_path, result, trace, redirect),
+            on_error=lambda e: messagebox.showerror("Error", str(e))
         )
-        qr.add_data(payload)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color=self.qr_color, back_color="white").convert("RGB")
-        
-        if self.include_watermark.get():
-            img = self.apply_watermark(img)
-        
-        if self.include_logo.get():
-            img = self.apply_logo(img)
-        
-        # Save QR code with timestamp
-        timestamp = int(time.time())
-        img_path = f"assets/qr_{timestamp}.png"
-        img.save(img_path)
 
+    def _new_redirect(self, inputs):
+        """Pick a redirect id for a dynamic code; returns (payload, history fields)."""
+        target = dynamic_codes.check_target(inputs.get("text", ""))
+        base_url = dynamic_codes.check_base_url(inputs.get("redirect_base", ""))
+        redirect_id = dynamic_codes.new_redirect_id(self.history_index.redirect_ids)
+        self.history_index.redirect_ids.add(redirect_id)  # Reserved while the code renders
+        return dynamic_codes.redirect_url(base_url, redirect_id), {"redirect_id": redirect_id, "target": target}
+
+    def _render_job(self, payload, options, logo_path, preview_size, trace, profile=False, verify=False):
+        """Worker-thread half of generate_qr: render, verify, save and prepare the preview."""
+        profiler = perf_trace.Profiler() if profile else contextlib.nullcontext()
+        report = None
+        settings = {}
+        with perf_trace.activate(trace), profiler:
+            # Served from the render cache for repeat requests (bypassed when profiling)
+            cache = RenderCache(directory=None) if profile else self.render_cache
+            if verify:
+                # Adjusted codes are cached too, so repeats skip the retries
+                key, data, img, report, settings = cache.render_verified(payload, logo_path=logo_path, **options)
+            else:
+                key, data, img = cache.render_image(payload, logo_path=logo_path, **options)
+
+            # Save QR code under its content address; identical renders share one file
+            with trace.stage("save"):
+                img_path = self.asset_store.put_bytes(data, ".png")
+
+            with trace.stage("preview"):
+                preview = self._make_preview(img, preview_size)
+
+        return {
+            "output_path": img_path,
+            "image": img,
+            "bytes": len(data),
+            "preview": preview,
+            "preview_size": preview_size,
+            "scan_report": report,
+            "settings": settings,  # Extra render options verification chose, e.g. a higher ECC level
+            "profile_path": profiler.report_path if profile else None
+        }
+
+    def _on_generated(self, qrtype, payload, options, logo_path, result, trace, redirect=None):
+        """Tk-thread half of generate_qr: record history and show the preview."""
         # Log the generation
         log_entry = {
             "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "qr_type": qrtype,
             "payload": payload,
-            "qr_color": self.qr_color,
-            "box_size": box_size,
-            "border": border,
-            "watermark": self.include_watermark.get(),
-            "logo_path": self.logo_path,
-            "output_path": img_path
+            "qr_color": options["qr_color"],
+            "box_size": options["box_size"],
+            "border": options["border"],
+            "watermark": options["watermark"],
+            "logo_path": logo_path,  # The logo actually drawn; None when Include Logo was off
+            "output_path": result["output_path"]
         }
-        self.qr_history.append(log_entry)
-        self.save_history()
-        self.update_history_list()
+        # Recorded so re-renders (vector export) use the settings that passed verification
+        log_entry.update(result["settings"])
+        if redirect:
+            log_entry.update(redirect)
+        with trace.stage("history"):
+            self.add_history_entry(log_entry)
+            if redirect and self.history_loaded:
+                self.history_store.flush()  # So the redirect server can resolve it right away
+            self.usage.record(qrtype, options["qr_color"], bool(logo_path), result["image"].width)
         self.stats_label.config(text=f"Total QR Codes: {len(self.qr_history)}")
         
-        self.show_image(img_path)
+        self._cache_preview(result["output_path"], result["preview_size"], result["preview"])
+        self.current_image = result["image"]
+        self.current_image_path = result["output_path"]
+        self.current_render = dict(options, payload=payload, logo_path=logo_path, **result["settings"])
+        with trace.stage("display"):
+            self._display_preview(result["preview"])
+
+        if self.record_timings.get() or result["profile_path"]:
+            perf_trace.write_metrics(trace.record(entry_id=log_entry["id"], qr_type=qrtype, bytes=result["bytes"],
+                                                  profile=result["profile_path"]))
+        report = result["scan_report"]
+        if report and not report["ok"]:
+            messagebox.showwarning("Warning", "This QR code may not scan reliably: " + "; ".join(report["problems"]))
+        elif report and report["fixed"]:
+            messagebox.showinfo("Adjusted", f"The code was adjusted so it scans reliably ({report['fixed']}).")
+        if result["profile_path"]:
+            messagebox.showinfo("Profile Saved", f"Generation profile written to {result['profile_path']}")
+
+    def _set_generating(self, busy):
+        # Shared by the generation and export workers
+        busy = self.generation_worker.busy or self.export_worker.busy
+        if busy:
+            self.progress.pack(fill="x", pady=5)
+            self.progress.start(10)
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
 
     def filter_history(self, *args):
-        """Filter history based on search term."""
-        search_term = self.search_var.get().lower()
-        self.filtered_history = [
-            entry for entry in self.qr_history
-            if search_term in entry["qr_type"].lower() or search_term in entry["payload"].lower()
-        ]
+        """Filter history based on search term (supports type:, color:, from: and to: filters)."""
+        if not self.history_loaded:
+            return  # Applied once loading finishes
+        query = self.search_var.get()
+        if query.strip():
+            self.filtered_history = self.history_index.query(query)
+        else:
+            self.filtered_history = self.qr_history
         self.update_history_list()
 
+    @staticmethod
+    def _format_history_row(entry):
+        return f"{entry['timestamp']} - {entry['qr_type']}"
+
     def update_history_list(self):
-        """Update the history listbox with QR code generation history."""
-        self.history_listbox.delete(0, tk.END)
-        for entry in self.filtered_history:
-            self.history_listbox.insert(tk.END, f"{entry['timestamp']} - {entry['qr_type']}")
+        """Point the virtualized history list at the current (filtered) history."""
+        self.history_listbox.set_items(self.filtered_history)
 
     def show_history_details(self, event=None):
         """Show details of the selected QR code from history."""
@@ -677,6 +813,10 @@ class AdvancedQRGenerator(ttk.Frame):
         details = f"Timestamp: {entry['timestamp']}\n"
         details += f"QR Type: {entry['qr_type']}\n"
         details += f"Payload: {entry['payload']}\n"
+        if entry.get("redirect_id"):
+            scans, last_scan = self.usage.scans(entry["redirect_id"])
+            details += f"Dynamic Target: {entry['target']}\n"
+            details += f"Scans: {scans}" + (f" (last {last_scan})" if last_scan else "") + "\n"
         details += f"QR Color: {entry['qr_color']}\n"
         details += f"Box Size: {entry['box_size']}\n"
         details += f"Border: {entry['border']}\n"
@@ -688,15 +828,56 @@ class AdvancedQRGenerator(ttk.Frame):
         self.details_text.insert(tk.END, details)
         
         self.show_image(entry["output_path"])
+        self.current_render = {
+            "payload": entry["payload"],
+            "qr_color": entry["qr_color"],
+            "box_size": entry["box_size"],
+            "border": entry["border"],
+            "watermark": entry["watermark"],
+            "logo_path": entry["logo_path"]
+        }
+        for field in ("error_correction", "logo_scale"):  # Set when verification adjusted the code
+            if field in entry:
+                self.current_render[field] = entry[field]
+
+    def show_statistics(self):
+        """Show usage statistics from the analytics counters.
+
+        The breakdown covers the search box's from: and to: range, or all time.
+        """
+        _, filters = parse_query(self.search_var.get())
+        start, end = filters.get("start"), filters.get("end")
+        today = datetime.date.today()
+        week_start = (today - datetime.timedelta(days=6)).isoformat()
+        stats = self.usage.query(start, end)
+
+        details = f"Generated today: {self.usage.query(today.isoformat(), today.isoformat())['total']}\n"
+        details += f"Last 7 days: {self.usage.query(week_start)['total']}\n"
+        details += f"All time: {self.usage.generations}\n"
+        if start or end:
+            details += f"\nFrom {start or 'the start'} to {end or 'now'}: {stats['total']}\n"
+        for title, dimension, limit in (("By QR Type", "qr_type", None), ("Top Colors", "color", 5),
+                                        ("With Logo", "logo", None), ("Output Size", "size", None)):
+            counts = sorted(stats[dimension].items(), key=lambda item: -item[1])[:limit]
+            details += f"\n{title}:\n" + "".join(f"  {key}: {count}\n" for key, count in counts)
+
+        self.details_text.delete(1.0, tk.END)
+        self.details_text.insert(tk.END, details)
 
     def update_history_entry(self):
         """Update the selected history entry."""
+        if self._history_loading():
+            return
         selection = self.history_listbox.curselection()
         if not selection:
             messagebox.showwarning("Warning", "Please select a history entry to update!")
             return
         index = selection[0]
         entry = self.filtered_history[index]
+        if entry.get("redirect_id"):
+            # Dynamic codes keep their printed code; only the target changes
+            self._update_redirect_target(entry)
+            return
         
         # Load the entry data into the input fields
         self.selected_qr_type.set(entry["qr_type"])
@@ -738,46 +919,60 @@ class AdvancedQRGenerator(ttk.Frame):
         self.include_logo.set(bool(self.logo_path))
 
         # Remove the old entry after updating
-        original_index = self.qr_history.index(entry)
-        self.qr_history.pop(original_index)
-        self.save_history()
-        self.update_history_list()
+        self.remove_history_entry(entry, index)
+
+    def _update_redirect_target(self, entry):
+        """Point a dynamic code at a new target, in place."""
+        target = simpledialog.askstring("Update Target", f"New target for {entry['payload']}:",
+                                        initialvalue=entry["target"], parent=self.master)
+        if target is None:
+            return
+        try:
+            target = dynamic_codes.check_target(target)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.history_store.update(entry["id"], {"target": target})
+        self.history_index.update(entry)
+        self.history_store.flush()  # So the redirect server picks it up right away
+        self.show_history_details()
 
     def delete_history_entry(self):
         """Delete the selected history entry."""
+        if self._history_loading():
+            return
         selection = self.history_listbox.curselection()
         if not selection:
             messagebox.showwarning("Warning", "Please select a history entry to delete!")
             return
         index = selection[0]
         entry = self.filtered_history[index]
-        original_index = self.qr_history.index(entry)
-        self.qr_history.pop(original_index)
-        self.save_history()
-        self.update_history_list()
+        self.remove_history_entry(entry, index)
         self.stats_label.config(text=f"Total QR Codes: {len(self.qr_history)}")
         self.details_text.delete(1.0, tk.END)
 
     def export_logs(self):
-        """Export QR code generation history to a text file."""
+        """Export QR code generation history as text, CSV, JSONL or Parquet.
+
+        The search box's type:, from: and to: filters also apply to the export.
+        """
+        if self._history_loading():
+            return
+        # Only needed for exports, so kept off the startup path
+        import log_export
         file_path = filedialog.asksaveasfilename(
             defaultextension=".txt",
-            filetypes=[("Text files", "*.txt")]
+            filetypes=log_export.FILE_TYPES
         )
         if file_path:
-            with open(file_path, "w") as f:
-                for entry in self.qr_history:
-                    f.write(f"Timestamp: {entry['timestamp']}\n")
-                    f.write(f"QR Type: {entry['qr_type']}\n")
-                    f.write(f"Payload: {entry['payload']}\n")
-                    f.write(f"QR Color: {entry['qr_color']}\n")
-                    f.write(f"Box Size: {entry['box_size']}\n")
-                    f.write(f"Border: {entry['border']}\n")
-                    f.write(f"Watermark: {entry['watermark']}\n")
-                    f.write(f"Logo Path: {entry['logo_path']}\n")
-                    f.write(f"Output Path: {entry['output_path']}\n")
-                    f.write("-" * 50 + "\n")
-            messagebox.showinfo("Success", f"Logs exported to {file_path}")
+            _, filters = parse_query(self.search_var.get())
+            filters = {name: filters[name] for name in ("qr_type", "start", "end") if name in filters}
+            entries = list(self.qr_history)
+            self.export_worker.submit(
+                lambda: log_export.export(entries, file_path, **filters),
+                on_done=lambda count: messagebox.showinfo("Success", f"{count} log entries exported to {file_path}"),
+                on_error=lambda e: messagebox.showerror("Error", f"Export failed: {e}")
+            )
 
     def export_user_data(self):
         """Export user saved data to a JSON file."""
@@ -791,39 +986,103 @@ class AdvancedQRGenerator(ttk.Frame):
             messagebox.showinfo("Success", f"User data exported to {file_path}")
 
     def export_all(self):
-        """Export both logs and user data to a folder."""
+        """Export logs, user data and assets to a folder.
+
+        Assets already exported to that folder are skipped; new ones are
+        linked or copied in the background.
+        """
+        if self._history_loading():
+            return
+        # Only needed for exports, so kept off the startup path
+        import asset_export
+        import log_export
         folder_path = filedialog.askdirectory(title="Select Folder to Export All Data")
         if folder_path:
-            # Export logs
-            log_file = os.path.join(folder_path, "qr_history.txt")
-            with open(log_file, "w") as f:
-                for entry in self.qr_history:
-                    f.write(f"Timestamp: {entry['timestamp']}\n")
-                    f.write(f"QR Type: {entry['qr_type']}\n")
-                    f.write(f"Payload: {entry['payload']}\n")
-                    f.write(f"QR Color: {entry['qr_color']}\n")
-                    f.write(f"Box Size: {entry['box_size']}\n")
-                    f.write(f"Border: {entry['border']}\n")
-                    f.write(f"Watermark: {entry['watermark']}\n")
-                    f.write(f"Logo Path: {entry['logo_path']}\n")
-                    f.write(f"Output Path: {entry['output_path']}\n")
-                    f.write("-" * 50 + "\n")
-            
-            # Export user data
-            user_data_file = os.path.join(folder_path, "user_data.json")
-            with open(user_data_file, "w") as f:
-                json.dump(self.saved_data, f, indent=4)
-            
-            # Copy assets folder
-            assets_dest = os.path.join(folder_path, "assets")
-            if os.path.exists("assets"):
-                shutil.copytree("assets", assets_dest, dirs_exist_ok=True)
+            entries = list(self.qr_history)
+            user_data = json.dumps(self.saved_data, indent=4)
+
+            def job():
+                # Export logs
+                log_export.export(entries, os.path.join(folder_path, "qr_history.txt"))
+                # Export user data
+                with open(os.path.join(folder_path, "user_data.json"), "w") as f:
+                    f.write(user_data)
+                # Bring the exported assets up to date
+                return asset_export.sync_tree("assets", os.path.join(folder_path, "assets"))
+
+            def done(stats):
+                added = stats["copied"] + stats["linked"] + stats["cloned"]
+                messagebox.showinfo("Success", f"All data exported to {folder_path}\n"
+                                               f"{added} new or changed assets, {stats['unchanged']} already up to date")
+
+            self.export_worker.submit(job, on_done=done,
+                                      on_error=lambda e: messagebox.showerror("Error", f"Export failed: {e}"))
+
+    def export_archive(self):
+        """Export logs, user data and assets into a single zip or tar archive."""
+        if self._history_loading():
+            return
+        # Only needed for exports, so kept off the startup path
+        import asset_export
+        import log_export
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".zip",
+            filetypes=asset_export.ARCHIVE_TYPES
+        )
+        if file_path:
+            entries = list(self.qr_history)
+            user_data = json.dumps(self.saved_data, indent=4).encode("utf-8")
+
+            def write_logs(f):
+                text = io.TextIOWrapper(f, encoding="utf-8")
+                log_export.write_text(text, entries)
+                text.detach()  # Flush without closing the archive member
+
+            generated = [("qr_history.txt", write_logs), ("user_data.json", lambda f: f.write(user_data))]
+            self.export_worker.submit(
+                lambda: asset_export.write_archive(file_path, generated, [("assets", "assets/")]),
+                on_done=lambda count: messagebox.showinfo("Success", f"All data exported to {file_path}"),
+                on_error=lambda e: messagebox.showerror("Error", f"Export failed: {e}")
+            )
 
-            messagebox.showinfo("Success", f"All data exported to {folder_path}")
+    def print_label_sheets(self):
+        """Lay the codes listed in the history out on label sheets (PDF or PNG).
+
+        Uses the history as currently filtered, with each code's type and
+        timestamp as its caption.
+        """
+        if self._history_loading():
+            return
+        # Only needed for printing, so kept off the startup path
+        import label_sheets
+        entries = list(self.filtered_history)
+        if not entries:
+            messagebox.showwarning("Warning", "No history entries to print!")
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=label_sheets.FILE_TYPES
+        )
+        if file_path:
+            captions = ["{qr_type}", "{timestamp}"]
+            labels = label_sheets.labels_from_history(entries, captions)
+
+            def done(summary):
+                message = f"{summary['labels']} labels on {summary['pages']} sheet(s) written to {file_path}"
+                if summary["failed"]:
+                    message += f"\n{summary['failed']} could not be placed: {summary['errors'][0]['error']}"
+                messagebox.showinfo("Success", message)
+
+            self.export_worker.submit(
+                lambda: label_sheets.write_sheets(labels, file_path, label_sheets.DEFAULT_TEMPLATE,
+                                                  caption_lines=len(captions)),
+                on_done=done,
+                on_error=lambda e: messagebox.showerror("Error", f"Printing failed: {e}")
+            )
 
     def share_qr_code(self):
         """Share the current QR code (placeholder for sharing functionality)."""
-        if not os.path.exists("assets/current.png"):
+        if self.current_image is None and self.current_image_path is None:
             messagebox.showwarning("Warning", "No QR code to share! Please generate a QR code first.")
             return
         file_path = filedialog.asksaveasfilename(
@@ -831,47 +1090,95 @@ class AdvancedQRGenerator(ttk.Frame):
             filetypes=[("PNG files", "*.png")]
         )
         if file_path:
-            shutil.copy("assets/current.png", file_path)
+            self._export_current(file_path)
             messagebox.showinfo("Success", f"QR code shared to {file_path}")
 
+    def _current_master(self):
+        """The full-size image behind the preview, decoded on first use for history entries."""
+        if self.current_image is None:
+            self.current_image = Image.open(self.current_image_path)
+            self.current_image.load()
+        return self.current_image
+
+    def _export_current(self, file_path):
+        """Encode the current QR code straight to file_path (SVG/PDF are re-rendered as vectors)."""
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension in (".svg", ".pdf") and self.current_render:
+            render = dict(self.current_render)
+            data = qr_engine.render_qr(render.pop("payload"), fmt=extension[1:].upper(), **render)
+        else:
+            fmt = "JPEG" if extension in (".jpg", ".jpeg") else "PNG"
+            data = qr_engine.encode_image(self._current_master(), fmt)
+        with open(file_path, "wb") as f:
+            f.write(data)
+
+    def _preview_size(self):
+        return min(self.image_canvas.winfo_width(), self.image_canvas.winfo_height()) - 20
+
+    @staticmethod
+    def _make_preview(img, max_size):
+        """Shrink an image for the preview with nearest-neighbour sampling.
+
+        QR modules are flat blocks, so nearest-neighbour keeps edges crisp
+        and is far cheaper than LANCZOS; safe to call off the Tk thread.
+        """
+        preview = img.copy()
+        preview.thumbnail((max_size, max_size), Image.Resampling.NEAREST)
+        return preview
+
+    def _cache_preview(self, path, max_size, preview):
+        self.preview_cache[(path, max_size)] = preview
+        self.preview_cache.move_to_end((path, max_size))
+        while len(self.preview_cache) > 64:
+            self.preview_cache.popitem(last=False)
+
+    def _display_preview(self, img):
+        img_tk = ImageTk.PhotoImage(img)
+        self.image_label.config(image=img_tk)
+        self.image_label.image = img_tk
+        
+        self._update_canvas_window()
+        self._zoom_in_image(img.width, img.height)
+
     def show_image(self, path):
+        max_size = self._preview_size()
         try:
-            img = Image.open(path)
-            max_size = min(self.image_canvas.winfo_width(), self.image_canvas.winfo_height()) - 20
-            img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-            img.save("assets/current.png")
-            img_tk = ImageTk.PhotoImage(img)
-            self.image_label.config(image=img_tk)
-            self.image_label.image = img_tk
-            
-            self._update_canvas_window()
-            self.scale_factor = 0.8
-            self._zoom_in_image()
+            preview = self.preview_cache.get((path, max_size))
+            if preview is None:
+                master = Image.open(path)
+                master.load()
+                preview = self._make_preview(master, max_size)
+                self._cache_preview(path, max_size, preview)
+                self.current_image = master
+            else:
+                # Cached thumbnail; the full image is only decoded if exported
+                self.current_image = None
+            self.current_image_path = path
+            self._display_preview(preview)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to display image: {e}")
 
-    def _zoom_in_image(self):
-        if self.scale_factor < 1.0:
-            self.scale_factor += 0.02
-            self.image_canvas.delete(self.image_label_id)
-            self.image_label_id = self.image_canvas.create_window(
-                self.image_canvas.winfo_width() // 2,
-                self.image_canvas.winfo_height() // 2,
-                window=self.image_label,
-                anchor="center"
-            )
-            self.image_canvas.scale(self.image_label_id, self.image_canvas.winfo_width() // 2, self.image_canvas.winfo_height() // 2, self.scale_factor, self.scale_factor)
-            self.master.after(20, self._zoom_in_image)
+    def _zoom_in_image(self, width, height):
+        """Grow the preview's canvas window from 80% to its full size."""
+        def apply(scale):
+            if scale >= 1.0:
+                # Zero hands the size back to the label
+                self.image_canvas.itemconfigure(self.image_label_id, width=0, height=0)
+            else:
+                self.image_canvas.itemconfigure(self.image_label_id, width=int(width * scale), height=int(height * scale))
+        self.animator.animate("preview_zoom", apply, 0.8, 1.0, 0.2)
 
     def save_image(self):
+        if self.current_image is None and self.current_image_path is None:
+            messagebox.showwarning("Warning", "No QR code to save! Please generate a QR code first.")
+            return
         file_path = filedialog.asksaveasfilename(
             defaultextension=".png",
-            filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg")]
+            filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("SVG vector", "*.svg"), ("PDF vector", "*.pdf")]
         )
         if file_path:
             try:
-                img = Image.open("assets/current.png")
-                img.save(file_path)
+                self._export_current(file_path)
                 messagebox.showinfo("Saved", f"Image saved at {file_path}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save image: {e}")
@@ -884,12 +1191,30 @@ class AdvancedQRGenerator(ttk.Frame):
                 widget.set(widget.cget("values")[0])
         self.image_label.config(image="")
         self.image_label.image = None
+        self.current_image = None
+        self.current_image_path = None
+        self.current_render = None
         self.logo_path = None
         self.include_logo.set(False)
         self.details_text.delete(1.0, tk.END)
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ZyroTech Advanced QR Code Generator")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Print how long each startup phase took to stderr")
+    parser.add_argument("--no-fast-start", action="store_true",
+                        help="Load the whole history before showing the window")
+    parser.add_argument("--reduced-motion", action="store_true",
+                        help="Turn off fade and zoom animations (e.g. on low-power kiosks)")
+    args = parser.parse_args()
+
+    startup_profile = perf_trace.StartupProfile(STARTED) if args.startup_profile else None
+    if startup_profile is not None:
+        startup_profile.mark("imports")
     root = tk.Tk()
-    app = AdvancedQRGenerator(master=root, plugin_mode=False)
+    app = AdvancedQRGenerator(master=root, plugin_mode=False, fast_start=not args.no_fast_start,
+                              startup_profile=startup_profile, reduced_motion=args.reduced_motion)
     app.pack(fill="both", expand=True)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
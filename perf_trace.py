@@ -0,0 +1,165 @@
+"""Per-stage timing and on-demand profiling for QR generation.
+
+A GenerationTrace follows one generation from the Generate click to the
+preview on screen. While a trace is active on a thread, ``stage(name)``
+blocks in the hot path (qr_engine, render_cache, main) add their elapsed
+time to it. With no active trace, ``stage`` is a shared no-op context
+manager, so the instrumentation costs next to nothing.
+
+Finished traces can be appended to ``logs/metrics.jsonl``, one JSON object
+per generation. ``Profiler`` wraps a single generation in cProfile and
+tracemalloc and writes a .prof file plus a readable report to
+``logs/profiles/``. StartupProfile collects the milestones reported by
+``main.py --startup-profile``.
+"""
+import contextlib
+import datetime
+import io
+import json
+import os
+import threading
+import time
+
+METRICS_PATH = "logs/metrics.jsonl"
+PROFILE_DIR = "logs/profiles"
+
+_NO_TRACE = contextlib.nullcontext()
+_local = threading.local()
+
+
+class GenerationTrace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}  # Stage name -> milliseconds, in the order first seen
+        self.info = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def note(self, key, value):
+        self.info[key] = value
+
+    def record(self, **fields):
+        """Return a JSON-ready summary of the trace plus any extra fields."""
+        record = {"timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        record.update(fields)
+        record.update(self.info)
+        record["stages_ms"] = {name: round(ms, 3) for name, ms in self.stages.items()}
+        record["total_ms"] = round((time.perf_counter() - self.started) * 1000, 3)
+        return record
+
+
+@contextlib.contextmanager
+def activate(trace):
+    """Make trace the target of stage() and note() on this thread."""
+    previous = getattr(_local, "trace", None)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def stage(name):
+    """Time a block against the active trace, if any."""
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return _NO_TRACE
+    return trace.stage(name)
+
+
+def note(key, value):
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.note(key, value)
+
+
+def write_metrics(record, path=METRICS_PATH):
+    """Append one generation's record to the metrics log."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+class StartupProfile:
+    """Named milestones on the way to a usable window, for --startup-profile."""
+
+    def __init__(self, started):
+        self.started = started
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def report(self):
+        lines = ["Startup profile (from the start of main.py):"]
+        previous = self.started
+        for name, at in self.marks:
+            lines.append(f"  {name:<40} {(at - self.started) * 1000:9.1f} ms  (+{(at - previous) * 1000:.1f} ms)")
+            previous = at
+        return "\n".join(lines)
+
+
+class Profiler:
+    """Capture cProfile and tracemalloc data for the enclosed block.
+
+    On exit, ``prof_path`` holds the raw cProfile dump (for snakeviz or
+    pstats) and ``report_path`` a text summary of the top functions by
+    cumulative time and the top allocation sites.
+    """
+
+    def __init__(self, name="generation", directory=PROFILE_DIR, top=30):
+        self.name = name
+        self.directory = directory
+        self.top = top
+        self.prof_path = None
+        self.report_path = None
+        self._profile = None
+        self._started_tracing = False
+        self._before = None
+
+    def __enter__(self):
+        # Imported here rather than at the top to keep them off the startup path
+        import cProfile
+        import tracemalloc
+
+        self._profile = cProfile.Profile()
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(10)
+        self._before = tracemalloc.take_snapshot()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        import pstats
+        import tracemalloc
+
+        self._profile.disable()
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if self._started_tracing:
+            tracemalloc.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        stem = os.path.join(self.directory, f"{self.name}_{datetime.datetime.now():%Y%m%d_%H%M%S_%f}")
+        self.prof_path = stem + ".prof"
+        self.report_path = stem + ".txt"
+        self._profile.dump_stats(self.prof_path)
+
+        report = io.StringIO()
+        report.write(f"Peak traced memory: {peak / 1024:.1f} KiB\n\n")
+        pstats.Stats(self._profile, stream=report).sort_stats("cumulative").print_stats(self.top)
+        report.write("Top allocations (by size delta):\n")
+        for stat in after.compare_to(self._before, "lineno")[:self.top]:
+            report.write(f"{stat}\n")
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+        return False
@@ -0,0 +1,261 @@
+"""Debounced background persistence, shared by saved inputs and history.
+
+Callers mark state dirty instead of writing it. A single background thread
+waits until changes have been quiet for ``delay`` seconds (or ``max_delay``
+has passed since the first unsaved change) and then runs each dirty
+target's flush once, so a burst of changes costs one write and the Tk thread
+never waits on the disk. Everything still pending is flushed at exit.
+
+Whole-file documents are written to a temporary file and renamed into
+place, so a crash leaves either the previous or the new version on disk,
+never a truncated mix. Documents that another process also rewrites (the
+analytics file, which the redirect server adds scans to) are re-read and
+merged under a lock file just before each write.
+"""
+import atexit
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Read once at import: os.umask() can only be queried by setting it, which
+# isn't safe once other threads are creating files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK  # What open() would give a new file
+
+
+@contextlib.contextmanager
+def atomic_writer(path, mode="w", fsync=True, **open_kwargs):
+    """Yield a file that replaces path only once the block completes."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **open_kwargs) as f:
+            yield f
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        # mkstemp makes the file owner-only; give it the mode the file had (or would get from open())
+        try:
+            file_mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            file_mode = NEW_FILE_MODE
+        os.chmod(tmp_path, file_mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write(path, data, fsync=True):
+    if isinstance(data, bytes):
+        with atomic_writer(path, "wb", fsync) as f:
+            f.write(data)
+    else:
+        with atomic_writer(path, "w", fsync, encoding="utf-8") as f:
+            f.write(data)
+
+
+@contextlib.contextmanager
+def file_lock(path, timeout=10.0, stale=30.0):
+    """Hold ``path + ".lock"`` for the block, to serialize writers in different processes.
+
+    A lock file older than ``stale`` seconds is taken to be left by a crashed
+    process and broken. Raises TimeoutError if the lock stays busy.
+    """
+    lock_path = path + ".lock"
+    directory = os.path.dirname(lock_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            with contextlib.suppress(OSError):
+                if time.time() - os.path.getmtime(lock_path) > stale:
+                    os.remove(lock_path)
+                    continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{lock_path} is held by another process")
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(lock_path)
+
+
+def read_json(path):
+    """Return the parsed file, or None if it is missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class Flusher:
+    """Runs flush callbacks on a background thread after changes settle."""
+
+    def __init__(self, delay=0.5, max_delay=5.0):
+        self.delay = delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._dirty = {}  # flush callable -> (first marked, last marked)
+        self._thread = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def mark_dirty(self, flush):
+        """Schedule flush() to run once changes to its target have settled."""
+        now = time.monotonic()
+        with self._cond:
+            if self._closed:
+                flush_now = True
+            else:
+                flush_now = False
+                first, _ = self._dirty.get(flush, (now, now))
+                self._dirty[flush] = (first, now)
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="qr-persist", daemon=True)
+                    self._thread.start()
+                self._cond.notify()
+        if flush_now:
+            flush()
+
+    def _due(self, marks):
+        first, last = marks
+        return min(last + self.delay, first + self.max_delay)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    now = time.monotonic()
+                    due = [flush for flush, marks in self._dirty.items() if self._due(marks) <= now]
+                    if due:
+                        for flush in due:
+                            del self._dirty[flush]
+                        break
+                    timeout = min(map(self._due, self._dirty.values())) - now if self._dirty else None
+                    self._cond.wait(timeout)
+            for flush in due:
+                self._call(flush)
+
+    def _call(self, flush):
+        try:
+            flush()
+        except Exception:
+            logger.exception("Background save failed; retrying in %.0fs", self.max_delay)
+            retry = time.monotonic() + self.max_delay
+            with self._cond:
+                self._dirty.setdefault(flush, (retry, retry))
+                self._cond.notify()
+
+    def flush_all(self):
+        """Run every pending flush now, on the calling thread."""
+        with self._cond:
+            pending = list(self._dirty)
+            self._dirty.clear()
+        for flush in pending:
+            flush()
+
+    def close(self):
+        """Flush everything and stop the background thread; later marks flush immediately."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush_all()
+
+
+class JsonDocument:
+    """A JSON file mirrored in memory whose edits are saved in the background.
+
+    Edit through ``editing()`` so the background writer never serializes a
+    half-made change. Only content that differs from what was last written
+    reaches the disk, and it is stored compactly (no indentation).
+
+    When another process writes parts of the same file, pass ``merge``: each
+    save then holds the file lock, re-reads the file and calls
+    ``merge(on_disk, data)`` so the other process's parts can be copied in
+    before the data is written.
+    """
+
+    def __init__(self, path, default=None, flusher=None, merge=None):
+        self.path = path
+        self.data = default
+        self.flusher = flusher
+        self.merge = merge
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._saved_text = None
+
+    def load(self):
+        """Read the file, keeping the default if it is missing or unreadable."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                text = f.read()
+            data = json.loads(text)
+        except FileNotFoundError:
+            return self.data
+        except (OSError, ValueError):
+            # Left truncated by an older, non-atomic save; start from the default
+            logger.warning("Ignoring unreadable %s", self.path)
+            return self.data
+        with self._lock:
+            self.data = data
+            self._saved_text = text
+        return self.data
+
+    @contextlib.contextmanager
+    def editing(self):
+        """Yield the data for in-place changes, then schedule a save."""
+        with self._lock:
+            yield self.data
+        self.mark_dirty()
+
+    @contextlib.contextmanager
+    def reading(self):
+        """Yield the data for reading, without scheduling a save."""
+        with self._lock:
+            yield self.data
+
+    def mark_dirty(self):
+        if self.flusher is None:
+            self.flush()
+        else:
+            self.flusher.mark_dirty(self.flush)
+
+    def flush(self):
+        """Write the data now if it differs from what is on disk."""
+        with self._write_lock:
+            if self.merge is None:
+                self._write()
+                return
+            with file_lock(self.path):
+                on_disk = read_json(self.path)
+                if isinstance(on_disk, dict):
+                    with self._lock:
+                        self.merge(on_disk, self.data)
+                self._write()
+
+    def _write(self):
+        with self._lock:
+            text = json.dumps(self.data, separators=(",", ":"))
+        if text == self._saved_text:
+            return
+        atomic_write(self.path, text)
+        self._saved_text = text
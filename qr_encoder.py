@@ -0,0 +1,147 @@
+"""Optimal segmentation and version/ECC selection for QR payloads.
+
+qrcode's own ``add_data`` only splits out numeric/alphanumeric runs of 20+
+characters. Here the payload is segmented with a dynamic program over the
+three modes (numeric, alphanumeric, byte) that minimizes the exact encoded
+bit length, including each segment's mode and length headers. The smallest
+version that fits is then chosen. Because the length-header sizes change at
+versions 10 and 27, the program runs once per version range.
+
+When a logo will cover the center of the symbol, error correction is raised
+to H so the obscured modules stay recoverable.
+"""
+import bisect
+import logging
+
+import qrcode
+from qrcode import util
+
+logger = logging.getLogger(__name__)
+
+NUMERIC = util.MODE_NUMBER
+ALPHANUMERIC = util.MODE_ALPHA_NUM
+BYTE = util.MODE_8BIT_BYTE
+MODES = (BYTE, ALPHANUMERIC, NUMERIC)
+
+DEFAULT_ECC = qrcode.constants.ERROR_CORRECT_M
+LOGO_ECC = qrcode.constants.ERROR_CORRECT_H
+
+# One representative version per range of length-header sizes
+VERSION_RANGES = ((1, 9), (10, 26), (27, 40))
+
+_ALPHANUMERIC_CHARS = frozenset(util.ALPHA_NUM.decode("ascii"))
+_NUMERIC_CHARS = frozenset("0123456789")
+
+
+def _char_cost(mode, char):
+    """Cost of one character in sixths of a bit (so numeric/alnum costs stay integral)."""
+    if mode == NUMERIC:
+        return 20 if char in _NUMERIC_CHARS else None
+    if mode == ALPHANUMERIC:
+        return 33 if char in _ALPHANUMERIC_CHARS else None
+    return len(char.encode("utf-8")) * 48
+
+
+def segment_bits(mode, text, version):
+    """Exact encoded size of one segment, headers included."""
+    header = 4 + util.length_in_bits(mode, version)
+    count = len(text)
+    if mode == NUMERIC:
+        return header + 10 * (count // 3) + (0, 4, 7)[count % 3]
+    if mode == ALPHANUMERIC:
+        return header + 11 * (count // 2) + 6 * (count % 2)
+    return header + 8 * len(text.encode("utf-8"))
+
+
+def optimal_segments(payload, version):
+    """Split payload into [(mode, text), ...] with the fewest bits at this version."""
+    if not payload:
+        return [(BYTE, "")]
+    head_costs = [(4 + util.length_in_bits(mode, version)) * 6 for mode in MODES]
+    previous = list(head_costs)
+    char_modes = []
+    for char in payload:
+        current = [None] * len(MODES)
+        chosen = [None] * len(MODES)
+        # Extend the open segment in each mode that can hold this character
+        for j, mode in enumerate(MODES):
+            cost = _char_cost(mode, char)
+            if cost is not None:
+                current[j] = previous[j] + cost
+                chosen[j] = mode
+        # Or end that segment here and open a new one in another mode
+        for j in range(len(MODES)):
+            for k in range(len(MODES)):
+                if chosen[k] is None:
+                    continue
+                switched = (current[k] + 5) // 6 * 6 + head_costs[j]
+                if chosen[j] is None or switched < current[j]:
+                    current[j] = switched
+                    chosen[j] = MODES[k]
+        char_modes.append(chosen)
+        previous = current
+
+    # Walk back from the cheapest final state
+    best = min((cost, j) for j, cost in enumerate(previous) if char_modes[-1][j] is not None)[1]
+    mode = MODES[best]
+    per_char = [None] * len(payload)
+    for i in range(len(payload) - 1, -1, -1):
+        mode = char_modes[i][MODES.index(mode)]
+        per_char[i] = mode
+
+    segments = []
+    for char, mode in zip(payload, per_char):
+        if segments and segments[-1][0] == mode:
+            segments[-1][1].append(char)
+        else:
+            segments.append((mode, [char]))
+    return [(mode, "".join(chars)) for mode, chars in segments]
+
+
+def plan(payload, error_correction=DEFAULT_ECC):
+    """Return (version, segments) for the smallest symbol that holds payload."""
+    limits = util.BIT_LIMIT_TABLE[error_correction]
+    for low, high in VERSION_RANGES:
+        segments = optimal_segments(payload, low)
+        bits = sum(segment_bits(mode, text, low) for mode, text in segments)
+        version = bisect.bisect_left(limits, bits, low)
+        if version <= high:
+            return version, segments
+    raise ValueError("Data is too long to fit in a QR code!")
+
+
+def choose_error_correction(logo=False):
+    return LOGO_ECC if logo else DEFAULT_ECC
+
+
+def _legacy_version(payload):
+    """Version the previous encoder (qrcode defaults, fit=True) would have used."""
+    qr = qrcode.QRCode(version=1)
+    qr.add_data(payload)
+    qr.best_fit()
+    return qr.version
+
+
+def modules_for(version):
+    return (17 + 4 * version) ** 2
+
+
+def build_qr(payload, box_size=10, border=4, logo=False, error_correction=None):
+    """Create a fully made qrcode.QRCode using the optimal segmentation.
+
+    error_correction overrides the level chosen from the logo flag.
+    """
+    if error_correction is None:
+        error_correction = choose_error_correction(logo)
+    version, segments = plan(payload, error_correction)
+    qr = qrcode.QRCode(version=version, error_correction=error_correction, box_size=box_size, border=border)
+    for mode, text in segments:
+        qr.add_data(util.QRData(text, mode=mode))
+    qr.make(fit=False)
+
+    if logger.isEnabledFor(logging.INFO):
+        legacy = _legacy_version(payload)
+        logger.info("Encoded %d chars as version %d (%d segments, ECC %s): %d modules vs %d before, %d saved",
+                    len(payload), version, len(segments), "MLHQ"[error_correction],
+                    modules_for(version), modules_for(legacy), modules_for(legacy) - modules_for(version))
+    return qr
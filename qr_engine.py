@@ -0,0 +1,345 @@
+"""Headless QR rendering engine.
+
+Builds payloads for every supported QR type and renders them to images or
+encoded bytes without touching Tk or the filesystem layout used by the app.
+"""
+import base64
+import functools
+import hashlib
+import io
+import os
+
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+import perf_trace
+import qr_encoder
+
+
+QR_TYPES = [
+    "URL/Plain Text",
+    "Payment Request",
+    "WiFi Connection",
+    "vCard Contact",
+    "TOTP Authentication",
+    "Event Ticket/Coupon",
+    "Secure/Encrypted Text"
+]
+
+# Input fields accepted by each QR type, in form order
+QR_FIELDS = {
+    "URL/Plain Text": ["text"],
+    "Payment Request": ["vpa", "amount", "note"],
+    "WiFi Connection": ["ssid", "wifi_pass", "encryption"],
+    "vCard Contact": ["name", "phone", "email", "address"],
+    "TOTP Authentication": ["account", "issuer", "secret"],
+    "Event Ticket/Coupon": ["event", "datetime", "venue", "details"],
+    "Secure/Encrypted Text": ["plain", "key"]
+}
+
+DEFAULT_WATERMARK = "ZyroTech"
+LOGO_SCALE = 0.2  # Share of the symbol width covered by a center logo
+
+
+def simple_encrypt(plaintext, key):
+    key_bytes = key.encode('utf-8')
+    plaintext_bytes = plaintext.encode('utf-8')
+    encrypted_bytes = bytearray()
+    for i, byte in enumerate(plaintext_bytes):
+        encrypted_bytes.append(byte ^ key_bytes[i % len(key_bytes)])
+    return base64.urlsafe_b64encode(encrypted_bytes).decode('utf-8')
+
+
+def _field(fields, name, default=""):
+    value = fields.get(name)
+    if value is None:
+        return default
+    return str(value).strip()
+
+
+def _build_text(fields):
+    text = _field(fields, "text")
+    if not text:
+        raise ValueError("Please enter text or URL!")
+    return text
+
+
+def _build_payment(fields):
+    vpa = _field(fields, "vpa")
+    amount = _field(fields, "amount")
+    note = _field(fields, "note")
+    if not vpa or not amount:
+        raise ValueError("Please enter at least the VPA and amount!")
+    return f"upi://pay?pa={vpa}&am={amount}&tn={note}"
+
+
+def _build_wifi(fields):
+    ssid = _field(fields, "ssid")
+    wifi_pass = _field(fields, "wifi_pass")
+    encryption = _field(fields, "encryption", "WPA") or "WPA"
+    if not ssid:
+        raise ValueError("Please enter the SSID!")
+    return f"WIFI:T:{encryption};S:{ssid};P:{wifi_pass};;"
+
+
+def _build_vcard(fields):
+    name = _field(fields, "name")
+    phone = _field(fields, "phone")
+    email = _field(fields, "email")
+    address = _field(fields, "address")
+    if not name:
+        raise ValueError("Please enter the name!")
+    return f"BEGIN:VCARD\nVERSION:3.0\nN:{name}\nTEL:{phone}\nEMAIL:{email}\nADR:{address}\nEND:VCARD"
+
+
+def _build_totp(fields):
+    account = _field(fields, "account")
+    issuer = _field(fields, "issuer")
+    secret = _field(fields, "secret")
+    if not account or not issuer or not secret:
+        raise ValueError("Please fill in all TOTP fields!")
+    return f"otpauth://totp/{issuer}:{account}?secret={secret}&issuer={issuer}"
+
+
+def _build_event(fields):
+    event = _field(fields, "event")
+    datetime_val = _field(fields, "datetime")
+    venue = _field(fields, "venue")
+    details = _field(fields, "details")
+    if not event or not datetime_val:
+        raise ValueError("Please enter at least the event name and date/time!")
+    return f"Event: {event}\nDate/Time: {datetime_val}\nVenue: {venue}\nDetails: {details}"
+
+
+def _build_encrypted(fields):
+    plain = _field(fields, "plain")
+    key = _field(fields, "key")
+    if not plain or not key:
+        raise ValueError("Please provide both text and an encryption key!")
+    return simple_encrypt(plain, key)
+
+
+PAYLOAD_BUILDERS = {
+    "URL/Plain Text": _build_text,
+    "Payment Request": _build_payment,
+    "WiFi Connection": _build_wifi,
+    "vCard Contact": _build_vcard,
+    "TOTP Authentication": _build_totp,
+    "Event Ticket/Coupon": _build_event,
+    "Secure/Encrypted Text": _build_encrypted
+}
+
+
+def build_payload(qr_type, fields):
+    """Build the encoded payload string for a QR type from its input fields.
+
+    Raises ValueError with a user-facing message when required fields are
+    missing or the type is unknown.
+    """
+    builder = PAYLOAD_BUILDERS.get(qr_type)
+    if builder is None:
+        raise ValueError(f"Unknown QR type: {qr_type}")
+    return builder(fields)
+
+
+def validate_options(box_size, border):
+    """Check the numeric style options, raising ValueError when invalid."""
+    try:
+        box_size = int(box_size)
+        border = int(border)
+    except (TypeError, ValueError):
+        box_size, border = 0, -1
+    if box_size < 1 or border < 0:
+        raise ValueError("Box Size must be a positive integer and Border must be a non-negative integer!")
+    return box_size, border
+
+
+def make_qr(payload, box_size=10, border=4, logo=False, error_correction=None):
+    """Encode a payload into the smallest fitting qrcode.QRCode.
+
+    Uses qr_encoder's optimal mode segmentation, with error correction
+    raised to H when a center logo will cover part of the symbol (or set
+    explicitly with error_correction).
+    """
+    return qr_encoder.build_qr(payload, box_size, border, logo=logo, error_correction=error_correction)
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """Import NumPy on first use (it is slow to import); None if not installed."""
+    try:
+        import numpy
+    except ImportError:  # NumPy is optional; rasterize() has a pure-Python path
+        return None
+    return numpy
+
+
+def rasterize(qr, qr_color="#000000", back_color="white"):
+    """Scale the module matrix straight into a two-color palette image.
+
+    Pixel-identical to qr.make_image(...).convert("RGB"), but every module
+    is a single palette index instead of a drawn rectangle, so large box
+    sizes cost one array repeat rather than thousands of draw calls.
+    """
+    matrix = qr.get_matrix()
+    box = qr.box_size
+    size = len(matrix) * box
+    np = _numpy()
+    if np is not None:
+        modules = np.asarray(matrix, dtype=np.uint8)
+        pixels = np.repeat(np.repeat(modules, box, axis=0), box, axis=1).tobytes()
+    else:
+        pixels = b"".join(bytes(v for v in row for _ in range(box)) * box for row in matrix)
+    img = Image.frombytes("P", (size, size), pixels)
+    img.putpalette(ImageColor.getrgb(back_color)[:3] + ImageColor.getrgb(qr_color)[:3])
+    return img
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, memoized on (path, size, mtime)."""
+    stat = os.stat(path)
+    return _file_digest(path, stat.st_size, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=64)
+def _file_digest(path, size, mtime_ns):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+@functools.lru_cache(maxsize=32)
+def load_font(size):
+    """Load the watermark font, falling back to PIL's built-in bitmap font."""
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except IOError:
+        try:
+            return ImageFont.truetype("DejaVuSans.ttf", size)
+        except IOError:
+            return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=64)
+def watermark_layer(size, watermark_text=DEFAULT_WATERMARK):
+    """Pre-render the watermark for an image size.
+
+    Returns (layer, box): an RGBA patch covering only the text and the
+    region of the image it belongs to.
+    """
+    width, height = size
+    font = load_font(int(height * 0.05))
+    draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    bbox = draw.textbbox((0, 0), watermark_text, font=font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+    position = (width - text_width - 10, height - text_height - 10)
+    ink = draw.textbbox(position, watermark_text, font=font)
+    # Pad for anti-aliasing and clip to the image
+    box = (max(0, ink[0] - 2), max(0, ink[1] - 2), min(width, ink[2] + 2), min(height, ink[3] + 2))
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return None, box
+    layer = Image.new("RGBA", (box[2] - box[0], box[3] - box[1]))
+    ImageDraw.Draw(layer).text((position[0] - box[0], position[1] - box[1]), watermark_text,
+                               font=font, fill=(255, 255, 255, 128))
+    return layer, box
+
+
+@functools.lru_cache(maxsize=32)
+def _resized_logo(digest, logo_size, logo_path):
+    logo = Image.open(logo_path).convert("RGBA")
+    return logo.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
+
+
+def logo_layer(logo_path, logo_size):
+    """Load and resize a logo once per (file contents, size)."""
+    try:
+        return _resized_logo(file_digest(logo_path), logo_size, logo_path)
+    except Exception as e:
+        raise ValueError(f"Failed to load logo: {e}")
+
+
+def _draw_watermark(img, watermark_text):
+    # Composite only the pixels under the text; img must be RGB
+    layer, box = watermark_layer(img.size, watermark_text)
+    if layer is not None:
+        region = img.crop(box).convert("RGBA")
+        img.paste(Image.alpha_composite(region, layer).convert("RGB"), box[:2])
+
+
+def _draw_logo(img, logo_path, scale=LOGO_SCALE):
+    qr_width, qr_height = img.size
+    logo_size = int(min(qr_width, qr_height) * scale)
+    logo = logo_layer(logo_path, logo_size)
+    logo_position = ((qr_width - logo_size) // 2, (qr_height - logo_size) // 2)
+    img.paste(logo, logo_position, logo)
+
+
+def apply_watermark(img, watermark_text=DEFAULT_WATERMARK):
+    """Draw semi-transparent watermark text in the bottom-right corner."""
+    img = img.convert("RGB")
+    _draw_watermark(img, watermark_text)
+    return img
+
+
+def apply_logo(img, logo_path):
+    """Paste the logo at logo_path over the center 20% of the symbol."""
+    img = img.convert("RGB")
+    _draw_logo(img, logo_path)
+    return img
+
+
+def render_image(payload, qr_color="#000000", box_size=10, border=4, watermark=True, logo_path=None,
+                 error_correction=None, logo_scale=LOGO_SCALE):
+    """Render a payload to a PIL image with the given style options.
+
+    Plain codes come back as a two-color palette image; watermarked or
+    logo codes as RGB.
+    """
+    box_size, border = validate_options(box_size, border)
+    with perf_trace.stage("encode"):
+        qr = make_qr(payload, box_size, border, logo=bool(logo_path), error_correction=error_correction)
+    return style_image(qr, qr_color, watermark, logo_path, logo_scale)
+
+
+def style_image(qr, qr_color="#000000", watermark=True, logo_path=None, logo_scale=LOGO_SCALE):
+    """Rasterize an encoded symbol at qr.box_size and draw its overlays."""
+    with perf_trace.stage("raster"):
+        img = rasterize(qr, qr_color)
+        if watermark or logo_path:
+            # One RGB copy; the overlays then only touch their own regions
+            img = img.convert("RGB")
+
+    if watermark:
+        with perf_trace.stage("watermark"):
+            _draw_watermark(img, DEFAULT_WATERMARK)
+
+    if logo_path:
+        with perf_trace.stage("logo"):
+            _draw_logo(img, logo_path, logo_scale)
+
+    return img
+
+
+def encode_image(img, fmt="PNG"):
+    """Encode a PIL image to bytes in the given format."""
+    if img.mode == "P" and fmt.upper() in ("JPEG", "JPG"):
+        img = img.convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def render_qr(payload, qr_color="#000000", box_size=10, border=4, watermark=True, logo_path=None, fmt="PNG",
+              error_correction=None, logo_scale=LOGO_SCALE):
+    """Render a payload and return the encoded image bytes.
+
+    fmt may be any PIL raster format, or "SVG"/"PDF" for vector output.
+    """
+    if fmt.upper() in ("SVG", "PDF"):
+        from qr_vector import VECTOR_RENDERERS
+        return VECTOR_RENDERERS[fmt.upper()](payload, qr_color, box_size, border, watermark, logo_path,
+                                             error_correction, logo_scale)
+    img = render_image(payload, qr_color, box_size, border, watermark, logo_path, error_correction, logo_scale)
+    return encode_image(img, fmt)
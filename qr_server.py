@@ -0,0 +1,354 @@
+"""HTTP service that renders QR codes from memory.
+
+Built on asyncio streams from the standard library. Rendering is offloaded to
+a process pool so the event loop only parses requests and writes responses.
+
+Endpoints (GET with query parameters, or POST with a JSON/form body):
+
+    /qr/url        text
+    /qr/payment    vpa, amount, note
+    /qr/wifi       ssid, wifi_pass, encryption
+    /qr/vcard      name, phone, email, address
+    /qr/totp       account, issuer, secret
+    /qr/event      event, datetime, venue, details
+    /qr/encrypted  plain, key
+    /metrics       Prometheus text format counters and latency histograms
+    /healthz       liveness probe
+
+Style parameters: color, box_size, border, watermark (0/1), format (png,
+jpeg, svg or pdf) and logo (a file name inside --logo-dir).
+
+Identical requests that arrive while a render is in flight share that
+render. Finished renders are kept in an in-memory LRU, and responses carry
+an ETag so clients can revalidate with If-None-Match. Connections are
+HTTP/1.1 keep-alive.
+
+Usage:
+    python qr_server.py --port 8080 --workers 4 --logo-dir assets
+"""
+import abc
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import sys
+import time
+import urllib.parse
+from http import HTTPStatus
+
+import qr_engine
+from batch import parse_bool
+from render_cache import RenderCache, render_key
+
+QR_TYPE_SLUGS = {
+    "url": "URL/Plain Text",
+    "payment": "Payment Request",
+    "wifi": "WiFi Connection",
+    "vcard": "vCard Contact",
+    "totp": "TOTP Authentication",
+    "event": "Event Ticket/Coupon",
+    "encrypted": "Secure/Encrypted Text"
+}
+
+CONTENT_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "SVG": "image/svg+xml",
+    "PDF": "application/pdf"
+}
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+KEEP_ALIVE_TIMEOUT = 15
+
+
+def render_for_http(payload, style, fmt):
+    """Render inside a worker process and return the encoded bytes."""
+    return qr_engine.render_qr(payload, fmt=fmt, **style)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Metrics:
+    def __init__(self, counters=("cache_hits", "coalesced", "renders", "not_modified")):
+        self.requests = {}  # (endpoint, status) -> count
+        self.latency = {}  # endpoint -> [bucket counts..., sum, count]
+        self.counters = dict.fromkeys(counters, 0)
+
+    def observe(self, endpoint, status, seconds):
+        key = (endpoint, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.latency.setdefault(endpoint, [0] * (len(LATENCY_BUCKETS) + 2))
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+    def render(self):
+        lines = ["# TYPE qr_requests_total counter"]
+        for (endpoint, status), count in sorted(self.requests.items()):
+            lines.append(f'qr_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        lines.append("# TYPE qr_request_duration_seconds histogram")
+        for endpoint, histogram in sorted(self.latency.items()):
+            for bound, count in zip(LATENCY_BUCKETS, histogram):
+                lines.append(f'qr_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            lines.append(f'qr_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram[-1]}')
+            lines.append(f'qr_request_duration_seconds_sum{{endpoint="{endpoint}"}} {histogram[-2]:.6f}')
+            lines.append(f'qr_request_duration_seconds_count{{endpoint="{endpoint}"}} {histogram[-1]}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE qr_{name}_total counter")
+            lines.append(f"qr_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+class AsyncHTTPServer(abc.ABC):
+    """HTTP/1.1 keep-alive plumbing; subclasses implement dispatch()."""
+
+    description = "HTTP"
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def route(self, target):
+        """Metrics label for a request target, known before dispatch so failures count under it."""
+        return "invalid"
+
+    @abc.abstractmethod
+    async def dispatch(self, method, target, headers, body):
+        """Return (endpoint, status, content_type, body, extra_headers)."""
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                start = time.perf_counter()
+                keep_alive = await self.handle_request(head, reader, writer, start)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, head, reader, writer, start):
+        endpoint = "invalid"
+        keep_alive = False
+        try:
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ", 2)
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+            endpoint = self.route(target)
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+            raw_length = headers.get("content-length", "") or "0"
+            if not (raw_length.isascii() and raw_length.isdigit()):
+                # Without a usable length the body can't be skipped, so the stream can't be reused
+                keep_alive = False
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+            length = int(raw_length)
+            if length > MAX_BODY_BYTES:
+                keep_alive = False
+                raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+            body = await reader.readexactly(length) if length else b""
+
+            _, status, content_type, data, extra = await self.dispatch(method.upper(), target, headers, body)
+        except HTTPError as e:
+            status, content_type, extra = e.status, "application/json", {}
+            data = json.dumps({"error": str(e)}).encode("utf-8")
+        except Exception as e:
+            status, content_type, extra = HTTPStatus.INTERNAL_SERVER_ERROR, "application/json", {}
+            data = json.dumps({"error": f"Internal error: {e}"}).encode("utf-8")
+
+        response = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        if content_type:
+            response.append(f"Content-Type: {content_type}")
+        response.append(f"Content-Length: {len(data)}")
+        response.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        if keep_alive:
+            response.append(f"Keep-Alive: timeout={KEEP_ALIVE_TIMEOUT}")
+        response.extend(f"{name}: {value}" for name, value in extra.items())
+        writer.write(("\r\n".join(response) + "\r\n\r\n").encode("latin-1") + data)
+        self.metrics.observe(endpoint, status.value, time.perf_counter() - start)
+        return keep_alive
+
+    async def start(self, host, port):
+        return await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+
+    async def serve(self, host, port):
+        server = await self.start(host, port)
+        addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Serving {self.description} on {addresses}")
+        async with server:
+            await server.serve_forever()
+
+
+class QRServer(AsyncHTTPServer):
+    description = "QR codes"
+
+    def __init__(self, workers=None, logo_dir=None, cache_items=1024):
+        super().__init__(Metrics())
+        self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        self.logo_dir = logo_dir
+        self.cache = RenderCache(directory=None, memory_items=cache_items)
+        self._inflight = {}  # render key -> asyncio.Future
+
+    # -- Request handling -------------------------------------------------
+
+    def _params(self, method, target, headers, body):
+        query = urllib.parse.urlsplit(target).query
+        params = {key: values[-1] for key, values in urllib.parse.parse_qs(query, keep_blank_values=True).items()}
+        if method == "POST" and body:
+            content_type = headers.get("content-type", "")
+            if content_type.startswith("application/json"):
+                try:
+                    data = json.loads(body)
+                except json.JSONDecodeError as e:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid JSON body: {e}")
+                if not isinstance(data, dict):
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "JSON body must be an object")
+                params.update({key: value for key, value in data.items() if value is not None})
+            else:
+                form = urllib.parse.parse_qs(body.decode("utf-8", "replace"), keep_blank_values=True)
+                params.update({key: values[-1] for key, values in form.items()})
+        return params
+
+    def _logo_path(self, name):
+        if not name:
+            return None
+        if not self.logo_dir:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Logos are not enabled on this server")
+        path = os.path.join(self.logo_dir, os.path.basename(name))
+        if not os.path.isfile(path):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown logo: {name}")
+        return path
+
+    async def render(self, qr_type, params):
+        """Build, coalesce and render one request; returns (key, bytes, fmt)."""
+        try:
+            payload = qr_engine.build_payload(qr_type, params)
+            box_size, border = qr_engine.validate_options(params.get("box_size", 10), params.get("border", 4))
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        fmt = str(params.get("format", "png")).upper()
+        fmt = "JPEG" if fmt == "JPG" else fmt
+        if fmt not in CONTENT_TYPES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unsupported format: {fmt.lower()}")
+        style = {
+            "qr_color": params.get("color", "#000000"),
+            "box_size": box_size,
+            "border": border,
+            "watermark": parse_bool(params.get("watermark", "1")),
+            "logo_path": self._logo_path(params.get("logo"))
+        }
+
+        key = render_key(payload, fmt=fmt, **style)
+        data = self.cache.get(key)
+        if data is not None:
+            self.metrics.counters["cache_hits"] += 1
+            return key, data, fmt
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.metrics.counters["coalesced"] += 1
+            return key, await asyncio.shield(future), fmt
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        self.metrics.counters["renders"] += 1
+        try:
+            data = await loop.run_in_executor(self.pool, render_for_http, payload, style, fmt)
+        except Exception as e:
+            error = HTTPError(HTTPStatus.BAD_REQUEST, str(e)) if isinstance(e, ValueError) else e
+            future.set_exception(error)
+            future.exception()  # Coalesced waiters re-raise it; don't warn when there are none
+            raise error
+        except BaseException:
+            # This request was cancelled (e.g. its client went away); don't leave waiters hanging
+            future.set_exception(HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Render was cancelled, please retry"))
+            future.exception()
+            raise
+        else:
+            future.set_result(data)
+            self.cache.put(key, data)
+        finally:
+            del self._inflight[key]
+        return key, data, fmt
+
+    def route(self, target):
+        path = urllib.parse.urlsplit(target).path.rstrip("/")
+        if path in ("/metrics", "/healthz"):
+            return path[1:]
+        parts = path.split("/")
+        if len(parts) == 3 and parts[1] == "qr" and parts[2] in QR_TYPE_SLUGS:
+            return parts[2]
+        return "unknown"
+
+    async def dispatch(self, method, target, headers, body):
+        """Return (endpoint, status, content_type, body, extra_headers)."""
+        path = urllib.parse.urlsplit(target).path.rstrip("/")
+        if path == "/metrics":
+            return "metrics", HTTPStatus.OK, "text/plain; version=0.0.4", self.metrics.render().encode("utf-8"), {}
+        if path == "/healthz":
+            return "healthz", HTTPStatus.OK, "text/plain", b"ok\n", {}
+        parts = path.split("/")
+        if len(parts) != 3 or parts[1] != "qr" or parts[2] not in QR_TYPE_SLUGS:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown endpoint: {path or '/'}")
+        endpoint = parts[2]
+        if method not in ("GET", "POST"):
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"Method not allowed: {method}")
+
+        key, data, fmt = await self.render(QR_TYPE_SLUGS[endpoint], self._params(method, target, headers, body))
+        etag = f'"{key[:32]}"'
+        extra = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+        if headers.get("if-none-match") == etag:
+            self.metrics.counters["not_modified"] += 1
+            return endpoint, HTTPStatus.NOT_MODIFIED, None, b"", extra
+        return endpoint, HTTPStatus.OK, CONTENT_TYPES[fmt], data, extra
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve QR codes over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count)")
+    parser.add_argument("--logo-dir", default=None, help="Directory of logos selectable with ?logo=<file>")
+    parser.add_argument("--cache-items", type=int, default=1024, help="Rendered codes kept in memory")
+    args = parser.parse_args(argv)
+
+    server = QRServer(workers=args.workers, logo_dir=args.logo_dir, cache_items=args.cache_items)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""Vector (SVG and PDF) output for print-scale QR codes.
+
+Dark modules are merged into horizontal runs, and each run becomes one
+path segment (SVG) or one rectangle (PDF) instead of one shape per module.
+A print-size code is therefore a few kilobytes whatever its box size. Color,
+border, watermark and center logo follow the same options as the raster
+path in qr_engine. One module is ``box_size`` CSS pixels (0.75 pt in PDF).
+"""
+import base64
+import io
+import zlib
+
+from PIL import Image, ImageColor
+
+import qr_engine
+
+PX_TO_PT = 0.75
+MAX_LOGO_PIXELS = 1024
+WATERMARK_FONT = "Arial, 'DejaVu Sans', Helvetica, sans-serif"
+
+
+def module_runs(matrix):
+    """Yield (x, y, length) for every horizontal run of dark modules."""
+    for y, row in enumerate(matrix):
+        x = 0
+        width = len(row)
+        while x < width:
+            if row[x]:
+                start = x
+                while x < width and row[x]:
+                    x += 1
+                yield start, y, x - start
+            else:
+                x += 1
+
+
+def _hex_color(color):
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _logo_image(logo_path):
+    """Load a logo for embedding, capped at MAX_LOGO_PIXELS on its long side."""
+    try:
+        logo = Image.open(logo_path).convert("RGBA")
+    except Exception as e:
+        raise ValueError(f"Failed to load logo: {e}")
+    logo.thumbnail((MAX_LOGO_PIXELS, MAX_LOGO_PIXELS), Image.Resampling.LANCZOS)
+    return logo
+
+
+def _geometry(qr, logo_scale=qr_engine.LOGO_SCALE):
+    """Module count plus logo box and watermark anchor, in module units.
+
+    Mirrors the raster overlays: the logo covers logo_scale (20%) of the
+    symbol and the watermark sits 10 px in from the bottom-right corner at
+    5% of the height.
+    """
+    matrix = qr.get_matrix()
+    count = len(matrix)
+    logo_size = count * logo_scale
+    logo_origin = (count - logo_size) / 2
+    inset = 10 / qr.box_size
+    return matrix, count, (logo_origin, logo_size), (count - inset, count - inset, count * 0.05)
+
+
+def render_svg(payload, qr_color="#000000", box_size=10, border=4, watermark=True, logo_path=None,
+               error_correction=None, logo_scale=qr_engine.LOGO_SCALE):
+    """Render a payload to SVG bytes using one merged path for all modules."""
+    box_size, border = qr_engine.validate_options(box_size, border)
+    color = _hex_color(qr_color)
+    qr = qr_engine.make_qr(payload, box_size, border, logo=bool(logo_path), error_correction=error_correction)
+    matrix, count, (logo_origin, logo_size), (text_x, text_y, font_size) = _geometry(qr, logo_scale)
+    pixels = count * box_size
+
+    path = "".join(f"M{x} {y}h{length}v1h-{length}z" for x, y, length in module_runs(matrix))
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<svg xmlns="http://www.w3.org/2000/svg" version="1.1" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {count} {count}" shape-rendering="crispEdges">',
+        f'<rect width="{count}" height="{count}" fill="#ffffff"/>',
+        f'<path fill="{color}" d="{path}"/>'
+    ]
+    if watermark:
+        parts.append(
+            f'<text x="{text_x:.4f}" y="{text_y:.4f}" font-family="{WATERMARK_FONT}" font-size="{font_size:.4f}" '
+            f'text-anchor="end" fill="#ffffff" fill-opacity="0.5">{qr_engine.DEFAULT_WATERMARK}</text>'
+        )
+    if logo_path:
+        buffer = io.BytesIO()
+        _logo_image(logo_path).save(buffer, format="PNG")
+        encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+        parts.append(
+            f'<image x="{logo_origin:.4f}" y="{logo_origin:.4f}" width="{logo_size:.4f}" height="{logo_size:.4f}" '
+            f'preserveAspectRatio="none" href="data:image/png;base64,{encoded}"/>'
+        )
+    parts.append("</svg>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def _pdf_color(color):
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"{r / 255:.4f} {g / 255:.4f} {b / 255:.4f}"
+
+
+def pdf_symbol_ops(qr, qr_color="#000000", watermark=True, logo_name=None, logo_scale=qr_engine.LOGO_SCALE):
+    """PDF operators drawing a symbol in module units, origin bottom-left.
+
+    The caller scales them into place and provides the /F1 font and /GS1
+    graphics state for the watermark, and the logo XObject as logo_name.
+    Returns (module count, list of operator lines).
+    """
+    matrix, count, (logo_origin, logo_size), (text_x, text_y, font_size) = _geometry(qr, logo_scale)
+    # PDF's origin is bottom-left, so rows are flipped
+    ops = [f"1 1 1 rg 0 0 {count} {count} re f", f"{_pdf_color(qr_color)} rg"]
+    ops.extend(f"{x} {count - y - 1} {length} 1 re" for x, y, length in module_runs(matrix))
+    ops.append("f")
+    if logo_name:
+        flipped = count - logo_origin - logo_size
+        ops.append(f"q {logo_size:.4f} 0 0 {logo_size:.4f} {logo_origin:.4f} {flipped:.4f} cm /{logo_name} Do Q")
+    if watermark:
+        text = qr_engine.DEFAULT_WATERMARK
+        text_width = qr_engine.load_font(100).getlength(text) / 100 * font_size
+        ops.append(f"/GS1 gs 1 1 1 rg BT /F1 {font_size:.4f} Tf {text_x - text_width:.4f} "
+                   f"{count - text_y:.4f} Td ({text}) Tj ET")
+    return count, ops
+
+
+def pdf_logo_objects(logo_path, smask_number):
+    """(dictionary, stream) pairs for a logo image and its alpha mask.
+
+    The mask must be stored as object smask_number.
+    """
+    logo = _logo_image(logo_path)
+    rgb = zlib.compress(logo.convert("RGB").tobytes())
+    alpha = zlib.compress(logo.getchannel("A").tobytes())
+    width, height = logo.size
+    image = (f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB "
+             f"/BitsPerComponent 8 /Filter /FlateDecode /SMask {smask_number} 0 R /Length {len(rgb)} >>", rgb)
+    mask = (f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray "
+            f"/BitsPerComponent 8 /Filter /FlateDecode /Length {len(alpha)} >>", alpha)
+    return image, mask
+
+
+PDF_FONT = "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+PDF_WATERMARK_STATE = "<< /Type /ExtGState /ca 0.5 >>"
+
+
+def render_pdf(payload, qr_color="#000000", box_size=10, border=4, watermark=True, logo_path=None,
+               error_correction=None, logo_scale=qr_engine.LOGO_SCALE):
+    """Render a payload to a single-page PDF with one rectangle per module run."""
+    box_size, border = qr_engine.validate_options(box_size, border)
+    qr = qr_engine.make_qr(payload, box_size, border, logo=bool(logo_path), error_correction=error_correction)
+    count, symbol = pdf_symbol_ops(qr, qr_color, watermark, "Im1" if logo_path else None, logo_scale)
+    scale = box_size * PX_TO_PT
+    page = count * scale
+
+    ops = [f"q {scale:.4f} 0 0 {scale:.4f} 0 0 cm"] + symbol + ["Q"]
+    resources = []
+    objects = {}
+    if logo_path:
+        objects[6], objects[7] = pdf_logo_objects(logo_path, 7)
+        resources.append("/XObject << /Im1 6 0 R >>")
+    if watermark:
+        objects[5] = (PDF_FONT, None)
+        objects[8] = (PDF_WATERMARK_STATE, None)
+        resources.append("/Font << /F1 5 0 R >> /ExtGState << /GS1 8 0 R >>")
+
+    content = zlib.compress("\n".join(ops).encode("ascii"))
+    objects[1] = ("<< /Type /Catalog /Pages 2 0 R >>", None)
+    objects[2] = ("<< /Type /Pages /Kids [3 0 R] /Count 1 >>", None)
+    objects[3] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page:.2f} {page:.2f}] "
+                  f"/Resources << {' '.join(resources)} >> /Contents 4 0 R >>", None)
+    objects[4] = (f"<< /Filter /FlateDecode /Length {len(content)} >>", content)
+    return _write_pdf(objects)
+
+
+def _write_pdf(objects):
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    size = max(objects) + 1
+    offsets = [0] * size
+    for number in sorted(objects):
+        dictionary, stream = objects[number]
+        offsets[number] = out.tell()
+        out.write(f"{number} 0 obj\n{dictionary}\n".encode("latin-1"))
+        if stream is not None:
+            out.write(b"stream\n" + stream + b"\nendstream\n")
+        out.write(b"endobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode("ascii"))
+    for number in range(1, size):
+        if number in objects:
+            out.write(f"{offsets[number]:010d} 00000 n \n".encode("ascii"))
+        else:
+            out.write(b"0000000000 65535 f \n")
+    out.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii"))
+    return out.getvalue()
+
+
+VECTOR_RENDERERS = {
+    "SVG": render_svg,
+    "PDF": render_pdf
+}
@@ -0,0 +1,300 @@
+"""Check that a rendered QR code still scans.
+
+The logo and watermark are drawn over the symbol after encoding, so some
+modules in the final image no longer read as they were encoded. ``verify``
+samples the center of every module back from the image (where a scanner
+samples it) and compares the result with the encoded matrix:
+
+* damaged data modules are mapped to the codewords they belong to, and the
+  damaged codewords in each Reed-Solomon block are counted against what
+  that block can correct;
+* finder patterns and timing patterns must be intact, and at least one
+  copy of the format (and version) information must survive;
+* the code color must contrast enough with the background.
+
+By default a render may use at most half of the correction capacity, so
+the rest is left for print defects and camera noise. Sampling costs well
+under a millisecond for typical codes, so it can run on every code of a
+bulk job. ``decode`` optionally runs a full decoder as well (requires the
+zxing-cpp package).
+
+``render_verified`` renders, verifies and, when a check fails, retries with
+error correction raised to H and then with a smaller logo.
+"""
+import functools
+
+import qrcode
+from PIL import ImageColor
+from qrcode import base
+
+import qr_engine
+
+MAX_ECC_USE = 0.5
+MIN_CONTRAST = 80  # Luminance difference between dark and light modules, 0-255
+
+ECC_NAMES = {
+    qrcode.constants.ERROR_CORRECT_L: "L",
+    qrcode.constants.ERROR_CORRECT_M: "M",
+    qrcode.constants.ERROR_CORRECT_Q: "Q",
+    qrcode.constants.ERROR_CORRECT_H: "H"
+}
+
+# Codewords the smallest symbols reserve against misdecoding (ISO 18004 table 9)
+_MISDECODE_RESERVE = {
+    (1, qrcode.constants.ERROR_CORRECT_L): 3,
+    (1, qrcode.constants.ERROR_CORRECT_M): 2,
+    (1, qrcode.constants.ERROR_CORRECT_Q): 1,
+    (1, qrcode.constants.ERROR_CORRECT_H): 1,
+    (2, qrcode.constants.ERROR_CORRECT_L): 2,
+    (3, qrcode.constants.ERROR_CORRECT_L): 1
+}
+
+# Module roles in a symbol layout; data modules hold their codeword index instead
+REMAINDER = -1
+FINDER = -2
+TIMING = -3
+ALIGNMENT = -4
+FORMAT_A = -5
+FORMAT_B = -6
+VERSION_A = -7
+VERSION_B = -8
+DARK_MODULE = -9
+
+# Retried in order when a render fails verification
+LOGO_FIX_SCALES = (0.15, 0.1)
+
+
+def _format_positions(count):
+    """The two copies of the 15 format bits, as placed by qrcode's setup_type_info."""
+    first, second = [], []
+    for i in range(15):
+        vertical = (i, 8) if i < 6 else (i + 1, 8) if i < 8 else (count - 15 + i, 8)
+        horizontal = (8, count - i - 1) if i < 8 else (8, 15 - i) if i < 9 else (8, 15 - i - 1)
+        # Bits 0-7 run down column 8 beside the top-left finder and 8-14 along row 8 beside it
+        if i < 8:
+            first.append(vertical)
+            second.append(horizontal)
+        else:
+            first.append(horizontal)
+            second.append(vertical)
+    return first, second
+
+
+@functools.lru_cache(maxsize=None)
+def symbol_layout(version):
+    """Role of every module of a symbol version, as a tuple of rows.
+
+    Data modules hold the index of the codeword they carry (in the order the
+    codewords are placed); function modules hold one of the role constants.
+    """
+    count = version * 4 + 17
+    blank = qrcode.QRCode(version=version)
+    blank.modules_count = count
+    blank.modules = [[None] * count for _ in range(count)]
+    roles = [[None] * count for _ in range(count)]
+
+    def claim(role):
+        for r in range(count):
+            for c in range(count):
+                if blank.modules[r][c] is not None and roles[r][c] is None:
+                    roles[r][c] = role
+
+    blank.setup_position_probe_pattern(0, 0)
+    blank.setup_position_probe_pattern(count - 7, 0)
+    blank.setup_position_probe_pattern(0, count - 7)
+    claim(FINDER)
+    blank.setup_position_adjust_pattern()
+    claim(ALIGNMENT)
+    blank.setup_timing_pattern()
+    claim(TIMING)
+
+    first, second = _format_positions(count)
+    for role, positions in ((FORMAT_A, first), (FORMAT_B, second)):
+        for r, c in positions:
+            roles[r][c] = role
+    roles[count - 8][8] = DARK_MODULE
+    if version >= 7:
+        for i in range(18):
+            roles[i // 3][i % 3 + count - 11] = VERSION_A
+            roles[i % 3 + count - 11][i // 3] = VERSION_B
+
+    # Walk the data region in qrcode's map_data order
+    bit = 0
+    row = count - 1
+    step = -1
+    for col in range(count - 1, 0, -2):
+        if col <= 6:
+            col -= 1
+        while True:
+            for c in (col, col - 1):
+                if roles[row][c] is None:
+                    roles[row][c] = bit // 8
+                    bit += 1
+            row += step
+            if row < 0 or row >= count:
+                row -= step
+                step = -step
+                break
+
+    total = sum(block.total_count for block in base.rs_blocks(version, qrcode.constants.ERROR_CORRECT_M))
+    return tuple(tuple(REMAINDER if role is not None and role >= total else role for role in line) for line in roles)
+
+
+@functools.lru_cache(maxsize=None)
+def codeword_blocks(version, error_correction):
+    """Map each placed codeword index to its Reed-Solomon block.
+
+    Returns (block of each codeword, correctable codewords per block).
+    """
+    blocks = base.rs_blocks(version, error_correction)
+    data = [block.data_count for block in blocks]
+    ecc = [block.total_count - block.data_count for block in blocks]
+    owner = []
+    # Codewords are interleaved: first data codewords, then ECC codewords, block by block
+    for counts in (data, ecc):
+        for i in range(max(counts)):
+            owner.extend(b for b, n in enumerate(counts) if i < n)
+    reserve = _MISDECODE_RESERVE.get((version, error_correction), 0)
+    return tuple(owner), tuple((n - reserve) // 2 for n in ecc)
+
+
+def _luminance(color):
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return 0.299 * r + 0.587 * g + 0.114 * b
+
+
+def sample_modules(img, count, border):
+    """Read each module's center pixel as dark (True) or light, plus the gray levels."""
+    gray = img.convert("L")
+    scale = gray.width / (count + 2 * border)
+    pixels = gray.load()
+    centers = [int((border + i + 0.5) * scale) for i in range(count)]
+    return [[pixels[x, y] for x in centers] for y in centers]
+
+
+def verify(qr, img, qr_color="#000000", back_color="white", max_ecc_use=MAX_ECC_USE):
+    """Check a rendered image against the symbol it was made from.
+
+    img may be scaled, but must show the whole symbol including its border.
+    Returns a report dict; report["ok"] is False when the code is not
+    expected to scan reliably, and report["problems"] says why.
+    report["fixed"] is always None here; render_verified fills it in.
+    """
+    version = qr.version
+    error_correction = qr.error_correction
+    expected = qr.modules
+    count = len(expected)
+    dark_level = _luminance(qr_color)
+    light_level = _luminance(back_color)
+    contrast = light_level - dark_level
+    threshold = (dark_level + light_level) / 2
+
+    layout = symbol_layout(version)
+    owner, budgets = codeword_blocks(version, error_correction)
+    levels = sample_modules(img, count, qr.border)
+
+    damaged = 0
+    damaged_roles = {}
+    damaged_codewords = set()
+    for r in range(count):
+        expected_row = expected[r]
+        level_row = levels[r]
+        layout_row = layout[r]
+        for c in range(count):
+            if (level_row[c] < threshold) != expected_row[c]:
+                damaged += 1
+                role = layout_row[c]
+                if role >= 0:
+                    damaged_codewords.add(role)
+                else:
+                    damaged_roles[role] = damaged_roles.get(role, 0) + 1
+
+    errors = [0] * len(budgets)
+    for codeword in damaged_codewords:
+        errors[owner[codeword]] += 1
+    ecc_use = max((e / b if b else float(e > 0)) for e, b in zip(errors, budgets))
+
+    problems = []
+    if contrast < MIN_CONTRAST:
+        problems.append(f"the code color is too light ({contrast:.0f} of {MIN_CONTRAST} contrast needed)")
+    if ecc_use > max_ecc_use:
+        problems.append(f"overlays damage {max(errors)} codewords in a block that can correct "
+                        f"{budgets[errors.index(max(errors))]} ({ecc_use:.0%} of capacity)")
+    if damaged_roles.get(FINDER) or damaged_roles.get(TIMING) or damaged_roles.get(DARK_MODULE):
+        problems.append("overlays cover a finder or timing pattern")
+    if damaged_roles.get(FORMAT_A) and damaged_roles.get(FORMAT_B):
+        problems.append("both copies of the format information are damaged")
+    if damaged_roles.get(VERSION_A) and damaged_roles.get(VERSION_B):
+        problems.append("both copies of the version information are damaged")
+
+    return {
+        "ok": not problems,
+        "problems": problems,
+        "version": version,
+        "error_correction": ECC_NAMES[error_correction],
+        "damaged_modules": damaged,
+        "damaged_codewords": len(damaged_codewords),
+        "ecc_use": round(ecc_use, 3),
+        "contrast": round(contrast),
+        "fixed": None
+    }
+
+
+def decode(img):
+    """Decode every QR code in img with zxing-cpp and return their texts."""
+    try:
+        import zxingcpp
+    except ImportError:  # Full decoding is optional
+        raise ValueError("Decoding requires the zxing-cpp package!")
+    return [result.text for result in zxingcpp.read_barcodes(img.convert("L"), formats=zxingcpp.BarcodeFormat.QRCode)]
+
+
+def fix_attempts(logo_path):
+    """Settings to try in order: as requested, then ECC H, then smaller logos."""
+    attempts = [{}]
+    if not logo_path:
+        # Codes with a logo are already encoded at H
+        attempts.append({"error_correction": qrcode.constants.ERROR_CORRECT_H})
+    else:
+        attempts.extend({"error_correction": qrcode.constants.ERROR_CORRECT_H, "logo_scale": scale}
+                        for scale in LOGO_FIX_SCALES)
+    return attempts
+
+
+def describe_fix(settings):
+    """Human-readable summary of the settings render_verified changed."""
+    parts = []
+    if "error_correction" in settings:
+        parts.append(f"error correction {ECC_NAMES[settings['error_correction']]}")
+    if "logo_scale" in settings:
+        parts.append(f"logo at {settings['logo_scale']:.0%}")
+    return ", ".join(parts)
+
+
+def render_verified(payload, qr_color="#000000", box_size=10, border=4, watermark=True, logo_path=None,
+                    fix=True, full_decode=False):
+    """Render and verify a code, retrying with safer settings if it fails.
+
+    Returns (img, report, settings), where settings holds the extra
+    render_image/render_qr options that produced img ({} when none were
+    needed) and report is the verify() report for img, with "decoded" set
+    when full_decode is True. When no attempt passes, the last one is
+    returned with report["ok"] False.
+    """
+    box_size, border = qr_engine.validate_options(box_size, border)
+    attempts = fix_attempts(logo_path) if fix else [{}]
+    for settings in attempts:
+        qr = qr_engine.make_qr(payload, box_size, border, logo=bool(logo_path),
+                               error_correction=settings.get("error_correction"))
+        img = qr_engine.style_image(qr, qr_color, watermark, logo_path,
+                                    settings.get("logo_scale", qr_engine.LOGO_SCALE))
+        report = verify(qr, img, qr_color)
+        if full_decode:
+            report["decoded"] = payload in decode(img)
+            if not report["decoded"]:
+                report["ok"] = False
+                report["problems"].append("a full decode did not return the payload")
+        if report["ok"] or report["contrast"] < MIN_CONTRAST:
+            break  # Passed, or failed in a way no setting here can fix
+    report["fixed"] = describe_fix(settings) if report["ok"] and settings else None
+    return img, report, settings
@@ -0,0 +1,203 @@
+"""Redirect service for dynamic QR codes.
+
+A dynamic code (see dynamic_codes.py) encodes a short redirect URL such as
+``http://localhost:8090/aZ3k9QxB`` instead of its target, so the target can
+be changed later (with Update in the history panel) without reprinting the
+code. This server follows the app's history log read-only and answers each
+scan with a 302 to the entry's current target.
+
+Lookups never touch the disk: the history is held in memory with an index
+from redirect id to entry, and new or edited entries are picked up by
+reading only what was appended to the log, about once a second and right
+away when an unknown id is scanned. A compacted log is reloaded into a new
+index off the event loop and swapped in whole.
+
+Each scan bumps an in-memory counter. The counts are added to the ``scans``
+map of ``analytics/usage.json`` by a background thread about once a second,
+so a redirect never waits on a write.
+
+Endpoints:
+
+    /<redirect id>  302 to the current target (404 when unknown)
+    /metrics        Prometheus text format counters and latency histograms
+    /healthz        liveness probe
+
+Usage:
+    python redirect_server.py --host 0.0.0.0 --port 8090
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import urllib.parse
+from http import HTTPStatus
+
+from dynamic_codes import DEFAULT_PORT
+from history_store import HISTORY_PATH, HistoryStore
+from persistence import Flusher
+from qr_server import AsyncHTTPServer, HTTPError, Metrics
+from usage_stats import USAGE_PATH, ScanCounter
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = 1.0  # Seconds between looks at the history log
+MISS_REFRESH_INTERVAL = 0.25  # Unknown ids trigger a refresh at most this often
+SAFE_URL_CHARS = "!#$%&'()*+,/:;=?@[]~"  # Left alone when escaping a target for the Location header
+
+
+class RedirectIndex:
+    """Dynamic history entries by redirect id, kept current with refresh()."""
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        # (store, redirect id -> entry, entry id -> redirect id), replaced as one on reload
+        self._view = (None, {}, {})
+
+    def load(self):
+        store = HistoryStore(self.path, legacy_path=None)
+        store.load()
+        entries, owners = {}, {}
+        for entry in store:
+            self._add(entry, entries, owners)
+        self._view = (store, entries, owners)
+        return self
+
+    @staticmethod
+    def _add(entry, entries, owners):
+        redirect_id = entry.get("redirect_id")
+        if redirect_id and entry.get("target"):
+            entries[redirect_id] = entry
+            owners[entry["id"]] = redirect_id
+
+    def refresh(self):
+        """Apply history changes made since the last load or refresh."""
+        store, entries, owners = self._view
+        changed = store.refresh()
+        if changed is None:
+            # Compacted (or replaced): build a new index and swap it in
+            self.load()
+            return
+        # Runs off the event loop while resolve() reads entries, so stage the
+        # changes and apply them without ever dropping an id that is only updated
+        staged = {}  # redirect id -> entry, or None to remove it
+        for entry_id in changed:
+            redirect_id = owners.pop(entry_id, None)
+            current = staged[redirect_id] if redirect_id in staged else entries.get(redirect_id)
+            if redirect_id is not None and current is not None and current.get("id") == entry_id:
+                staged[redirect_id] = None
+            entry = store.get(entry_id)
+            if entry is not None:
+                self._add(entry, staged, owners)
+        entries.update((redirect_id, entry) for redirect_id, entry in staged.items() if entry is not None)
+        for redirect_id, entry in staged.items():
+            if entry is None:
+                entries.pop(redirect_id, None)
+
+    def resolve(self, redirect_id):
+        """The current target for a redirect id, or None."""
+        entry = self._view[1].get(redirect_id)
+        return entry.get("target") if entry is not None else None
+
+    def __len__(self):
+        return len(self._view[1])
+
+
+class RedirectServer(AsyncHTTPServer):
+    description = "redirects"
+
+    def __init__(self, history_path=HISTORY_PATH, usage_path=USAGE_PATH, flush_interval=1.0):
+        super().__init__(Metrics(counters=("redirects", "not_found", "refreshes")))
+        self.links = RedirectIndex(history_path).load()
+        self.flusher = Flusher(delay=flush_interval, max_delay=flush_interval * 5)
+        self.scans = ScanCounter(usage_path, flusher=self.flusher)
+        self._refreshing = None  # Shared future of the refresh in progress
+        self._last_refresh = time.monotonic()
+
+    def _refresh_links(self):
+        try:
+            self.links.refresh()
+        except Exception:
+            logger.exception("Reading the history log failed")
+
+    async def refresh(self):
+        """Pick up history changes in a worker thread; concurrent callers share one refresh."""
+        if self._refreshing is None:
+            self._last_refresh = time.monotonic()
+            self.metrics.counters["refreshes"] += 1
+            self._refreshing = asyncio.get_running_loop().run_in_executor(None, self._refresh_links)
+            self._refreshing.add_done_callback(self._refresh_done)
+        await asyncio.shield(self._refreshing)
+
+    def _refresh_done(self, future):
+        self._refreshing = None
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(REFRESH_INTERVAL)
+            await self.refresh()
+
+    def route(self, target):
+        redirect_id = target.split("?", 1)[0].strip("/")
+        return redirect_id if redirect_id in ("metrics", "healthz") else "redirect"
+
+    async def dispatch(self, method, target, headers, body):
+        """Return (endpoint, status, content_type, body, extra_headers)."""
+        redirect_id = target.split("?", 1)[0].strip("/")
+        if redirect_id == "metrics":
+            return "metrics", HTTPStatus.OK, "text/plain; version=0.0.4", self.metrics.render().encode("utf-8"), {}
+        if redirect_id == "healthz":
+            return "healthz", HTTPStatus.OK, "text/plain", b"ok\n", {}
+        if method not in ("GET", "HEAD"):
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"Method not allowed: {method}")
+
+        location = self.links.resolve(redirect_id)
+        if location is None and time.monotonic() - self._last_refresh >= MISS_REFRESH_INTERVAL:
+            # Possibly generated since the last refresh
+            await self.refresh()
+            location = self.links.resolve(redirect_id)
+        if location is None:
+            self.metrics.counters["not_found"] += 1
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown QR code")
+
+        if method == "GET":
+            self.scans.record(redirect_id)
+        self.metrics.counters["redirects"] += 1
+        # Escape anything a header can't carry (non-ASCII, spaces, line breaks)
+        extra = {"Location": urllib.parse.quote(location, safe=SAFE_URL_CHARS), "Cache-Control": "no-store"}
+        return "redirect", HTTPStatus.FOUND, None, b"", extra
+
+    async def serve(self, host, port):
+        refresher = asyncio.ensure_future(self._refresh_periodically())
+        try:
+            await super().serve(host, port)
+        finally:
+            refresher.cancel()
+
+    def close(self):
+        """Write the scans still pending."""
+        self.flusher.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Redirect dynamic QR codes to their current targets.")
+    parser.add_argument("--host", default="127.0.0.1", help="Use 0.0.0.0 so phones on the network can reach it")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--history", default=HISTORY_PATH, help="History log written by the app")
+    parser.add_argument("--usage", default=USAGE_PATH, help="Analytics file that scans are counted in")
+    parser.add_argument("--flush-interval", type=float, default=1.0, help="Seconds between scan count writes")
+    args = parser.parse_args(argv)
+
+    server = RedirectServer(args.history, args.usage, args.flush_interval)
+    print(f"Loaded {len(server.links)} dynamic codes from {args.history}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""Content-addressed cache for rendered QR images.
+
+Renders are keyed on a SHA-256 of everything that affects the output: the
+payload, color, box size, border, watermark flag, output format and the
+*contents* of the logo file. A small in-memory LRU answers repeat requests
+instantly, and an on-disk tier (sharded by the first two hex digits of the
+key) survives restarts. Both tiers are size-capped and evict least recently
+used entries first.
+
+``render_verified`` also checks that the code scans. When a render had to
+be adjusted, the adjusted image and its report are cached under
+``verified_key`` of the request, so repeats skip the retries.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+import perf_trace
+import qr_engine
+import qr_verify
+
+CACHE_DIR = "cache/renders"
+
+# Bump when the encoder or rasterizer output changes so stale renders miss
+RENDER_VERSION = 2
+
+
+def render_key(payload, qr_color="#000000", box_size=10, border=4, watermark=True, logo_path=None, fmt="PNG"):
+    """Return the content address of a render with these options."""
+    try:
+        logo_hash = qr_engine.file_digest(logo_path) if logo_path else None
+    except OSError:
+        # Let the render itself report the missing logo
+        logo_hash = f"missing:{logo_path}"
+    material = json.dumps([
+        RENDER_VERSION, payload, str(qr_color).lower(), int(box_size), int(border), bool(watermark), logo_hash, fmt.upper()
+    ])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def verified_key(key):
+    """Cache key for the scan-checked outcome of the render at key."""
+    return hashlib.sha256(f"verified:{key}".encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, directory=CACHE_DIR, memory_items=256, memory_bytes=64 << 20, disk_bytes=512 << 20):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = None  # key -> (size, last use); scanned lazily
+        self._disk_size = 0
+        self._lock = threading.RLock()
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _scan_disk(self):
+        self._disk = {}
+        self._disk_size = 0
+        if not os.path.isdir(self.directory):
+            return
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for item in os.scandir(shard.path):
+                if item.name.endswith(".tmp"):
+                    continue
+                stat = item.stat()
+                self._disk[item.name] = (stat.st_size, stat.st_mtime)
+                self._disk_size += stat.st_size
+
+    def _remember(self, key, data):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory and (len(self._memory) > self.memory_items or self._memory_size > self.memory_bytes):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def get(self, key):
+        """Return cached bytes for key, or None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+            if self.directory:
+                path = self._disk_path(key)
+                try:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    data = None
+                if data is not None:
+                    os.utime(path)
+                    if self._disk is not None:
+                        self._disk[key] = (len(data), os.path.getmtime(path))
+                    self._remember(key, data)
+                    self.disk_hits += 1
+                    return data
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """Store bytes under key in both tiers."""
+        with self._lock:
+            self._remember(key, data)
+            if not self.directory or len(data) > self.disk_bytes:
+                return
+            if self._disk is None:
+                self._scan_disk()
+            path = self._disk_path(key)
+            if key not in self._disk:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self._disk[key] = (len(data), os.path.getmtime(path))
+                self._disk_size += len(data)
+            self._evict_disk()
+
+    def _evict_disk(self):
+        if self._disk_size <= self.disk_bytes:
+            return
+        for key, (size, _) in sorted(self._disk.items(), key=lambda item: item[1][1]):
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+            del self._disk[key]
+            self._disk_size -= size
+            if self._disk_size <= self.disk_bytes * 0.9:
+                break
+
+    def render(self, payload, qr_color="#000000", box_size=10, border=4, watermark=True, logo_path=None, fmt="PNG"):
+        """Return (key, bytes) for a render, only rendering on a cache miss."""
+        box_size, border = qr_engine.validate_options(box_size, border)
+        key = render_key(payload, qr_color, box_size, border, watermark, logo_path, fmt)
+        data = self.get(key)
+        if data is None:
+            data = qr_engine.render_qr(payload, qr_color, box_size, border, watermark, logo_path, fmt)
+            self.put(key, data)
+        return key, data
+
+    def render_image(self, payload, qr_color="#000000", box_size=10, border=4, watermark=True, logo_path=None, fmt="PNG"):
+        """Like render(), but also return the image as (key, bytes, PIL image).
+
+        Misses hand back the freshly rendered image; hits decode the cached bytes.
+        """
+        box_size, border = qr_engine.validate_options(box_size, border)
+        key = render_key(payload, qr_color, box_size, border, watermark, logo_path, fmt)
+        data = self.get(key)
+        perf_trace.note("cache_hit", data is not None)
+        if data is None:
+            img = qr_engine.render_image(payload, qr_color, box_size, border, watermark, logo_path)
+            with perf_trace.stage("png_encode"):
+                data = qr_engine.encode_image(img, fmt)
+            self.put(key, data)
+        else:
+            with perf_trace.stage("cache_decode"):
+                img = Image.open(io.BytesIO(data))
+                img.load()
+        return key, data, img
+
+    def render_verified(self, payload, qr_color="#000000", box_size=10, border=4, watermark=True, logo_path=None,
+                        fmt="PNG"):
+        """Like render_image(), but check the code scans; returns (key, bytes, PIL image, report, settings).
+
+        A render that fails the check is replaced by qr_verify.render_verified();
+        settings then holds the extra render options it chose ({} otherwise).
+        That outcome is cached too, so repeats return it without re-rendering.
+        """
+        box_size, border = qr_engine.validate_options(box_size, border)
+        key = render_key(payload, qr_color, box_size, border, watermark, logo_path, fmt)
+        cached = self.get(verified_key(key))
+        if cached is not None:
+            # A JSON line with the report and settings, then the image bytes
+            header, _, data = cached.partition(b"\n")
+            header = json.loads(header)
+            with perf_trace.stage("cache_decode"):
+                img = Image.open(io.BytesIO(data))
+                img.load()
+            return key, data, img, header["report"], header["settings"]
+
+        key, data, img = self.render_image(payload, qr_color, box_size, border, watermark, logo_path, fmt)
+        with perf_trace.stage("verify"):
+            qr = qr_engine.make_qr(payload, box_size, border, logo=bool(logo_path))
+            report = qr_verify.verify(qr, img, qr_color)
+            settings = {}
+            if not report["ok"]:
+                # Re-render with more error correction or a smaller logo
+                img, report, settings = qr_verify.render_verified(payload, qr_color, box_size, border, watermark,
+                                                                  logo_path)
+                data = qr_engine.encode_image(img, fmt)
+                header = json.dumps({"report": report, "settings": settings}).encode("utf-8")
+                self.put(verified_key(key), header + b"\n" + data)
+        return key, data, img, report, settings
@@ -0,0 +1,30 @@
+import os
+from unittest import mock
+
+import asset_export
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_sync_tree_skips_temp_and_vanished_files(tmp_path):
+    src, dest = str(tmp_path / "assets"), str(tmp_path / "export")
+    _write(os.path.join(src, "ab", "cd", "kept.png"), b"kept")
+    _write(os.path.join(src, "ab", "cd", "gone.png"), b"gone")
+    _write(os.path.join(src, "ab", "cd", "x1.tmp"), b"partial")
+    real_stat = os.stat
+
+    def stat(path, *args, **kwargs):
+        if str(path).endswith("gone.png"):
+            raise FileNotFoundError(path)  # Deleted between the walk and the stat
+        return real_stat(path, *args, **kwargs)
+
+    with mock.patch.object(asset_export.os, "stat", stat):
+        stats = asset_export.sync_tree(src, dest, link=False)
+
+    assert stats["copied"] == 1
+    assert os.path.exists(os.path.join(dest, "ab", "cd", "kept.png"))
+    assert not os.path.exists(os.path.join(dest, "ab", "cd", "x1.tmp"))
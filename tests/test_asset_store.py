@@ -0,0 +1,22 @@
+import os
+
+from asset_store import AssetStore
+
+
+def test_gc_with_absolute_assets_dir_keeps_referenced_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("assets")
+    for name in ("qr_1.png", "qr_2.png"):
+        with open(os.path.join("assets", name), "wb") as f:
+            f.write(name.encode())
+    managed = AssetStore("assets").put_bytes(b"managed")
+
+    # History refers to assets relative to the working directory
+    store = AssetStore(str(tmp_path / "assets"))
+    store.track([{"output_path": "assets/qr_1.png"}, {"output_path": managed}])
+    stats = store.gc(grace=-1)
+
+    assert stats["removed"] == 1
+    assert os.path.exists("assets/qr_1.png")
+    assert os.path.exists(managed)
+    assert not os.path.exists("assets/qr_2.png")
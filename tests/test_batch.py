@@ -0,0 +1,28 @@
+import json
+import os
+
+import batch
+
+
+def test_bad_filenames_fail_their_row_only(tmp_path):
+    input_path = str(tmp_path / "rows.jsonl")
+    out = str(tmp_path / "out")
+    rows = [
+        {"qr_type": "URL/Plain Text", "text": "a", "filename": 7},
+        {"qr_type": "URL/Plain Text", "text": "b", "filename": ["x.png"]},
+        {"qr_type": "URL/Plain Text", "text": "c", "filename": "manifest.jsonl"},
+        {"qr_type": "URL/Plain Text", "text": "d", "filename": "../escape.png"},
+        {"qr_type": "URL/Plain Text", "text": "e", "filename": None},
+        {"qr_type": "URL/Plain Text", "text": "f", "filename": "f.png"}
+    ]
+    with open(input_path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(row) + "\n" for row in rows)
+
+    summary = batch.run_batch(input_path, out, workers=1, verify="off")
+
+    assert (summary["ok"], summary["failed"]) == (2, 4)
+    with open(summary["manifest"], encoding="utf-8") as f:
+        results = {result["row"]: result for result in map(json.loads, f)}
+    assert all("error" in results[row] for row in (1, 2, 3, 4))
+    assert os.path.exists(os.path.join(out, "qr_000005.png"))
+    assert os.path.exists(os.path.join(out, "f.png"))
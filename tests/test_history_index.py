@@ -0,0 +1,24 @@
+from history_index import HistoryIndex
+
+
+def test_position_follows_removals():
+    entries = [{"id": str(n), "qr_type": "Text", "payload": f"p{n}"} for n in range(6)]
+    index = HistoryIndex(entries)
+    for removed in (entries[0], entries[3]):
+        del entries[index.position(entries, removed)]
+        index.remove(removed)
+    assert [index.position(entries, entry) for entry in entries] == [0, 1, 2, 3]
+    assert [entry["id"] for entry in entries] == ["1", "2", "4", "5"]
+
+
+def test_redirect_ids_follow_adds_updates_and_removals():
+    static = {"id": "1", "qr_type": "URL/Plain Text", "payload": "https://a.example"}
+    dynamic = {"id": "2", "qr_type": "URL/Plain Text", "payload": "http://localhost/abc", "redirect_id": "abc",
+               "target": "https://b.example"}
+    index = HistoryIndex([static, dynamic])
+    assert index.redirect_ids == {"abc"}
+    dynamic["target"] = "https://c.example"
+    index.update(dynamic)
+    assert index.redirect_ids == {"abc"}
+    index.remove(dynamic)
+    assert index.redirect_ids == set()
@@ -0,0 +1,39 @@
+from history_store import HistoryStore
+
+
+class _ManualFlusher:
+    def __init__(self):
+        self.dirty = set()
+
+    def mark_dirty(self, flush):
+        self.dirty.add(flush)
+
+    def flush_all(self):
+        for flush in self.dirty:
+            flush()
+        self.dirty.clear()
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_compaction_runs_on_flush_not_in_delete(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    store = HistoryStore(path, legacy_path=None)
+    entries = [store.append({"n": n}) for n in range(4)]
+    store.close()
+
+    flusher = _ManualFlusher()
+    store = HistoryStore(path, legacy_path=None, min_compact=2, flusher=flusher)
+    store.load()
+    store.delete(entries[0]["id"])
+    store.delete(entries[1]["id"])  # Reaches the compaction threshold
+    assert len(_lines(path)) == 4  # Nothing written on the caller's thread
+
+    flusher.flush_all()
+    assert len(_lines(path)) == 2
+    reloaded = HistoryStore(path, legacy_path=None)
+    assert [entry["n"] for entry in reloaded.load()] == [2, 3]
+    store.close()
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import main
+import perf_trace
+import qr_engine
+import qr_verify
+
+
+def _app():
+    return SimpleNamespace(
+        add_history_entry=lambda entry: entry.setdefault("id", "e1"),
+        history_loaded=True,
+        usage=mock.Mock(),
+        stats_label=mock.Mock(),
+        qr_history=[],
+        _cache_preview=mock.Mock(),
+        _display_preview=mock.Mock(),
+        record_timings=SimpleNamespace(get=lambda: False)
+    )
+
+
+def test_on_generated_accepts_plain_verify_report():
+    options = {"qr_color": "#000000", "box_size": 10, "border": 4, "watermark": False}
+    qr = qr_engine.make_qr("hello", options["box_size"], options["border"])
+    img = qr_engine.style_image(qr, options["qr_color"], watermark=False)
+    report = qr_verify.verify(qr, img, options["qr_color"])
+    assert report["ok"]
+    result = {"output_path": "assets/x.png", "image": img, "bytes": 1, "preview": None, "preview_size": 300,
+              "scan_report": report, "settings": {}, "profile_path": "logs/profiles/p.prof"}
+
+    with mock.patch.object(main, "messagebox") as box, mock.patch.object(perf_trace, "write_metrics"):
+        main.AdvancedQRGenerator._on_generated(_app(), "Text", "hello", options, None, result,
+                                               perf_trace.GenerationTrace())
+
+    box.showwarning.assert_not_called()
+    titles = [call.args[0] for call in box.showinfo.call_args_list]
+    assert titles == ["Profile Saved"]
+
+
+def test_on_generated_keeps_fix_settings_for_vector_export():
+    options = {"qr_color": "#000000", "box_size": 10, "border": 4, "watermark": False}
+    img = qr_engine.render_image("hello", **options)
+    settings = {"error_correction": 2, "logo_scale": 0.1}
+    result = {"output_path": "assets/x.png", "image": img, "bytes": 1, "preview": None, "preview_size": 300,
+              "scan_report": None, "settings": settings, "profile_path": None}
+    app = _app()
+    entries = []
+    app.add_history_entry = entries.append
+
+    with mock.patch.object(main, "messagebox"):
+        main.AdvancedQRGenerator._on_generated(app, "Text", "hello", options, None, result,
+                                               perf_trace.GenerationTrace())
+
+    assert entries[0]["error_correction"] == 2 and entries[0]["logo_scale"] == 0.1
+    assert app.current_render["error_correction"] == 2 and app.current_render["logo_scale"] == 0.1
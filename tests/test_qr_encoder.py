@@ -0,0 +1,77 @@
+import random
+
+import pytest
+import qrcode
+
+import qr_encoder
+
+VALID = {
+    qr_encoder.NUMERIC: set("0123456789"),
+    qr_encoder.ALPHANUMERIC: set("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:")
+}
+
+FIXED_PAYLOADS = [
+    "",
+    "0",
+    "A",
+    "a",
+    "é",
+    "😀",
+    "0123456789" * 8,
+    "HTTPS://EXAMPLE.COM/ABC123",
+    "https://example.com/?id=00123456789012345678",
+    "WIFI:S:Café Ünïcode;T:WPA;P:pässwörd;;",
+    "Total: 1234567890 EUR, Ref ABC-DEF-0001, Payé 日本語 ok",
+    "upi://pay?pa=someone@bank&am=100.00&cu=INR",
+    "12AB34cd56EF78gh90" * 20,
+    # Long enough for the larger length headers of versions 10-26 and 27-40
+    "1234567890" * 300,
+    "HELLO WORLD 2024 " * 60 + "0123456789" * 40,
+    "Aa1é" * 200
+]
+
+
+def _random_payloads(count=300, seed=1234):
+    rng = random.Random(seed)
+    pools = ["0123456789", "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:", "abcxyz@&?=_~", "éü日本😀"]
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 8)):
+            pool = rng.choice(pools)
+            parts.append("".join(rng.choice(pool) for _ in range(rng.randint(1, 40))))
+        yield "".join(parts)
+
+
+PAYLOADS = FIXED_PAYLOADS + list(_random_payloads())
+
+
+def _qrcode_version(payload, error_correction):
+    qr = qrcode.QRCode(error_correction=error_correction)
+    qr.add_data(payload)
+    qr.best_fit()
+    return qr.version
+
+
+@pytest.mark.parametrize("version", [1, 10, 27])
+def test_segments_rejoin_and_hold_only_valid_characters(version):
+    for payload in PAYLOADS:
+        segments = qr_encoder.optimal_segments(payload, version)
+        assert "".join(text for _, text in segments) == payload
+        for mode, text in segments:
+            assert mode in qr_encoder.MODES
+            if mode in VALID:
+                assert set(text) <= VALID[mode], (payload, mode, text)
+
+
+@pytest.mark.parametrize("error_correction", [qr_encoder.DEFAULT_ECC, qr_encoder.LOGO_ECC])
+def test_plan_is_never_larger_than_qrcodes_best_fit(error_correction):
+    for payload in PAYLOADS:
+        version, segments = qr_encoder.plan(payload, error_correction)
+        assert "".join(text for _, text in segments) == payload
+        assert version <= _qrcode_version(payload, error_correction), payload
+
+
+def test_build_qr_encodes_the_planned_version():
+    for payload in FIXED_PAYLOADS:
+        qr = qr_encoder.build_qr(payload)
+        assert qr.version == qr_encoder.plan(payload, qr_encoder.DEFAULT_ECC)[0]
@@ -0,0 +1,38 @@
+import asyncio
+import concurrent.futures
+import threading
+from unittest import mock
+
+import pytest
+
+import qr_server
+
+
+def test_cancelled_leader_fails_coalesced_waiters():
+    release = threading.Event()
+
+    def slow_render(payload, style, fmt):
+        release.wait(5)
+        return b"png"
+
+    async def run():
+        server = qr_server.QRServer(workers=1)
+        server.pool.shutdown()
+        server.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        params = {"text": "hello"}
+        leader = asyncio.ensure_future(server.render("URL/Plain Text", params))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.ensure_future(server.render("URL/Plain Text", params))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        try:
+            with pytest.raises(qr_server.HTTPError) as error:
+                await asyncio.wait_for(waiter, 2)
+        finally:
+            release.set()
+            server.pool.shutdown()
+        assert error.value.status == qr_server.HTTPStatus.SERVICE_UNAVAILABLE
+        assert not server._inflight
+
+    with mock.patch.object(qr_server, "render_for_http", slow_render):
+        asyncio.run(run())
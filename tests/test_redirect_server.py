@@ -0,0 +1,39 @@
+from history_store import HistoryStore
+from redirect_server import RedirectIndex
+
+
+class _WatchedDict(dict):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.removed = []
+
+    def __delitem__(self, key):
+        self.removed.append(key)
+        super().__delitem__(key)
+
+    def pop(self, key, *default):
+        self.removed.append(key)
+        return super().pop(key, *default)
+
+
+def test_refresh_updates_targets_without_dropping_the_id(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    writer = HistoryStore(path, legacy_path=None)
+    kept = writer.append({"redirect_id": "abc", "target": "https://a.example"})
+    gone = writer.append({"redirect_id": "xyz", "target": "https://x.example"})
+    writer.flush()
+
+    index = RedirectIndex(path).load()
+    store, entries, owners = index._view
+    index._view = (store, _WatchedDict(entries), owners)
+
+    writer.update(kept["id"], {"target": "https://b.example"})
+    writer.delete(gone["id"])
+    writer.append({"redirect_id": "new", "target": "https://n.example"})
+    writer.close()
+    index.refresh()
+
+    assert index.resolve("abc") == "https://b.example"
+    assert index.resolve("xyz") is None
+    assert index.resolve("new") == "https://n.example"
+    assert index._view[1].removed == ["xyz"]
@@ -0,0 +1,31 @@
+from unittest import mock
+
+from PIL import Image
+
+import qr_engine
+import qr_verify
+from render_cache import RenderCache
+
+
+def test_render_verified_caches_adjusted_outcome():
+    cache = RenderCache(directory=None)
+    with mock.patch.object(qr_verify, "render_verified", wraps=qr_verify.render_verified) as retry:
+        # Too light to pass, so the first render is retried
+        _, data, _, report, settings = cache.render_verified("hello", qr_color="#eeeeee", watermark=False)
+        _, again, img, cached, cached_settings = cache.render_verified("hello", qr_color="#eeeeee", watermark=False)
+    assert retry.call_count == 1
+    assert again == data
+    assert img.size[0] > 0
+    assert cached == report
+    assert cached_settings == settings
+    assert not cached["ok"]
+
+
+def test_render_verified_returns_fix_settings(tmp_path):
+    logo_path = str(tmp_path / "logo.png")
+    Image.new("RGB", (50, 50), "red").save(logo_path)
+    cache = RenderCache(directory=None)
+    _, _, _, report, settings = cache.render_verified("hello", logo_path=logo_path)
+    assert report["ok"] and report["fixed"]
+    assert settings["logo_scale"] < qr_engine.LOGO_SCALE
+    assert cache.render_verified("hello", logo_path=logo_path)[4] == settings
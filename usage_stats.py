@@ -0,0 +1,256 @@
+"""Usage analytics as time-bucketed counters in analytics/usage.json.
+
+Every generation adds one to the bucket for its hour: a total plus one
+counter per QR type, color, logo use and output size class. The counters
+live in memory and are written behind by the shared persistence Flusher,
+so recording costs a few dict updates and a burst of generations is one
+write. Hourly buckets older than HOURLY_RETENTION are rolled up into daily
+buckets, which are kept for good, so the file grows by one small bucket a
+day however many codes are made.
+
+Queries add up the buckets that overlap a time range and never touch the
+history, so a dashboard costs the same with ten entries or ten million.
+The lifetime ``generations`` total and the ``scans`` map keep the layout
+earlier versions wrote.
+
+The scans map belongs to the redirect server, which counts scans of dynamic
+codes in a ScanCounter and adds them to the file in batches. Both processes
+write the file under its lock file and each keeps the other's part as it
+finds it on disk, so neither overwrites the other's counts.
+"""
+import datetime
+import itertools
+import json
+import threading
+import time
+
+from persistence import JsonDocument, atomic_write, file_lock, read_json
+
+USAGE_PATH = "analytics/usage.json"
+FORMAT_VERSION = 1
+HOURLY_RETENTION = datetime.timedelta(days=7)
+DIMENSIONS = ("qr_type", "color", "logo", "size")
+SIZE_CLASSES = (256, 512, 1024, 2048)  # Upper bounds of the output size classes, in pixels
+
+
+def size_class(pixels):
+    """Bucket an image width in pixels, e.g. "<=512px"."""
+    if not pixels:
+        return "unknown"
+    for limit in SIZE_CLASSES:
+        if pixels <= limit:
+            return f"<={limit}px"
+    return f">{SIZE_CLASSES[-1]}px"
+
+
+def new_bucket():
+    return {"total": 0, "qr_type": {}, "color": {}, "logo": {}, "size": {}}
+
+
+def merge_bucket(target, bucket):
+    """Add bucket's counters into target."""
+    target["total"] += bucket.get("total", 0)
+    for dimension in DIMENSIONS:
+        counters = target[dimension]
+        for key, count in bucket.get(dimension, {}).items():
+            counters[key] = counters.get(key, 0) + count
+
+
+def hour_key(when):
+    """Bucket key for a datetime, or for a "YYYY-MM-DD HH:MM:SS" timestamp."""
+    if isinstance(when, str):
+        return when[:13]
+    return when.strftime("%Y-%m-%d %H")
+
+
+def _take_scans(on_disk, data):
+    # The redirect server owns the scans map; keep what it has written
+    scans = on_disk.get("scans")
+    if isinstance(scans, dict):
+        data["scans"] = scans
+
+
+def _in_range(key, start, end):
+    # Keys are "YYYY-MM-DD" (daily) or "YYYY-MM-DD HH" (hourly); compare at the coarser precision
+    if start and key[:len(start)] < start[:len(key)]:
+        return False
+    return not end or key[:len(end)] <= end[:len(key)]
+
+
+class UsageStats:
+    def __init__(self, path=USAGE_PATH, flusher=None):
+        self.document = JsonDocument(path, default={}, flusher=flusher, merge=_take_scans)
+        self.needs_backfill = False
+        self._hour = None  # Bucket of the last recording, to roll up once per hour
+
+    @staticmethod
+    def _empty():
+        return {"version": FORMAT_VERSION, "generations": 0, "scans": {}, "hourly": {}, "daily": {}}
+
+    def load(self):
+        """Read the counters, upgrading the file written by earlier versions.
+
+        needs_backfill is set when the file is missing or has no time buckets
+        yet, so the caller can seed them once from the history with backfill().
+        """
+        data = self.document.load()
+        if data.get("version") != FORMAT_VERSION:
+            with self.document.editing() as data:
+                for key, value in self._empty().items():
+                    data.setdefault(key, value)
+                data["version"] = FORMAT_VERSION
+            self.needs_backfill = True
+        self.rollup()
+        return self
+
+    def _count(self, data, hour, qr_type, color, logo, size):
+        bucket = data["hourly"].get(hour)
+        if bucket is None:
+            bucket = data["hourly"][hour] = new_bucket()
+        bucket["total"] += 1
+        for dimension, key in (("qr_type", qr_type), ("color", str(color).lower()),
+                               ("logo", "yes" if logo else "no"), ("size", size)):
+            counters = bucket[dimension]
+            counters[key] = counters.get(key, 0) + 1
+
+    def record(self, qr_type, color, logo=False, pixels=None, when=None):
+        """Count one generation; written to disk in the background."""
+        hour = hour_key(when or datetime.datetime.now())
+        with self.document.editing() as data:
+            data["generations"] += 1
+            self._count(data, hour, qr_type, color, logo, size_class(pixels))
+            if hour != self._hour:
+                self._hour = hour
+                self._rollup(data)
+
+    def backfill(self, entries):
+        """Seed the buckets from existing history entries (their sizes are unknown)."""
+        with self.document.editing() as data:
+            count = 0
+            for entry in entries:
+                self._count(data, hour_key(entry.get("timestamp", "")), entry.get("qr_type", ""),
+                            entry.get("qr_color", ""), bool(entry.get("logo_path")), "unknown")
+                count += 1
+            data["generations"] = max(data["generations"], count)
+            self._rollup(data)
+        self.needs_backfill = False
+
+    def _rollup(self, data, now=None):
+        """Fold hourly buckets past HOURLY_RETENTION into their days."""
+        cutoff = hour_key((now or datetime.datetime.now()) - HOURLY_RETENTION)
+        expired = [hour for hour in data["hourly"] if hour < cutoff]
+        for hour in expired:
+            day = data["daily"].get(hour[:10])
+            if day is None:
+                day = data["daily"][hour[:10]] = new_bucket()
+            merge_bucket(day, data["hourly"].pop(hour))
+
+    def rollup(self, now=None):
+        with self.document.editing() as data:
+            self._rollup(data, now)
+
+    def query(self, start=None, end=None):
+        """Counters added up over start..end (inclusive "YYYY-MM-DD[ HH]" strings).
+
+        Daily buckets count in full when their day is in range.
+        """
+        result = new_bucket()
+        with self.document.reading() as data:
+            for key, bucket in itertools.chain(data["daily"].items(), data["hourly"].items()):
+                if _in_range(key, start, end):
+                    merge_bucket(result, bucket)
+        return result
+
+    def series(self, start=None, end=None):
+        """Generations per day over start..end, as a sorted list of (day, total)."""
+        totals = {}
+        with self.document.reading() as data:
+            for key, bucket in itertools.chain(data["daily"].items(), data["hourly"].items()):
+                if _in_range(key, start, end):
+                    totals[key[:10]] = totals.get(key[:10], 0) + bucket["total"]
+        return sorted(totals.items())
+
+    @property
+    def generations(self):
+        with self.document.reading() as data:
+            return data["generations"]
+
+    def scans(self, redirect_id):
+        """Scans the redirect server has recorded for a dynamic code, as (count, last scan or None).
+
+        Read from the file, since the server updates it while the app runs.
+        """
+        on_disk = read_json(self.document.path)
+        scans = on_disk.get("scans") if isinstance(on_disk, dict) else None
+        counter = scans.get(redirect_id) if isinstance(scans, dict) else None
+        if isinstance(counter, dict):
+            return counter.get("total", 0), counter.get("last")
+        return counter or 0, None
+
+    def flush(self):
+        self.document.flush()
+
+
+class ScanCounter:
+    """Scans per redirect id, added to the usage file's scans map in batches.
+
+    record() only bumps an in-memory counter; the flusher's thread later adds
+    everything recorded since the last write to the file in one locked
+    read-modify-write, so a busy server writes about once a flusher delay.
+    Each counter in the file is {"total": scans, "last": "YYYY-MM-DD HH:MM:SS"}.
+    """
+
+    def __init__(self, path=USAGE_PATH, flusher=None):
+        self.path = path
+        self.flusher = flusher
+        self._pending = {}  # redirect id -> [scans, time of the last one]
+        self._lock = threading.Lock()
+
+    def record(self, redirect_id, when=None):
+        when = when or time.time()
+        with self._lock:
+            pending = self._pending.get(redirect_id)
+            if pending is not None:
+                pending[0] += 1
+                pending[1] = when
+                return
+            self._pending[redirect_id] = [1, when]
+            first = len(self._pending) == 1
+        if first:
+            # Later scans ride along with this flush
+            if self.flusher is None:
+                self.flush()
+            else:
+                self.flusher.mark_dirty(self.flush)
+
+    def flush(self):
+        """Add the pending scans to the file now."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        try:
+            with file_lock(self.path):
+                data = read_json(self.path)
+                if not isinstance(data, dict):
+                    data = {}
+                scans = data.setdefault("scans", {})
+                for redirect_id, (count, last) in batch.items():
+                    counter = scans.get(redirect_id)
+                    if not isinstance(counter, dict):
+                        counter = scans[redirect_id] = {"total": counter or 0}
+                    counter["total"] = counter.get("total", 0) + count
+                    counter["last"] = datetime.datetime.fromtimestamp(last).strftime("%Y-%m-%d %H:%M:%S")
+                atomic_write(self.path, json.dumps(data, separators=(",", ":")))
+        except BaseException:
+            # Keep the scans for the flusher's retry
+            with self._lock:
+                for redirect_id, (count, last) in batch.items():
+                    pending = self._pending.setdefault(redirect_id, [0, last])
+                    pending[0] += count
+                    pending[1] = max(pending[1], last)
+            raise
+
+    def pending(self):
+        with self._lock:
+            return sum(count for count, _ in self._pending.values())
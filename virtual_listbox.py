@@ -0,0 +1,158 @@
+"""Virtualized Tk listbox for very large histories.
+
+VirtualListbox behaves like a tk.Listbox but is backed by any Python
+sequence. Only the rows currently in view (plus a small buffer) are inserted
+into the underlying Tk widget, so showing, filtering or changing a list of a
+million entries costs O(visible rows) instead of O(N) Tk inserts.
+"""
+import tkinter as tk
+import tkinter.font as tkfont
+
+
+class VirtualListbox(tk.Listbox):
+    def __init__(self, master=None, formatter=str, buffer=2, yscrollcommand=None, **kwargs):
+        kwargs.setdefault("exportselection", False)
+        super().__init__(master, **kwargs)
+        self.formatter = formatter
+        self.buffer = buffer
+        self.items = []
+        self.top = 0
+        self.selected = None
+        self._yscrollcommand = yscrollcommand
+        self._rendered = None  # (top, count, len(items)) of the last render
+        self._linespace = None
+        self._font = kwargs.get("font")
+
+        self.bind("<Configure>", lambda event: self.refresh(), add="+")
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Button-4>", lambda event: self._scroll_by(-3))
+        self.bind("<Button-5>", lambda event: self._scroll_by(3))
+        self.bind("<Up>", lambda event: self._move_selection(-1))
+        self.bind("<Down>", lambda event: self._move_selection(1))
+        self.bind("<Prior>", lambda event: self._move_selection(-self.visible_rows()))
+        self.bind("<Next>", lambda event: self._move_selection(self.visible_rows()))
+
+    # -- Data -------------------------------------------------------------
+
+    def set_items(self, items):
+        """Show a new backing sequence, keeping the scroll position if possible."""
+        if items is not self.items:
+            self.selected = None
+            self.selection_clear(0, tk.END)
+        self.items = items
+        self.refresh(force=True)
+
+    def item_inserted(self, index):
+        """Tell the view that items[index] was inserted into the backing sequence."""
+        self._capture_selection()
+        if self.selected is not None and index <= self.selected:
+            self.selected += 1
+        if index < self.top:
+            self.top += 1
+        self.selection_clear(0, tk.END)
+        self.refresh(force=True)
+
+    def item_removed(self, index):
+        """Tell the view that the item at index was removed from the backing sequence."""
+        self._capture_selection()
+        self.selection_clear(0, tk.END)
+        if self.selected is not None:
+            if index == self.selected:
+                self.selected = None
+            elif index < self.selected:
+                self.selected -= 1
+        if index < self.top:
+            self.top -= 1
+        self.refresh(force=True)
+
+    # -- Tk listbox API ---------------------------------------------------
+
+    def configure(self, cnf=None, **kwargs):
+        if "yscrollcommand" in kwargs:
+            self._yscrollcommand = kwargs.pop("yscrollcommand")
+        font_changed = "font" in kwargs and kwargs["font"] != self._font
+        result = super().configure(cnf, **kwargs)
+        if font_changed:
+            self._font = kwargs["font"]
+            self._linespace = None
+            self.refresh(force=True)
+        return result
+
+    config = configure
+
+    def curselection(self):
+        """Return the selected index into the backing sequence, like tk.Listbox."""
+        self._capture_selection()
+        return () if self.selected is None else (self.selected,)
+
+    def yview(self, *args):
+        """Scrollbar protocol: "moveto fraction" and "scroll n units|pages"."""
+        if not args:
+            total = max(len(self.items), 1)
+            return self.top / total, min(1.0, (self.top + self.visible_rows()) / total)
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * len(self.items)))
+        elif args[0] == "scroll":
+            step = self.visible_rows() if args[2] == "pages" else 1
+            self._scroll_by(int(args[1]) * step)
+
+    # -- Rendering --------------------------------------------------------
+
+    def visible_rows(self):
+        height = self.winfo_height()
+        if height <= 1:
+            return int(self.cget("height")) or 10
+        if self._linespace is None:
+            self._linespace = tkfont.Font(font=self.cget("font")).metrics("linespace") or 1
+        return max(1, height // self._linespace)
+
+    def _capture_selection(self):
+        selection = super().curselection()
+        if selection:
+            self.selected = self.top + selection[0]
+
+    def refresh(self, force=False):
+        """Materialize only the rows in view plus the buffer."""
+        self._capture_selection()
+        rows = self.visible_rows()
+        self.top = max(0, min(self.top, len(self.items) - rows))
+        count = min(rows + self.buffer, len(self.items) - self.top)
+        state = (self.top, count, len(self.items))
+        if force or state != self._rendered:
+            self.delete(0, tk.END)
+            for index in range(self.top, self.top + count):
+                self.insert(tk.END, self.formatter(self.items[index]))
+            if self.selected is not None and self.top <= self.selected < self.top + count:
+                self.selection_set(self.selected - self.top)
+                self.activate(self.selected - self.top)
+            self._rendered = state
+        if self._yscrollcommand:
+            self._yscrollcommand(*self.yview())
+
+    def _scroll_to(self, top):
+        self._capture_selection()
+        self.selection_clear(0, tk.END)
+        self.top = top
+        self.refresh()
+        return "break"
+
+    def _scroll_by(self, delta):
+        return self._scroll_to(self.top + delta)
+
+    def _on_mousewheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _move_selection(self, delta):
+        if not self.items:
+            return "break"
+        self._capture_selection()
+        current = self.selected if self.selected is not None else self.top - 1
+        self.selected = max(0, min(len(self.items) - 1, current + delta))
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self.visible_rows():
+            self.top = self.selected - self.visible_rows() + 1
+        self.selection_clear(0, tk.END)
+        self.refresh(force=True)
+        self.event_generate("<<ListboxSelect>>")
+        return "break"